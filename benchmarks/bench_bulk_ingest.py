@@ -0,0 +1,105 @@
+"""
+Benchmark the executemany and multi-row VALUES ingest modes of the enter_data log writers.
+
+Runs against the DB configured in .env, but only writes into temporary tables that
+shadow the real ones for the benchmark session and are dropped afterwards.
+
+Usage: python -m benchmarks.bench_bulk_ingest
+"""
+
+import os
+import time
+from datetime import datetime
+
+os.environ["DB_POOL_MIN"] = "1"
+os.environ["DB_POOL_MAX"] = "1"
+
+# pylint: disable=wrong-import-position
+from src.db_connection import get_connection, release_connection, close_pool
+from src.enter_data import enter_gp_logs, enter_tickets, enter_raid_score_log
+
+ROW_COUNTS = (50, 500, 5000)
+MODES = ("executemany", "values")
+SHADOWED_TABLES = ("gp_history", "ticket_log", "raid_score_log")
+
+
+def create_shadow_tables() -> None:
+    """
+    Create session-local temp tables, so the writers insert into them instead of the real tables.
+    A single pooled connection guarantees every writer call runs in the same session
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            for table in SHADOWED_TABLES:
+                cur.execute(
+                    f"CREATE TEMP TABLE {table} (LIKE public.{table} INCLUDING DEFAULTS);"
+                )
+        conn.commit()
+    finally:
+        release_connection(conn)
+
+
+def drop_shadow_tables() -> None:
+    """
+    Drop the temp tables created for the benchmark
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            for table in SHADOWED_TABLES:
+                cur.execute(f"DROP TABLE IF EXISTS pg_temp.{table};")
+        conn.commit()
+    finally:
+        release_connection(conn)
+
+
+def make_rows(row_count: int) -> dict:
+    """
+    Build synthetic rows for every benchmarked writer
+    """
+    player_ids = [f"bench_player_{i}" for i in range(row_count)]
+    return {
+        enter_gp_logs: [(p, 5_000_000 + i) for i, p in enumerate(player_ids)],
+        enter_tickets: [(p, i % 600) for i, p in enumerate(player_ids)],
+        enter_raid_score_log: [(p, 100_000 + i, 0.95) for i, p in enumerate(player_ids)],
+    }
+
+
+def run_benchmark() -> list[tuple]:
+    """
+    Time every writer in every ingest mode for every row count
+    """
+    results = []
+    for row_count in ROW_COUNTS:
+        for writer, rows in make_rows(row_count).items():
+            timings = {}
+            for mode in MODES:
+                os.environ["DB_INGEST_MODE"] = mode
+                start = time.perf_counter()
+                writer(rows)
+                timings[mode] = time.perf_counter() - start
+            results.append(
+                (
+                    writer.__name__,
+                    row_count,
+                    timings["executemany"],
+                    timings["values"],
+                    timings["executemany"] / timings["values"],
+                )
+            )
+    return results
+
+
+if __name__ == "__main__":
+    create_shadow_tables()
+    try:
+        benchmark_results = run_benchmark()
+    finally:
+        drop_shadow_tables()
+        close_pool()
+
+    print(f"Bulk ingest benchmark ({datetime.now():%Y-%m-%dT%H:%M:%S})")
+    print(f"{'writer':<22}{'rows':>7}{'executemany [s]':>18}{'values [s]':>13}{'speedup':>10}")
+    for name, rows, old, new, speedup in benchmark_results:
+        print(f"{name:<22}{rows:>7}{old:>18.4f}{new:>13.4f}{speedup:>9.1f}x")
@@ -0,0 +1,113 @@
+"""
+Benchmark the selective roster parser against decoding the full comlink player response.
+
+Pass the path of a recorded player response (the raw body of a comlink /player request)
+to benchmark on a real roster. Without it, a synthetic roster of comparable size is used.
+
+Usage: python -m benchmarks.bench_roster_parser [recorded_player.json]
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from src.roster_rules import get_rule_evaluator
+from src.roster_parser import parse_roster, parse_roster_full
+
+ITERATIONS = 50
+SYNTHETIC_UNIT_COUNT = 300
+WATCHED_UNITS = get_rule_evaluator().watched_units
+
+
+def make_synthetic_response(unit_count: int) -> bytes:
+    """
+    Build a compact player response with fully modded units and the watched units spread across it
+    """
+    definition_ids = [
+        f"UNIT{i}:SEVEN_STAR" for i in range(unit_count - len(WATCHED_UNITS))
+    ]
+    step = max(1, len(definition_ids) // len(WATCHED_UNITS))
+    for offset, watched_unit in enumerate(WATCHED_UNITS):
+        definition_ids.insert(offset * (step + 1), watched_unit)
+
+    units = []
+    for definition_id in definition_ids:
+        base_id = definition_id.split(":")[0]
+        units.append(
+            {
+                "id": f"id-{base_id}",
+                "definitionId": definition_id,
+                "currentRarity": 7,
+                "currentLevel": 85,
+                "currentXp": 1_000_000,
+                "currentTier": 13,
+                "equipment": [],
+                "skill": [{"id": f"specialskill_{base_id}0{s}", "tier": 8} for s in range(1, 6)],
+                "equippedStatMod": [
+                    {
+                        "id": f"mod-{base_id}-{slot}",
+                        "definitionId": str(100 + slot),
+                        "level": 15,
+                        "tier": 5,
+                        "primaryStat": {"stat": {"unitStatId": 5, "statValueDecimal": "300000"}},
+                        "secondaryStat": [
+                            {"stat": {"unitStatId": 41 + n, "statValueDecimal": "100000"}, "statRolls": 3}
+                            for n in range(4)
+                        ],
+                    }
+                    for slot in range(6)
+                ],
+                "relic": {"currentTier": 9},
+            }
+        )
+    response = {
+        "rosterUnit": units,
+        "profileStat": [{"nameKey": "STAT_GALACTIC_POWER_ACQUIRED_NAME", "value": "9000000"}],
+        "name": "Benchmark Player",
+        "level": 85,
+        "playerId": "bench",
+    }
+    return json.dumps(response, separators=(",", ":")).encode()
+
+
+def measure(parse, raw: bytes) -> tuple[float, int]:
+    """
+    Get the mean seconds per parse and the peak memory of a single parse
+    """
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        parse(raw)
+    seconds = (time.perf_counter() - start) / ITERATIONS
+
+    tracemalloc.start()
+    parse(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            raw_response = f.read()
+        source = sys.argv[1]
+    else:
+        raw_response = make_synthetic_response(SYNTHETIC_UNIT_COUNT)
+        source = f"synthetic roster ({SYNTHETIC_UNIT_COUNT} units)"
+
+    full_seconds, full_peak = measure(parse_roster_full, raw_response)
+    selective_seconds, selective_peak = measure(
+        lambda raw: parse_roster(raw, WATCHED_UNITS), raw_response
+    )
+
+    print(f"Roster parser benchmark ({datetime.now():%Y-%m-%dT%H:%M:%S})")
+    print(f"{source}, {len(raw_response) / 1024:.0f} KiB")
+    print(f"{'parser':<12}{'ms/parse':>10}{'peak KiB':>11}")
+    print(f"{'full':<12}{full_seconds * 1000:>10.2f}{full_peak / 1024:>11.0f}")
+    print(f"{'selective':<12}{selective_seconds * 1000:>10.2f}{selective_peak / 1024:>11.0f}")
+    print(
+        f"speedup {full_seconds / selective_seconds:.1f}x, "
+        f"memory {full_peak / selective_peak:.1f}x less"
+    )
@@ -1,7 +1,16 @@
 #!/bin/bash
 echo "Starting entrypoint script..."
 
-# Setup log rotation
+# Run all jobs in one long lived scheduler process, unless SCHEDULER=cron is set
+# The scheduler logs to stdout and writes the records of every job to its /var/log file,
+# rotated daily with a week of backups
+if [ "${SCHEDULER:-daemon}" != "cron" ]; then
+    echo "Starting scheduler daemon..."
+    export SCHEDULER_LOG_DIR="${SCHEDULER_LOG_DIR:-/var/log}"
+    exec /app/.venv/bin/python -m src.scheduler
+fi
+
+# Setup log rotation, the scheduler rotates its job log files itself
 cat > /etc/logrotate.d/log << EOF
 /var/log/*.log {
     daily
@@ -15,7 +24,7 @@ EOF
 # Export environment variables to cron's environment
 printenv | grep -v "no_proxy" >> /etc/environment
 
-# Load ALL crontab entries at once
+# Load ALL crontab entries at once, keep them in sync with JOBS in src/scheduler.py
 echo "Loading crontab..."
 cat << 'CRONTAB' | crontab -
 */2 * * * * /scripts/run_push_to_sheets.sh >> /var/log/push_to_sheets.log 2>&1
@@ -1,25 +1,32 @@
 import logging
 from typing import Dict, Any
-import requests
-from .helper_functions import setup_logging
+from .comlink_client import get_comlink_client
+from .response_cache import get_response_cache
 
 logger = logging.getLogger("guild_data_app")
 
 
-def post_request(url: str, data: Dict[str, Any], timeout: int = 30):
+def post_request(
+    url: str, data: Dict[str, Any], timeout: float | None = None, cached: bool = False
+):
     """
-    Send a POST request to a API endpoint and return the JSON response if successful
+    Send a POST request to a API endpoint through the shared comlink client
+    and return the JSON response if successful.
+    Without a timeout, the COMLINK_TIMEOUT of the client applies.
+    With cached=True the response is read through the on-disk response cache
     """
-    setup_logging()
-    try:
-        response = requests.post(url, json=data, timeout=timeout)
+    if cached:
+        return get_response_cache().get_or_fetch(
+            url, data, lambda: get_comlink_client().post(url, data, timeout=timeout)
+        )
+    return get_comlink_client().post(url, data, timeout=timeout)
 
-        if response.status_code == 200:
-            content = response.json()
-            return content
-        else:
-            logger.error(response.status_code)
-            return None
-    except requests.exceptions.RequestException as e:
-        logger.error(e)
-        return None
+
+def post_request_raw(
+    url: str, data: Dict[str, Any], timeout: float | None = None
+) -> bytes | None:
+    """
+    Send a POST request to a API endpoint through the shared comlink client
+    and return the undecoded response body if successful
+    """
+    return get_comlink_client().post_raw(url, data, timeout=timeout)
@@ -1,7 +1,6 @@
 import logging
-from .read_data import read_players_raw, read_guild
-from .enter_data import enter_player_archive
-from .remove_data import remove_from_players
+from .read_data import read_guild
+from .remove_data import archive_players_outside
 from .helper_functions import check_none_list, setup_logging
 
 
@@ -17,18 +16,6 @@ def archive_process():
         read_guild(), "Error: read_guild function should not return None"
     )
 
-    raw_players_data = check_none_list(
-        read_players_raw(), "Error: read_players_raw function should not return None"
-    )
-
     guild_ids = [g[0] for g in guilds_config]
     logger.info("guild ids: %s", guild_ids)
-    filtered_players_data = [
-        (x[0], x[1], x[2], x[5]) for x in raw_players_data if x[5] not in guild_ids
-    ]
-
-    enter_player_archive(filtered_players_data)
-    to_remove = [(i[0],) for i in filtered_players_data]
-    logger.debug("to remove:")
-    logger.debug(to_remove)
-    remove_from_players(to_remove)
+    archive_players_outside(guild_ids)
@@ -1,17 +1,56 @@
-import json
 import os
 import logging
 from dotenv import load_dotenv
 from .read_data import read_guild, read_players
-from .update_data import updateLastRaidResult
+from .update_data import update_last_raid_results, update_last_raid_results_async
 from .api_request import post_request
+from .comlink_models import GuildSnapshot
+from .db_async import use_async_db, run_async_job, run_overlapped
 from .helper_functions import check_none_str, check_none_list, setup_logging
 
 
 logger = logging.getLogger("guild_data_app")
 setup_logging()
 
-if __name__ == "__main__":
+RAID_ID: str = "order66"
+
+
+def fetch_last_raid_results(g: tuple, guild_url: str) -> list[tuple]:
+    """
+    Fetch the latest raid results of guild g and build (player_id, result) rows for its players
+    """
+    logger.debug("g: %s", g)
+    guild = GuildSnapshot.from_response(
+        post_request(
+            guild_url,
+            {"payload": {"guildId": g[0], "includeRecentGuildActivityInfo": True}},
+            cached=True,
+        )
+    )
+    if not guild.has_raid(RAID_ID):
+        logger.warning("No %s result in the recent raids of %s", RAID_ID, g[1])
+        return []
+    logger.debug("raid_results: %s", guild.raid_progress[RAID_ID])
+
+    players = check_none_list(
+        read_players(g[0]), "players should not be None. Check read_players function"
+    )
+    last_raid_results = [(e[0], guild.raid_result(RAID_ID, e[0])) for e in players]
+    return last_raid_results
+
+
+async def write_last_raid_results_async(g: tuple, last_raid_results: list[tuple]) -> None:
+    """
+    Write the last raid results of guild g through the async DB layer
+    """
+    logger.info("Updating last raid results for: %s", g[1])
+    await update_last_raid_results_async(last_raid_results)
+
+
+def process_raid_results():
+    """
+    Fetch the latest raid results of all guilds and store them as the players' last raid result
+    """
     load_dotenv()
     guild_url: str = check_none_str(
         os.getenv("GUILD_URL"), "Error: Check .env file. GUILD_URL should not be None"
@@ -22,33 +61,20 @@ if __name__ == "__main__":
     )
     logger.debug("Guilds_config: %s", guilds_config)
 
-
-    for g in guilds_config:
-        logger.debug("g: %s", g)
-        guild = json.dumps(
-            post_request(
-                guild_url,
-                {"payload": {"guildId": g[0], "includeRecentGuildActivityInfo": True}},
+    if use_async_db():
+        # Write the results of one guild while the next guild is fetched
+        run_async_job(
+            run_overlapped(
+                guilds_config,
+                lambda g: fetch_last_raid_results(g, guild_url),
+                write_last_raid_results_async,
             )
         )
-        raid_results = list(
-            filter(
-                lambda t: t["raidId"] == "order66",
-                json.loads(guild)["guild"]["recentRaidResult"],
-            )
-        )[0]["raidMember"]
-        logger.debug("raid_results: %s", raid_results)
+        return
 
-        logger.info("read_players(g[0]): %s", read_players(g[0]))
-        players = check_none_list(
-            read_players(g[0]), "players should not be None. Check read_players function"
-        )
-        for e in players:
-            logger.info("e[0]: %s", e[0])
-            pre_result = [t for t in raid_results if t["playerId"] == e[0]]
-            if pre_result:
-                RAID_RESULT = pre_result[0]["memberProgress"]
-            else:
-                RAID_RESULT = None
-
-            updateLastRaidResult(RAID_RESULT, e[0])
+    for g in guilds_config:
+        update_last_raid_results(fetch_last_raid_results(g, guild_url))
+
+
+if __name__ == "__main__":
+    process_raid_results()
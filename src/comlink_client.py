@@ -0,0 +1,179 @@
+"""
+Shared HTTP client for the comlink API with a persistent connection pool,
+retries with jittered backoff and per-endpoint latency counters.
+"""
+
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from .helper_functions import setup_logging
+
+
+logger = logging.getLogger("guild_data_app")
+setup_logging()
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class ComlinkClient:
+    """
+    Keep-alive comlink client. Retries timeouts, connection errors and 5xx responses
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30,
+        retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        pool_size: int = 10,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._stats: dict[str, dict] = {}
+        self._stats_lock = threading.Lock()
+
+    def post(
+        self, url: str, data: Dict[str, Any], timeout: float | None = None
+    ) -> dict | None:
+        """
+        Send a POST request to a comlink endpoint and return the JSON response if successful
+        """
+        response = self._send(url, data, timeout)
+        if response is None:
+            return None
+        try:
+            return response.json()
+        except ValueError as e:
+            logger.error("Invalid JSON from %s: %s", urlsplit(url).path or url, e)
+            return None
+
+    def post_raw(
+        self, url: str, data: Dict[str, Any], timeout: float | None = None
+    ) -> bytes | None:
+        """
+        Send a POST request to a comlink endpoint and return the undecoded response body if successful
+        """
+        response = self._send(url, data, timeout)
+        return response.content if response is not None else None
+
+    def _send(
+        self, url: str, data: Dict[str, Any], timeout: float | None
+    ) -> requests.Response | None:
+        """
+        Send a POST request with retries and return the 200 response, None if it failed
+        """
+        endpoint = urlsplit(url).path or url
+        request_timeout = self.timeout if timeout is None else timeout
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, json=data, timeout=request_timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self._record(endpoint, time.perf_counter() - start, error=True)
+                logger.warning("Request to %s failed (attempt %s): %s", endpoint, attempt + 1, e)
+            except requests.exceptions.RequestException as e:
+                self._record(endpoint, time.perf_counter() - start, error=True)
+                logger.error(e)
+                return None
+            else:
+                self._record(
+                    endpoint,
+                    time.perf_counter() - start,
+                    error=response.status_code != 200,
+                )
+                if response.status_code == 200:
+                    return response
+                if response.status_code < 500:
+                    logger.error(response.status_code)
+                    return None
+                logger.warning(
+                    "Request to %s returned %s (attempt %s)",
+                    endpoint,
+                    response.status_code,
+                    attempt + 1,
+                )
+
+            if attempt < self.retries:
+                with self._stats_lock:
+                    self._stats[endpoint]["retries"] += 1
+                time.sleep(self._backoff(attempt))
+
+        logger.error("Giving up on %s after %s attempts", endpoint, self.retries + 1)
+        return None
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        Full jitter backoff: a random wait up to the exponential backoff of the attempt
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def _record(self, endpoint: str, seconds: float, error: bool) -> None:
+        """
+        Add a request to the latency counters of its endpoint
+        """
+        with self._stats_lock:
+            stats = self._stats.setdefault(
+                endpoint,
+                {"requests": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+            )
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def get_stats(self) -> dict[str, dict]:
+        """
+        Get a copy of the per-endpoint counters
+        """
+        with self._stats_lock:
+            return {endpoint: dict(stats) for endpoint, stats in self._stats.items()}
+
+    def log_stats(self) -> None:
+        """
+        Log the per-endpoint request counts and latencies
+        """
+        for endpoint, stats in self.get_stats().items():
+            logger.info(
+                "Comlink %s: %s requests, %s errors, %s retries, avg %.3fs, max %.3fs",
+                endpoint,
+                stats["requests"],
+                stats["errors"],
+                stats["retries"],
+                stats["total_seconds"] / stats["requests"],
+                stats["max_seconds"],
+            )
+
+
+def get_comlink_client() -> ComlinkClient:
+    """
+    Get the process-wide comlink client, configured by the optional COMLINK_* env vars
+    """
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            _client = ComlinkClient(
+                timeout=float(os.getenv("COMLINK_TIMEOUT", "30")),
+                retries=int(os.getenv("COMLINK_RETRIES", "3")),
+                backoff_base=float(os.getenv("COMLINK_BACKOFF_BASE", "0.5")),
+                backoff_max=float(os.getenv("COMLINK_BACKOFF_MAX", "8")),
+                pool_size=int(os.getenv("COMLINK_POOL_SIZE", "10")),
+            )
+            atexit.register(_client.log_stats)
+    return _client
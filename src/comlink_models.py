@@ -0,0 +1,177 @@
+"""
+Typed views of the comlink guild and player responses.
+Each model is built once from the decoded response and indexes the fields the jobs look up,
+so a payload is never re-serialized or scanned more than once.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime as dt
+from typing import Any
+
+# memberContribution type of the daily raid tickets
+TICKET_CONTRIBUTION_TYPE: int = 2
+DAILY_TICKETS: int = 600
+RELIC_TIER_R7: int = 9
+
+
+@dataclass(slots=True, frozen=True)
+class Member:
+    """
+    A guild member with its contributions indexed by type
+    """
+
+    player_id: str
+    player_name: str
+    galactic_power: int
+    ship_galactic_power: int
+    character_galactic_power: int
+    last_activity_ms: int
+    contributions: dict[int, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, member: dict[str, Any]) -> "Member":
+        contributions: dict[int, int] = {}
+        for c in member.get("memberContribution", []):
+            contributions.setdefault(c["type"], int(c["currentValue"]))
+        return cls(
+            player_id=member["playerId"],
+            player_name=member.get("playerName", ""),
+            galactic_power=member.get("galacticPower", 0),
+            ship_galactic_power=member.get("shipGalacticPower", 0),
+            character_galactic_power=member.get("characterGalacticPower", 0),
+            last_activity_ms=int(member.get("lastActivityTime", 0)),
+            contributions=contributions,
+        )
+
+    @property
+    def last_activity_time(self) -> dt:
+        return dt.fromtimestamp(self.last_activity_ms / 1000)
+
+    def contribution(self, contribution_type: int) -> int:
+        """
+        Get the current value of a contribution type, 0 if the member has none
+        """
+        return self.contributions.get(contribution_type, 0)
+
+    @property
+    def missing_tickets(self) -> int:
+        """
+        Number of raid tickets still missing to the daily 600
+        """
+        return DAILY_TICKETS - self.contribution(TICKET_CONTRIBUTION_TYPE)
+
+
+@dataclass(slots=True, frozen=True)
+class GuildSnapshot:
+    """
+    A guild response with members by player_id and raid progress by raid and player
+    """
+
+    members: tuple[Member, ...]
+    members_by_id: dict[str, Member]
+    raid_progress: dict[str, dict[str, Any]]
+
+    @classmethod
+    def from_response(cls, response: dict[str, Any]) -> "GuildSnapshot":
+        guild = response["guild"]
+        members = tuple(Member.from_dict(m) for m in guild.get("member", []))
+        raid_progress: dict[str, dict[str, Any]] = {}
+        for raid in guild.get("recentRaidResult", []):
+            # keep the first result of a raid, like the comlink order (latest first)
+            if raid["raidId"] in raid_progress:
+                continue
+            progress: dict[str, Any] = {}
+            for raid_member in raid.get("raidMember", []):
+                progress.setdefault(raid_member["playerId"], raid_member["memberProgress"])
+            raid_progress[raid["raidId"]] = progress
+        return cls(
+            members=members,
+            members_by_id={m.player_id: m for m in members},
+            raid_progress=raid_progress,
+        )
+
+    def member(self, player_id: str) -> Member | None:
+        return self.members_by_id.get(player_id)
+
+    def has_raid(self, raid_id: str) -> bool:
+        return raid_id in self.raid_progress
+
+    def raid_result(self, raid_id: str, player_id: str) -> Any | None:
+        """
+        Get the progress of a player in the latest result of a raid, None if they didn't take part
+        """
+        return self.raid_progress.get(raid_id, {}).get(player_id)
+
+
+@dataclass(slots=True, frozen=True)
+class UnitRecord:
+    """
+    The fields of a roster unit the readiness checks look at
+    """
+
+    level: int
+    relic_tier: int
+    skill_tiers: dict[str, int]
+    rarity: int = 0
+    gear_tier: int = 0
+
+    @classmethod
+    def from_dict(cls, unit: dict[str, Any]) -> "UnitRecord":
+        relic = unit.get("relic")
+        return cls(
+            level=unit.get("currentLevel", 0),
+            relic_tier=relic.get("currentTier", 0) if relic is not None else 0,
+            skill_tiers={s.get("id"): s.get("tier", 0) for s in unit.get("skill", [])},
+            rarity=unit.get("currentRarity", 0),
+            gear_tier=unit.get("currentTier", 0),
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class PlayerRoster:
+    """
+    A player response with a compact record of every roster unit, indexed by definitionId
+    """
+
+    name: str
+    units: dict[str, UnitRecord]
+
+    @classmethod
+    def from_response(cls, response: dict[str, Any]) -> "PlayerRoster":
+        return cls.from_units(response.get("name", ""), response.get("rosterUnit", []))
+
+    @classmethod
+    def from_units(cls, name: str, roster_units: list[dict[str, Any]]) -> "PlayerRoster":
+        """
+        Index the roster units in one pass, keeping the first unit of every definitionId
+        """
+        units: dict[str, UnitRecord] = {}
+        for unit in roster_units:
+            definition_id = unit.get("definitionId")
+            if definition_id not in units:
+                units[definition_id] = UnitRecord.from_dict(unit)
+        return cls(name=name, units=units)
+
+    def has_unit(self, definition_id: str) -> bool:
+        return definition_id in self.units
+
+    def level(self, definition_id: str) -> int | None:
+        unit = self.units.get(definition_id)
+        return unit.level if unit else None
+
+    def relic_tier(self, definition_id: str) -> int:
+        """
+        Get the relic currentTier of a unit, 0 if the player hasn't got the unit or no relic
+        """
+        unit = self.units.get(definition_id)
+        return unit.relic_tier if unit else 0
+
+    def is_r7(self, definition_id: str) -> bool:
+        return self.relic_tier(definition_id) >= RELIC_TIER_R7
+
+    def skill_tiers(self, definition_id: str) -> dict[str, int]:
+        """
+        Get the skill tiers of a unit by skill id
+        """
+        unit = self.units.get(definition_id)
+        return unit.skill_tiers if unit else {}
@@ -0,0 +1,211 @@
+"""
+Asyncio variant of the shared DB layer, built on the psycopg 3 AsyncConnectionPool.
+Lets the jobs write the data of one guild while the comlink request for the next guild is in flight.
+Enabled with DB_ASYNC=1.
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Callable, Coroutine
+from .db_connection import setup_connection, get_pool_size, DatabaseError, IntegrityError
+from .helper_functions import setup_logging
+
+try:
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # psycopg 3 is only needed for DB_ASYNC=1
+    AsyncConnectionPool = None
+
+
+logger = logging.getLogger("guild_data_app")
+setup_logging()
+
+# All async jobs of a process run on one event loop in a dedicated thread, which owns the pool,
+# so a long lived process like the scheduler keeps its connections between job runs
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_thread: threading.Thread | None = None
+_loop_lock = threading.Lock()
+_pool = None
+_pool_lock: asyncio.Lock | None = None
+
+
+def use_async_db() -> bool:
+    """
+    Check the optional DB_ASYNC env var to decide whether jobs use the async DB layer
+    """
+    enabled: bool = os.getenv("DB_ASYNC", "").lower() in ("1", "true", "yes")
+    if enabled and AsyncConnectionPool is None:
+        logger.warning("DB_ASYNC is set, but psycopg_pool is not installed. Using sync DB layer")
+        return False
+    return enabled
+
+
+async def _get_async_pool():
+    """
+    Build the async connection pool of the event loop once and return it
+    """
+    global _pool, _pool_lock
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            min_size, max_size = get_pool_size()
+            logger.info("Creating async DB connection pool (min %s, max %s)", min_size, max_size)
+            pool = AsyncConnectionPool(
+                make_conninfo(**setup_connection()),
+                min_size=min_size,
+                max_size=max_size,
+                kwargs={"prepare_threshold": 0},
+                open=False,
+            )
+            await pool.open()
+            _pool = pool
+    return _pool
+
+
+async def close_async_pool() -> None:
+    """
+    Close the async connection pool. Must run on the event loop that created it
+    """
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+
+async def execute_async(sql_str: str, params: tuple | list | None = None) -> int:
+    """
+    Execute a single statement in its own transaction and return the affected row count
+    """
+    try:
+        pool = await _get_async_pool()
+        # The pool commits on a clean exit of the block and rolls back on errors
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql_str, params)
+                return max(cur.rowcount, 0)
+    except IntegrityError as ie:
+        logger.error("Data integrity error (duplicate keys, constraint violations): %s", ie)
+    except DatabaseError as db_error:
+        logger.error("Database error: %s", db_error)
+    return 0
+
+
+async def execute_batch_values_async(sql_str: str, rows: list | tuple, template: str) -> int:
+    """
+    Execute a statement containing 'VALUES %s' for all rows in one pipelined transaction.
+    Returns the number of affected rows
+    """
+    if not rows:
+        return 0
+    try:
+        pool = await _get_async_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.executemany(
+                    sql_str.replace("VALUES %s", f"VALUES {template}", 1), rows
+                )
+                return max(cur.rowcount, 0)
+    except IntegrityError as ie:
+        logger.error("Data integrity error (duplicate keys, constraint violations): %s", ie)
+    except DatabaseError as db_error:
+        logger.error("Database error: %s", db_error)
+    return 0
+
+
+async def execute_transaction_async(
+    statements: list[tuple[str, Any, str | None]]
+) -> int | None:
+    """
+    Execute (sql_str, params, template) statements in one transaction. With a template, params are
+    the rows of a 'VALUES %s' statement. Returns the affected rows, None if the transaction failed
+    """
+    try:
+        pool = await _get_async_pool()
+        affected: int = 0
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                for sql_str, params, template in statements:
+                    if template is None:
+                        await cur.execute(sql_str, params)
+                    elif params:
+                        await cur.executemany(
+                            sql_str.replace("VALUES %s", f"VALUES {template}", 1), params
+                        )
+                    else:
+                        continue
+                    affected += max(cur.rowcount, 0)
+        return affected
+    except IntegrityError as ie:
+        logger.error("Data integrity error (duplicate keys, constraint violations): %s", ie)
+    except DatabaseError as db_error:
+        logger.error("Database error: %s", db_error)
+    return None
+
+
+async def run_overlapped(
+    items: list | tuple,
+    fetch: Callable[[Any], Any],
+    process: Callable[[Any, Any], Awaitable[Any]],
+) -> None:
+    """
+    Run the blocking fetch(item) of the next item in a worker thread,
+    while process(item, fetched) of the current item is awaited
+    """
+    if not items:
+        return
+    next_fetch = asyncio.create_task(asyncio.to_thread(fetch, items[0]))
+    for index, item in enumerate(items):
+        fetched = await next_fetch
+        if index + 1 < len(items):
+            next_fetch = asyncio.create_task(asyncio.to_thread(fetch, items[index + 1]))
+        try:
+            await process(item, fetched)
+        except Exception:
+            next_fetch.cancel()
+            raise
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Start the event loop thread of the async jobs once and return its loop
+    """
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=loop.run_forever, name="async_db_loop", daemon=True
+            )
+            _loop_thread.start()
+            _loop = loop
+            atexit.register(shutdown_async_db)
+    return _loop
+
+
+def run_async_job(job: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Run an async job on the shared event loop and wait for its result.
+    The caller's context variables are passed on to the job
+    """
+    return asyncio.run_coroutine_threadsafe(job, _get_loop()).result()
+
+
+def shutdown_async_db() -> None:
+    """
+    Close the async pool and stop the event loop thread, if they were started
+    """
+    global _loop, _loop_thread, _pool_lock
+    with _loop_lock:
+        loop, thread = _loop, _loop_thread
+        _loop, _loop_thread = None, None
+    if loop is None:
+        return
+    asyncio.run_coroutine_threadsafe(close_async_pool(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    _pool_lock = None
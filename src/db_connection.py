@@ -0,0 +1,309 @@
+"""
+Shared, process-wide PostgreSQL connection pool for all DB modules.
+The pool is built lazily from the .env params on first use and reused afterwards.
+DB_BACKEND=psycopg3 switches the pool to psycopg 3 connections, that prepare
+every statement server-side and pipeline batched statements.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
+from psycopg2.pool import ThreadedConnectionPool
+from .helper_functions import get_env, setup_logging
+
+try:
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import ConnectionPool
+except ImportError:  # psycopg 3 is only needed for DB_BACKEND=psycopg3
+    psycopg = None
+
+
+logger = logging.getLogger("guild_data_app")
+setup_logging()
+
+# Exceptions of both drivers, so callers can catch DB errors independent of the backend
+DatabaseError: tuple = (psycopg2.Error,) + ((psycopg.Error,) if psycopg else ())
+IntegrityError: tuple = (psycopg2.IntegrityError,) + (
+    (psycopg.IntegrityError,) if psycopg else ()
+)
+
+_pool = None
+_pool_backend: str = "psycopg2"
+_pool_slots: threading.BoundedSemaphore | None = None
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_session = threading.local()
+_seen_connections: set[int] = set()
+_pool_stats: dict = {
+    "checkouts": 0,
+    "waits": 0,
+    "wait_seconds": 0.0,
+    "connections_opened": 0,
+}
+
+
+def setup_connection() -> dict:
+    """
+    Set up psql connection dict with params from .env file
+    """
+    password: str = get_env("PASS")
+    host: str = get_env("HOST")
+    user: str = get_env("USER")
+    db_name: str = get_env("DBNAME")
+    port: int = int(get_env("PORT"))
+
+    connection_dict: dict = {
+        "dbname": db_name,
+        "user": user,
+        "password": password,
+        "port": port,
+        "host": host,
+    }
+    return connection_dict
+
+
+def get_pool_size() -> tuple[int, int]:
+    """
+    Get the (min, max) pool size from the optional DB_POOL_MIN / DB_POOL_MAX env vars
+    """
+    min_size: int = int(os.getenv("DB_POOL_MIN", "1"))
+    max_size: int = int(os.getenv("DB_POOL_MAX", "5"))
+    return min_size, max(min_size, max_size)
+
+
+def get_db_backend() -> str:
+    """
+    Get the DB driver from the optional DB_BACKEND env var: 'psycopg2' (default) or 'psycopg3'
+    """
+    backend: str = os.getenv("DB_BACKEND", "psycopg2").lower()
+    if backend not in ("psycopg2", "psycopg3"):
+        logger.warning("Invalid DB_BACKEND: %s. Using psycopg2", backend)
+        return "psycopg2"
+    if backend == "psycopg3" and psycopg is None:
+        logger.warning("DB_BACKEND is psycopg3, but psycopg is not installed. Using psycopg2")
+        return "psycopg2"
+    return backend
+
+
+def get_ingest_mode() -> str:
+    """
+    Get the bulk insert mode from the optional DB_INGEST_MODE env var.
+    'values' sends multi-row VALUES batches, 'executemany' sends one INSERT per row
+    """
+    ingest_mode: str = os.getenv("DB_INGEST_MODE", "values").lower()
+    if ingest_mode not in ("values", "executemany"):
+        logger.warning("Invalid DB_INGEST_MODE: %s. Using values", ingest_mode)
+        return "values"
+    return ingest_mode
+
+
+def _get_pool():
+    """
+    Build the process-wide connection pool once and return it
+    """
+    global _pool, _pool_slots, _pool_backend
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            min_size, max_size = get_pool_size()
+            backend = get_db_backend()
+            logger.info(
+                "Creating %s DB connection pool (min %s, max %s)", backend, min_size, max_size
+            )
+            _pool_slots = threading.BoundedSemaphore(max_size)
+            if backend == "psycopg3":
+                # prepare_threshold=0 prepares every statement on its first execution
+                _pool = ConnectionPool(
+                    make_conninfo(**setup_connection()),
+                    min_size=min_size,
+                    max_size=max_size,
+                    kwargs={"prepare_threshold": 0},
+                    open=True,
+                )
+            else:
+                _pool = ThreadedConnectionPool(min_size, max_size, **setup_connection())
+            _pool_backend = backend
+            atexit.register(close_pool)
+    return _pool
+
+
+def get_connection():
+    """
+    Check out a connection from the shared pool, waiting if all connections are in use
+    """
+    pool = _get_pool()
+    assert _pool_slots is not None
+    waited = 0.0
+    if not _pool_slots.acquire(blocking=False):
+        start = time.perf_counter()
+        _pool_slots.acquire()
+        waited = time.perf_counter() - start
+    try:
+        conn = pool.getconn()
+    except Exception:
+        _pool_slots.release()
+        raise
+
+    with _stats_lock:
+        _pool_stats["checkouts"] += 1
+        if waited:
+            _pool_stats["waits"] += 1
+            _pool_stats["wait_seconds"] += waited
+        if id(conn) not in _seen_connections:
+            _seen_connections.add(id(conn))
+            _pool_stats["connections_opened"] += 1
+    return conn
+
+
+def release_connection(conn) -> None:
+    """
+    Return a connection to the shared pool. Broken connections are discarded
+    """
+    if _pool is None or _pool_slots is None:
+        conn.close()
+        return
+    try:
+        if conn.closed:
+            with _stats_lock:
+                _seen_connections.discard(id(conn))
+        if _pool_backend == "psycopg3":
+            if not conn.closed and conn.info.transaction_status == psycopg.pq.TransactionStatus.INTRANS:
+                conn.rollback()
+            _pool.putconn(conn)
+        else:
+            _pool.putconn(conn, close=bool(conn.closed))
+    finally:
+        _pool_slots.release()
+
+
+def _set_snapshot_session(conn, enabled: bool) -> None:
+    """
+    Switch a connection to REPEATABLE READ, read only transactions or back to the defaults
+    """
+    if psycopg is not None and isinstance(conn, psycopg.Connection):
+        conn.isolation_level = psycopg.IsolationLevel.REPEATABLE_READ if enabled else None
+        conn.read_only = True if enabled else None
+    elif enabled:
+        conn.set_session(isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+    else:
+        conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+
+
+@contextmanager
+def read_session():
+    """
+    Run every read inside the block on one pooled connection and one
+    REPEATABLE READ, read only transaction, so all reads see the same snapshot
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        _set_snapshot_session(conn, True)
+    except DatabaseError as db_error:
+        logger.error("Could not open read session, reading without snapshot: %s", db_error)
+        if conn:
+            release_connection(conn)
+        conn = None
+
+    _session.conn = conn
+    try:
+        yield conn
+    finally:
+        _session.conn = None
+        if conn:
+            try:
+                conn.rollback()
+                _set_snapshot_session(conn, False)
+            except DatabaseError as db_error:
+                logger.error("Could not reset read session: %s", db_error)
+            release_connection(conn)
+
+
+def get_session_connection():
+    """
+    Get the connection of the read session active in this thread, if there is one
+    """
+    return getattr(_session, "conn", None)
+
+
+def get_pool_stats() -> dict:
+    """
+    Get a copy of the pool counters (checkouts, waits, wait time, opened connections)
+    """
+    with _stats_lock:
+        return dict(_pool_stats)
+
+
+def log_pool_stats() -> None:
+    """
+    Log the pool counters to see how many connection handshakes were saved
+    """
+    stats = get_pool_stats()
+    logger.info(
+        "DB pool stats: %s checkouts, %s connections opened, %s waits (%.3fs)",
+        stats["checkouts"],
+        stats["connections_opened"],
+        stats["waits"],
+        stats["wait_seconds"],
+    )
+
+
+def close_pool() -> None:
+    """
+    Close all pooled connections and reset the pool
+    """
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is None:
+            return
+        log_pool_stats()
+        if _pool_backend == "psycopg3":
+            _pool.close()
+        else:
+            _pool.closeall()
+        _pool = None
+        _pool_slots = None
+        with _stats_lock:
+            _seen_connections.clear()
+
+
+def execute_batch_values(
+    cur, sql_str: str, rows: list | tuple, template: str, page_size: int = 1000
+) -> int:
+    """
+    Execute a statement containing 'VALUES %s' with many rows per round trip.
+    Returns the number of affected rows over all pages
+    """
+    if psycopg is not None and isinstance(cur, psycopg.Cursor):
+        # psycopg 3 pipelines executemany and prepares the single row statement once
+        cur.executemany(sql_str.replace("VALUES %s", f"VALUES {template}", 1), rows)
+        return max(cur.rowcount, 0)
+
+    affected: int = 0
+    for start in range(0, len(rows), page_size):
+        page = rows[start : start + page_size]
+        values_str: str = ", ".join([template] * len(page))
+        cur.execute(
+            sql_str.replace("VALUES %s", f"VALUES {values_str}", 1),
+            [value for row in page for value in row],
+        )
+        affected += max(cur.rowcount, 0)
+    return affected
+
+
+def execute_insert(cur, sql_str: str, rows: list | tuple, template: str) -> int:
+    """
+    Insert rows with an 'INSERT ... VALUES %s' statement using the configured ingest mode.
+    Returns the number of inserted rows
+    """
+    if get_ingest_mode() == "executemany":
+        cur.executemany(sql_str.replace("VALUES %s", f"VALUES {template}", 1), rows)
+        return cur.rowcount
+    return execute_batch_values(cur, sql_str, rows, template)
@@ -1,217 +1,152 @@
 import logging
-import psycopg2
-from .helper_functions import get_env, setup_logging
+from .db_connection import (
+    get_connection,
+    release_connection,
+    execute_insert,
+    DatabaseError,
+    IntegrityError,
+)
+from .db_async import execute_batch_values_async
+from .helper_functions import setup_logging
 
 
 logger = logging.getLogger("guild_data_app")
 setup_logging()
 
+TICKETS_INSERT_SQL: str = (
+    "INSERT INTO ticket_log "
+    "(player_id, created_at, tickets_lost) "
+    "VALUES %s;"
+)
+TICKETS_TEMPLATE: str = "(%s, NOW(), %s)"
 
-def setup_connection():
-    """
-    Set up psql connection dict with params from .env file
-    """
-    password: str = get_env("PASS")
-    host: str = get_env("HOST")
-    user: str = get_env("USER")
-    db_name: str = get_env("DBNAME")
-    port: int = int(get_env("PORT"))
-
-    connection_dict = {
-        "dbname": db_name,
-        "user": user,
-        "password": password,
-        "port": port,
-        "host": host,
-    }
-    return connection_dict
-
-
-def enter_players(players_to_insert):
-    """
-    Enter new player data into the players table
-    """
-    pg_connection_dict = setup_connection()
-    conn = None
-    try:
-        logger.info("Entering new player data into players table...")
-        conn = psycopg2.connect(**pg_connection_dict)
-
-        with conn.cursor() as cur:
-            cur.executemany(
-                "INSERT INTO players "
-                "(player_id, nickname, total_gp, guild_id, last_activity_time) "
-                "VALUES (%s, %s, %s, %s, %s);",
-                players_to_insert,
-            )
-            inserted_count = cur.rowcount
-            logger.info("Inserted %s players into players table", inserted_count)
-            conn.commit()
-            logger.info("Done")
-    except psycopg2.IntegrityError as ie:
-        logger.error(
-            "Data integrity error (duplicate keys, constraint violations): %s", ie
-        )
-        if conn:
-            conn.rollback()
-    except psycopg2.Error as db_error:
-        logger.error("Database error: %s", db_error)
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
-            conn.close()
+ROSTER_CHECK_SUMMARY_DDL: str = (
+    "CREATE TABLE IF NOT EXISTS roster_check_summary ("
+    "guild_id text NOT NULL, "
+    "check_name text NOT NULL, "
+    "checked_at timestamp NOT NULL DEFAULT NOW(), "
+    "member_count integer NOT NULL, "
+    "ready_count integer NOT NULL, "
+    "one_short_count integer NOT NULL, "
+    "one_short_players text[] NOT NULL DEFAULT '{}', "
+    "PRIMARY KEY (guild_id, check_name, checked_at));"
+)
+ROSTER_CHECK_SUMMARY_INSERT_SQL: str = (
+    "INSERT INTO roster_check_summary "
+    "(guild_id, check_name, checked_at, member_count, ready_count, "
+    "one_short_count, one_short_players) "
+    "VALUES %s;"
+)
+ROSTER_CHECK_SUMMARY_TEMPLATE: str = "(%s, %s, NOW(), %s, %s, %s, %s)"
 
 
 def enter_gp_logs(gp_logs):
     """
     Enter player GP logs into the gp_history table
     """
-    pg_connection_dict = setup_connection()
     conn = None
     try:
         logger.info("Logging player GP ...")
-        conn = psycopg2.connect(**pg_connection_dict)
+        conn = get_connection()
 
         with conn.cursor() as cur:
-            cur.executemany(
+            inserted_count = execute_insert(
+                cur,
                 "INSERT INTO gp_history "
                 "(player_id, total_gp, timestamp) "
-                "VALUES (%s, %s, NOW());",
+                "VALUES %s;",
                 gp_logs,
+                "(%s, %s, NOW())",
             )
-            inserted_count = cur.rowcount
             logger.info("Inserted %s player GP logs", inserted_count)
             conn.commit()
             logger.info("Done")
-    except psycopg2.IntegrityError as ie:
+    except IntegrityError as ie:
         logger.error(
             "Data integrity error (duplicate keys, constraint violations): %s", ie
         )
         if conn:
             conn.rollback()
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
-
-
-def enter_player_check(player_checks):
-    """
-    Enter player checks into the players_roster_checks table
-    """
-    pg_connection_dict = setup_connection()
-    conn = None
-    try:
-        logger.info("Entering player checks into player_roster_checks table ...")
-        conn = psycopg2.connect(**pg_connection_dict)
-
-        with conn.cursor() as cur:
-            cur.executemany(
-                "INSERT INTO players_roster_checks "
-                "(reva_ready, gi_r7, bkm_r7, jkck_unlocked, "
-                "jkck_r7, cere_r7, jkck_skill_levels_done, player_id) "
-                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s);",
-                player_checks,
-            )
-            logger.info("Inserted into players_roster_checks")
-            conn.commit()
-            logger.info("Done")
-    except psycopg2.IntegrityError as ie:
-        logger.error(
-            "Data integrity error (duplicate keys, constraint violations): %s", ie
-        )
-        if conn:
-            conn.rollback()
-    except psycopg2.Error as db_error:
-        logger.error("Database error: %s", db_error)
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
-            conn.close()
+            release_connection(conn)
 
 
 def enter_tickets(tickets):
     """
     Enter ticket logs into the ticket_log table
     """
-    pg_connection_dict = setup_connection()
     conn = None
     try:
         logger.info("Logging tickets ...")
-        conn = psycopg2.connect(**pg_connection_dict)
+        conn = get_connection()
 
         with conn.cursor() as cur:
-            cur.executemany(
-                "INSERT INTO ticket_log "
-                "(player_id, created_at, tickets_lost) "
-                "VALUES (%s, NOW(), %s);",
-                tickets,
+            inserted_count = execute_insert(
+                cur, TICKETS_INSERT_SQL, tickets, TICKETS_TEMPLATE
             )
-            inserted_count = cur.rowcount
             logger.info("Inserted %s ticket logs", inserted_count)
             conn.commit()
             logger.info("Done")
-    except psycopg2.IntegrityError as ie:
+    except IntegrityError as ie:
         logger.error(
             "Data integrity error (duplicate keys, constraint violations): %s", ie
         )
         if conn:
             conn.rollback()
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
 
 def enter_raid_score_log(raid_score_logs):
     """
     Enter raid score logs into the raid_score_log table
     """
-    pg_connection_dict = setup_connection()
     conn = None
     try:
         logger.info("Logging raid score...")
-        conn = psycopg2.connect(**pg_connection_dict)
+        conn = get_connection()
 
         with conn.cursor() as cur:
-            cur.executemany(
+            inserted_count = execute_insert(
+                cur,
                 "INSERT INTO raid_score_log "
                 "(player_id, raid_score, percent_of_avg) "
-                "VALUES (%s, %s, %s);",
+                "VALUES %s;",
                 raid_score_logs,
+                "(%s, %s, %s)",
             )
-            inserted_count = cur.rowcount
             logger.info("Inserted %s raid score logs", inserted_count)
             conn.commit()
             logger.info("Done")
-    except psycopg2.IntegrityError as ie:
+    except IntegrityError as ie:
         logger.error(
             "Data integrity error (duplicate keys, constraint violations): %s", ie
         )
         if conn:
             conn.rollback()
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
 
 def enter_player_archive(players_to_insert):
     """
     Enter player data from ex guild members into the players_archive table
     """
-    pg_connection_dict = setup_connection()
     if not players_to_insert:
         logger.info("No players to insert.")
         return
@@ -221,38 +156,38 @@ def enter_player_archive(players_to_insert):
         logger.info(
             "Entering %s new players into players table...", len(players_to_insert)
         )
-        conn = psycopg2.connect(**pg_connection_dict)
+        conn = get_connection()
         with conn.cursor() as cur:
-            cur.executemany(
+            inserted_count = execute_insert(
+                cur,
                 "INSERT INTO players_archive "
                 "(player_id, nickname, total_gp, guild_id) "
-                "VALUES (%s, %s, %s, %s);",
+                "VALUES %s;",
                 players_to_insert,
+                "(%s, %s, %s, %s)",
             )
-            inserted_count = cur.rowcount
             logger.info("Inserted %s players data", inserted_count)
             conn.commit()
             logger.info("Done")
-    except psycopg2.IntegrityError as ie:
+    except IntegrityError as ie:
         logger.error(
             "Data integrity error (duplicate keys, constraint violations): %s", ie
         )
         if conn:
             conn.rollback()
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
 
 def enter_tb_data(tb_data):
     """
     Enter territory battle data into the tb_import table
     """
-    pg_connection_dict = setup_connection()
     if not tb_data:
         logger.warning("No TB data to insert")
         return
@@ -263,28 +198,200 @@ def enter_tb_data(tb_data):
             "Entering tb data about %s players into the tb_import table...",
             len(tb_data),
         )
-        conn = psycopg2.connect(**pg_connection_dict)
+        conn = get_connection()
         with conn.cursor() as cur:
-            cur.executemany(
+            inserted_count = execute_insert(
+                cur,
                 "INSERT INTO tb_import "
                 "(nickname, total_territory_points, total_waves_completed, total_missions_attempted, wave_completion_ratio, phases_missed) "
-                "VALUES (%s, %s, %s, %s, %s, %s);",
+                "VALUES %s;",
                 tb_data,
+                "(%s, %s, %s, %s, %s, %s)",
             )
-            inserted_count = cur.rowcount
             logger.info("Inserted %s players data", inserted_count)
             conn.commit()
             logger.info("Done")
-    except psycopg2.IntegrityError as ie:
+    except IntegrityError as ie:
         logger.error(
             "Data integrity error (duplicate keys, constraint violations): %s", ie
         )
         if conn:
             conn.rollback()
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+
+
+def enter_gp_snapshot(guild_ids: list[str]) -> int:
+    """
+    Log the current GP of every player in guild_ids into the gp_history table,
+    copying the rows inside the DB
+    """
+    if not guild_ids:
+        logger.warning("No guilds to log GP for")
+        return 0
+
+    conn = None
+    inserted_count = 0
+    try:
+        logger.info("Logging player GP for %s guilds ...", len(guild_ids))
+        conn = get_connection()
+
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO gp_history "
+                "(player_id, total_gp, timestamp) "
+                "SELECT player_id, total_gp, NOW() "
+                "FROM players WHERE guild_id::text = ANY(%s);",
+                (list(guild_ids),),
+            )
+            inserted_count = cur.rowcount
+            logger.info("Inserted %s player GP logs", inserted_count)
+            conn.commit()
+            logger.info("Done")
+    except IntegrityError as ie:
+        logger.error(
+            "Data integrity error (duplicate keys, constraint violations): %s", ie
+        )
+        if conn:
+            conn.rollback()
+    except DatabaseError as db_error:
+        logger.error("Database error: %s", db_error)
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            release_connection(conn)
+    return inserted_count
+
+
+def enter_raid_score_snapshot(guild_ids: list[str]) -> int:
+    """
+    Log the current raid performance of every player in guild_ids into the
+    raid_score_log table, copying the rows inside the DB
+    """
+    if not guild_ids:
+        logger.warning("No guilds to log raid scores for")
+        return 0
+
+    conn = None
+    inserted_count = 0
+    try:
+        logger.info("Logging raid score for %s guilds ...", len(guild_ids))
+        conn = get_connection()
+
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO raid_score_log "
+                "(player_id, raid_score, percent_of_avg) "
+                "SELECT p.player_id, rp.score, rp.percent_of_average "
+                "FROM players p "
+                "LEFT JOIN raid_performance rp "
+                "ON p.nickname = rp.nickname "
+                "WHERE p.guild_id::text = ANY(%s);",
+                (list(guild_ids),),
+            )
+            inserted_count = cur.rowcount
+            logger.info("Inserted %s raid score logs", inserted_count)
+            conn.commit()
+            logger.info("Done")
+    except IntegrityError as ie:
+        logger.error(
+            "Data integrity error (duplicate keys, constraint violations): %s", ie
+        )
+        if conn:
+            conn.rollback()
+    except DatabaseError as db_error:
+        logger.error("Database error: %s", db_error)
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            release_connection(conn)
+    return inserted_count
+
+
+def ensure_roster_check_summary():
+    """
+    Create the roster_check_summary table, if it doesn't exist yet
+    """
+    conn = None
+    try:
+        conn = get_connection()
+
+        with conn.cursor() as cur:
+            cur.execute(ROSTER_CHECK_SUMMARY_DDL)
+            conn.commit()
+
+    except DatabaseError as db_error:
+        logger.error("Database error: %s", db_error)
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            release_connection(conn)
+
+
+def enter_roster_check_summary(summary_rows: list[tuple]) -> int:
+    """
+    Enter the guild-wide ready / one short counts of every roster check into roster_check_summary.
+    The table has to exist, see ensure_roster_check_summary
+    """
+    if not summary_rows:
+        logger.info("No roster check summary to enter.")
+        return 0
+
+    conn = None
+    inserted_count = 0
+    try:
+        conn = get_connection()
+
+        with conn.cursor() as cur:
+            inserted_count = execute_insert(
+                cur,
+                ROSTER_CHECK_SUMMARY_INSERT_SQL,
+                summary_rows,
+                ROSTER_CHECK_SUMMARY_TEMPLATE,
+            )
+            conn.commit()
+            logger.info("Inserted %s rows into roster_check_summary", inserted_count)
+    except IntegrityError as ie:
+        logger.error(
+            "Data integrity error (duplicate keys, constraint violations): %s", ie
+        )
+        if conn:
+            conn.rollback()
+    except DatabaseError as db_error:
+        logger.error("Database error: %s", db_error)
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            release_connection(conn)
+    return inserted_count
+
+
+async def enter_tickets_async(tickets) -> int:
+    """
+    Async variant of enter_tickets
+    """
+    inserted_count = await execute_batch_values_async(
+        TICKETS_INSERT_SQL, tickets, TICKETS_TEMPLATE
+    )
+    logger.info("Inserted %s ticket logs", inserted_count)
+    return inserted_count
+
+
+async def enter_roster_check_summary_async(summary_rows: list[tuple]) -> int:
+    """
+    Async variant of enter_roster_check_summary
+    """
+    if not summary_rows:
+        return 0
+    return await execute_batch_values_async(
+        ROSTER_CHECK_SUMMARY_INSERT_SQL, summary_rows, ROSTER_CHECK_SUMMARY_TEMPLATE
+    )
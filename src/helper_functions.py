@@ -3,6 +3,8 @@ import logging.config
 import logging
 from pathlib import Path
 import os
+import re
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -91,3 +93,30 @@ def floatify(x: int | str | float) -> float | str:
     except (ValueError, TypeError) as e:
         logger.exception("Cannot convert %s to float: %s", x, e)
         return "-"
+
+
+def check_sql_identifier(name, error_str: str) -> str:
+    """
+    Make sure a name is a plain lower case SQL identifier, before it's put into a SQL string
+    """
+    if not isinstance(name, str) or re.fullmatch(r"[a-z_][a-z0-9_]*", name) is None:
+        logger.error(error_str)
+        raise ValueError(error_str)
+    return name
+
+
+def atomic_write_json(path: str, data, **dump_kwargs) -> None:
+    """
+    Write data as JSON to a temp file next to path and move it into place,
+    so readers never see a half-written file. Raises OSError if the write fails
+    """
+    directory: str = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
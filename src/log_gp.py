@@ -1,27 +1,26 @@
 import logging
 from .helper_functions import check_none_list, setup_logging
-from .read_data import read_players, read_guild
-from .enter_data import enter_gp_logs
+from .read_data import read_guild
+from .enter_data import enter_gp_snapshot
 
 logger = logging.getLogger("guild_data_app")
 setup_logging()
 
-if __name__ == "__main__":
-    gp_logs = []
+
+def process_gp_log():
+    """
+    Log the current GP of all players in the tracked guilds, copied inside the DB
+    """
     guilds_config = check_none_list(
         read_guild(), "Guild should not be None. Check read_guild function"
     )
     logger.debug("After Import: %s", guilds_config)
 
     for g in guilds_config:
-        logger.debug("g: %s", g)
+        logger.info("Logging GP for: %s", g[1])
 
-        db_players = check_none_list(
-            read_players(g[0]), "Players should not be None. Check read_players function"
-        )
+    enter_gp_snapshot([g[0] for g in guilds_config])
 
-        for e in db_players:
-            gp_logs.append((e[0], e[2]))
-        logger.info("Logging GP for: %s", g[1])
 
-    enter_gp_logs(gp_logs)
+if __name__ == "__main__":
+    process_gp_log()
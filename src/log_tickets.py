@@ -1,11 +1,12 @@
 import os
-import json
 import logging
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from .read_data import read_guild
 from .api_request import post_request
-from .enter_data import enter_tickets
+from .comlink_models import GuildSnapshot
+from .enter_data import enter_tickets, enter_tickets_async
+from .db_async import use_async_db, run_async_job, run_overlapped
 from .helper_functions import check_none_list, check_none_str, setup_logging
 
 
@@ -32,6 +33,39 @@ def is_around_reset_time(reset_time, now=None):
     return window_start <= now <= reset_datetime
 
 
+def fetch_guild_tickets(g: tuple, guild_url: str) -> list | None:
+    """
+    Fetch guild data and build the ticket logs of guild g, if it's the guild's reset time
+    """
+    if not is_around_reset_time(g[2]):
+        logger.debug("Continue triggered. Not reset time")
+        return None
+    # Not read through the response cache, a cached payload may predate the last ticket updates
+    guild = GuildSnapshot.from_response(
+        post_request(
+            guild_url,
+            {"payload": {"guildId": g[0], "includeRecentGuildActivityInfo": True}},
+        )
+    )
+    tickets = [(m.player_id, m.missing_tickets) for m in guild.members]
+
+    # filter out players that reached the required 600 tickets
+    return list(filter(lambda x: x[1] > 0, tickets))
+
+
+async def log_guild_tickets_async(g: tuple, tickets: list | None) -> None:
+    """
+    Write the ticket logs of guild g through the async DB layer
+    """
+    if tickets is None:
+        return
+    if tickets:
+        logger.info("Logging tickets for: %s", g[1])
+        await enter_tickets_async(tickets)
+    else:
+        logger.info("No tickets to log for: %s", g[1])
+
+
 def process_ticket_log():
     """
     Checks if it's a guild's reset time, if so, fetches guild data and logs tickets to DB
@@ -45,33 +79,21 @@ def process_ticket_log():
         read_guild(), "guilds should not be None. Check read_guilds function"
     )
 
-    for g in guilds_config:
-        if not is_around_reset_time(g[2]):
-            logger.debug("Continue triggered. Not reset time")
-            continue
-        guild = json.dumps(
-            post_request(
-                guild_url,
-                {"payload": {"guildId": g[0], "includeRecentGuildActivityInfo": True}},
+    if use_async_db():
+        # Write the tickets of one guild while the next guild is fetched
+        run_async_job(
+            run_overlapped(
+                guilds_config,
+                lambda g: fetch_guild_tickets(g, guild_url),
+                log_guild_tickets_async,
             )
         )
-        data = json.loads(guild)["guild"]["member"]
-
-        tickets = [
-            (
-                m["playerId"],
-                600
-                - int(
-                    list(filter(lambda t: t["type"] == 2, m["memberContribution"]))[0][
-                        "currentValue"
-                    ]
-                ),
-            )
-            for m in data
-        ]
+        return
 
-        # filter out players that reached the required 600 tickets
-        tickets = list(filter(lambda x: x[1] > 0, tickets))
+    for g in guilds_config:
+        tickets = fetch_guild_tickets(g, guild_url)
+        if tickets is None:
+            continue
         if tickets:
             logger.info("Logging tickets for: %s", g[1])
             enter_tickets(tickets)
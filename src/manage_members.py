@@ -1,59 +1,113 @@
-import json
 import os
-from datetime import datetime as dt
 import logging
 from dotenv import load_dotenv
 
 from .api_request import post_request
+from .comlink_models import GuildSnapshot
+from .comlink_models import Member
+from .membership_diff import MembershipDiff, diff_membership
+from .member_state_cache import MemberStateCache, get_member_state_path
 from .archive_players import archive_process
-from .enter_data import enter_players
 from .read_data import read_guild, read_players
-from .update_data import remove_from_guild, update_activity, updateGP
+from .update_data import (
+    apply_membership_diff,
+    apply_membership_diff_async,
+    reconcile_guild_members,
+    reconcile_guild_members_async,
+)
+from .db_async import use_async_db, run_async_job, run_overlapped
 from .helper_functions import check_none_str, check_none_list, setup_logging
 
 
 logger = logging.getLogger("guild_data_app")
 setup_logging()
 
-dtime = dt.now()
-
-
-class Player:
-    def __init__(
-        self,
-        player_id: str,
-        nickname: str,
-        galactic_power: int,
-        fleet_gp: int,
-        ground_gp: int,
-        guild_id: str,
-        last_activity_time,
-        current_tickets: int,
-    ):
-        self.player_id = player_id
-        self.nickname = nickname
-        self.guild_id = guild_id
-        self.galactic_power = galactic_power
-        self.fleet_gp = fleet_gp
-        self.ground_gp = ground_gp
-        self.last_activity_time = dt.fromtimestamp(int(last_activity_time) / 1000)
-        self.current_tickets = current_tickets
-        update_activity(self.last_activity_time, self.player_id)
-        updateGP(self.galactic_power, self.player_id)
-
-    def __str__(self):
-        return f"{self.nickname}"
-
-    def dbify(self):
-        return (
-            self.player_id,
-            self.nickname,
-            self.galactic_power,
-            self.guild_id,
-            self.last_activity_time,
+
+def get_member_sync_mode() -> str:
+    """
+    Get the membership sync mode from the optional MEMBER_SYNC_MODE env var.
+    'diff' (default) diffs the members in Python, 'merge' reconciles them with one
+    MERGE statement per guild (Postgres 15+)
+    """
+    mode: str = os.getenv("MEMBER_SYNC_MODE", "diff").lower()
+    if mode not in ("diff", "merge"):
+        logger.warning("Invalid MEMBER_SYNC_MODE: %s. Using diff", mode)
+        return "diff"
+    return mode
+
+
+def fetch_guild(g: tuple, guild_url: str) -> GuildSnapshot:
+    """
+    Fetch the (cached) guild payload of guild g
+    """
+    return GuildSnapshot.from_response(
+        post_request(
+            guild_url,
+            {"payload": {"guildId": g[0], "includeRecentGuildActivityInfo": True}},
+            cached=True,
         )
+    )
 
-if __name__ == "__main__":
+
+def fetch_guild_members(g: tuple, guild_url: str) -> MembershipDiff:
+    """
+    Fetch the members of guild g and diff them against the players in the DB by player_id
+    """
+    guild = fetch_guild(g, guild_url)
+    db_players = check_none_list(
+        read_players(g[0]), "Players should not be None. Check read_players function"
+    )
+    diff = diff_membership(g[0], guild.members, db_players)
+
+    logger.info("--players to remove--")
+    logger.info(diff.left)
+    return diff
+
+
+def write_guild_members(diff: MembershipDiff, state_cache: MemberStateCache) -> None:
+    """
+    Write the member changes of a guild, leaving out members whose state was already written
+    """
+    if apply_membership_diff(state_cache.suppress_unchanged(diff)):
+        state_cache.record(diff.guild_id, diff.members)
+
+
+async def write_guild_members_async(diff: MembershipDiff, state_cache: MemberStateCache) -> None:
+    """
+    Write the member changes of a guild through the async DB layer
+    """
+    if await apply_membership_diff_async(state_cache.suppress_unchanged(diff)):
+        state_cache.record(diff.guild_id, diff.members)
+
+
+def merge_guild_members(
+    guild_id: str, members: tuple[Member, ...], state_cache: MemberStateCache
+) -> None:
+    """
+    Reconcile the players of a guild with its members, unless nothing changed since the last merge
+    """
+    if state_cache.is_unchanged(guild_id, members):
+        return
+    if reconcile_guild_members(guild_id, members) or not members:
+        state_cache.record(guild_id, members)
+
+
+async def merge_guild_members_async(
+    guild_id: str, members: tuple[Member, ...], state_cache: MemberStateCache
+) -> None:
+    """
+    Async variant of merge_guild_members
+    """
+    if state_cache.is_unchanged(guild_id, members):
+        return
+    if await reconcile_guild_members_async(guild_id, members) or not members:
+        state_cache.record(guild_id, members)
+
+
+def process_members():
+    """
+    Sync the members of all tracked guilds into the DB and archive players that left
+    """
     # Load environment variables from .env file
     load_dotenv()
     guild_url: str = check_none_str(
@@ -64,60 +118,40 @@ if __name__ == "__main__":
         read_guild(), "guilds should not be None. Check read_guilds function"
     )
     logger.debug("After Import: %s", guilds_config)
-
-
-    for g in guilds_config:
-        guild = json.dumps(
-            post_request(
-                guild_url,
-                {"payload": {"guildId": g[0], "includeRecentGuildActivityInfo": True}},
-            )
-        )
-        data = json.loads(guild)["guild"]["member"]
-        playerArr = []
-        nicknameArr = []
-        for m in data:
-            playerArr.append(
-                Player(
-                    m["playerId"],
-                    m["playerName"],
-                    m["galacticPower"],
-                    m["shipGalacticPower"],
-                    m["characterGalacticPower"],
-                    g[0],
-                    m["lastActivityTime"],
-                    600
-                    - int(
-                        list(filter(lambda t: t["type"] == 2, m["memberContribution"]))[0][
-                            "currentValue"
-                        ]
-                    ),
+    state_cache = MemberStateCache(get_member_state_path())
+
+    if get_member_sync_mode() == "merge":
+        if use_async_db():
+            # Merge the members of one guild while the next guild is fetched
+            run_async_job(
+                run_overlapped(
+                    guilds_config,
+                    lambda g: fetch_guild(g, guild_url).members,
+                    lambda g, members: merge_guild_members_async(g[0], members, state_cache),
                 )
             )
-            nicknameArr.append(m["playerName"])
-
-        db_nicknames = []
-        db_players = check_none_list(
-            read_players(g[0]), "Players should not be None. Check read_players function"
+        else:
+            for g in guilds_config:
+                merge_guild_members(g[0], fetch_guild(g, guild_url).members, state_cache)
+    elif use_async_db():
+        # Write the members of one guild while the next guild is fetched
+        run_async_job(
+            run_overlapped(
+                guilds_config,
+                lambda g: fetch_guild_members(g, guild_url),
+                lambda g, diff: write_guild_members_async(diff, state_cache),
+            )
         )
-        for n in db_players:
-            db_nicknames.append(n[1])
-
-        to_add = list(set(nicknameArr) - set(db_nicknames))
-        to_remove = list(set(db_nicknames) - set(nicknameArr))
-
-        players_to_add = [x for x in playerArr if x.nickname in to_add]
-        players_to_remove = [y for y in to_remove if y[1] not in playerArr]
-        enterArr = []
-        for w in players_to_add:
-            enterArr.append(w.dbify())
+    else:
+        for g in guilds_config:
+            write_guild_members(fetch_guild_members(g, guild_url), state_cache)
 
-        enter_players(enterArr)
-
-        logger.info("--players to remove--")
-        logger.info(players_to_remove)
-        for i in players_to_remove:
-            remove_from_guild(i)
+    state_cache.save()
+    logger.info("Suppressed %s unchanged member writes", state_cache.suppressed)
 
     # archive players after their guild affiliation was removed
     archive_process()
+
+
+if __name__ == "__main__":
+    process_members()
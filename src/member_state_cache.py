@@ -0,0 +1,96 @@
+"""
+Last written state of every guild member, kept in a local state file between member syncs.
+The member sync runs every few minutes, while nickname, GP and activity of most members
+rarely change, so members whose state matches the last successful write are not written again.
+"""
+
+import json
+import logging
+import os
+import tempfile
+from dataclasses import replace
+from .comlink_models import Member
+from .membership_diff import MembershipDiff
+from .helper_functions import atomic_write_json, setup_logging
+
+
+logger = logging.getLogger("guild_data_app")
+setup_logging()
+
+
+def get_member_state_path() -> str:
+    """
+    Get the state file path from the optional MEMBER_STATE_PATH env var
+    """
+    return os.getenv(
+        "MEMBER_STATE_PATH", os.path.join(tempfile.gettempdir(), "swgoh_member_state.json")
+    )
+
+
+class MemberStateCache:
+    """
+    [nickname, GP, last activity ms] of the members of every guild by player_id,
+    as last written to the DB, and the number of writes suppressed this cycle
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.guilds: dict[str, dict[str, list]] = self._load()
+        self.suppressed = 0
+
+    def _load(self) -> dict[str, dict[str, list]]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                guilds = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return guilds if isinstance(guilds, dict) else {}
+
+    @staticmethod
+    def _state(member: Member) -> list:
+        return [member.player_name, member.galactic_power, member.last_activity_ms]
+
+    def changed_members(
+        self, guild_id: str, members: tuple[Member, ...] | list[Member]
+    ) -> list[Member]:
+        """
+        Get the members whose state differs from the last write, counting the others as suppressed
+        """
+        last_states = self.guilds.get(str(guild_id), {})
+        changed = [m for m in members if last_states.get(m.player_id) != self._state(m)]
+        self.suppressed += len(members) - len(changed)
+        return changed
+
+    def suppress_unchanged(self, diff: MembershipDiff) -> MembershipDiff:
+        """
+        Drop the members with an unchanged state from the state sync of a membership diff
+        """
+        return replace(diff, members=tuple(self.changed_members(diff.guild_id, diff.members)))
+
+    def is_unchanged(self, guild_id: str, members: tuple[Member, ...] | list[Member]) -> bool:
+        """
+        Check if a guild has exactly the members and states of the last write.
+        Counts all members as suppressed if it has
+        """
+        last_states = self.guilds.get(str(guild_id))
+        if last_states is None or len(last_states) != len(members):
+            return False
+        if any(last_states.get(m.player_id) != self._state(m) for m in members):
+            return False
+        self.suppressed += len(members)
+        return True
+
+    def record(self, guild_id: str, members: tuple[Member, ...] | list[Member]) -> None:
+        """
+        Remember the states of the members of a guild after they were written
+        """
+        self.guilds[str(guild_id)] = {m.player_id: self._state(m) for m in members}
+
+    def save(self) -> None:
+        """
+        Write the state file. It is written to a temp file first and then moved into place
+        """
+        try:
+            atomic_write_json(self.path, self.guilds, separators=(",", ":"))
+        except OSError as e:
+            logger.warning("Could not write member state file %s: %s", self.path, e)
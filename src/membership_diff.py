@@ -0,0 +1,63 @@
+"""
+Diff of the members of a guild against its players in the DB, keyed by player_id.
+Players are indexed once, so a diff is linear in the number of members and a
+renamed player is a rename instead of a leave and a join.
+"""
+
+from dataclasses import dataclass
+from .comlink_models import Member
+
+
+def player_row(member: Member, guild_id: str) -> tuple:
+    """
+    Build the players table row of a guild member
+    """
+    return (
+        member.player_id,
+        member.player_name,
+        member.galactic_power,
+        guild_id,
+        member.last_activity_time,
+    )
+
+
+@dataclass(slots=True, frozen=True)
+class MembershipDiff:
+    """
+    The membership changes of a guild: the current members, the members that joined,
+    the (player_id, nickname) of renamed players and the player_ids of players that left
+    """
+
+    guild_id: str
+    members: tuple[Member, ...]
+    joined: tuple[Member, ...]
+    renamed: tuple[tuple[str, str], ...]
+    left: tuple[str, ...]
+
+    def joined_rows(self) -> list[tuple]:
+        return [player_row(m, self.guild_id) for m in self.joined]
+
+
+def diff_membership(
+    guild_id: str, members: tuple[Member, ...] | list[Member], db_players: list
+) -> MembershipDiff:
+    """
+    Diff the members of a guild against its players rows (player_id, nickname, ...) in the DB
+    """
+    db_nicknames: dict[str, str] = {row[0]: row[1] for row in db_players}
+    member_ids: set[str] = set()
+    joined: list[Member] = []
+    renamed: list[tuple[str, str]] = []
+    for m in members:
+        member_ids.add(m.player_id)
+        if m.player_id not in db_nicknames:
+            joined.append(m)
+        elif db_nicknames[m.player_id] != m.player_name:
+            renamed.append((m.player_id, m.player_name))
+    return MembershipDiff(
+        guild_id=guild_id,
+        members=tuple(members),
+        joined=tuple(joined),
+        renamed=tuple(renamed),
+        left=tuple(p for p in db_nicknames if p not in member_ids),
+    )
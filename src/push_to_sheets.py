@@ -1,7 +1,4 @@
-import os
-from pathlib import Path
 import logging
-import gspread
 import pandas as pd
 import psycopg2
 from dotenv import load_dotenv
@@ -14,8 +11,14 @@ from .read_data import (
     get_last_tb_data_ordered,
     read_raid_progression,
 )
-from .spreadsheet_operations import write_to_sheet, check_order, check_timeframe
-from .helper_functions import check_none_str, check_none_list, setup_logging, floatify
+from .db_connection import read_session
+from .spreadsheet_operations import (
+    write_to_sheet,
+    check_order,
+    check_timeframe,
+    clear_spreadsheet_values,
+)
+from .helper_functions import check_none_list, setup_logging, floatify
 
 logger = logging.getLogger("guild_data_app")
 setup_logging()
@@ -26,12 +29,8 @@ def spreadsheet_update():
     """
     Update the Google Sheets with the latest data from the database
     """
-    # Create gspread object to interact with spreadsheet API
-    filepath: str = check_none_str(
-        os.getenv("FILEPATH_CREDENTIALS"),
-        "FILEPATH_CREDENTIALS should not be None. Check .env file",
-    )
-    gc = gspread.service_account(filename=Path(filepath))
+    # Spreadsheet values may have changed since the last update of this process
+    clear_spreadsheet_values()
 
     guilds_config = check_none_list(
         read_guild(), "guilds should not be None. Check read_guilds function"
@@ -46,9 +45,29 @@ def spreadsheet_update():
     RAID_PROGRESSION_SHEET = "Raid_progression"
 
     for g in guilds_config:
+        # Read the sheet settings first, so the DB snapshot is not held open during API calls
+        main_order = check_order(g, MAIN_SHEET)
+        tickets_weekly_order = check_order(g, TICKETS_WEEKLY_SHEET)
+        tickets_monthly_order = check_order(g, TICKETS_MONTHLY_SHEET)
+        points_weekly_order = check_order(g, POINTS_WEEKLY_SHEET)
+        last_tb_data_order = check_order(g, LAST_TB_DATA_SHEET)
+        raid_progression_timeframe = check_timeframe(g, RAID_PROGRESSION_SHEET)
+        raid_progression_order = check_order(g, RAID_PROGRESSION_SHEET)
+
+        # All sheet queries of a guild share one connection and one consistent snapshot
+        with read_session():
+            main_rows = read_players_data_full_rote(g[0], main_order)
+            tickets_weekly_rows = read_tickets_weekly(g[0], tickets_weekly_order)
+            tickets_monthly_rows = read_tickets_monthly(g[0], tickets_monthly_order)
+            member_points_rows = read_member_points(g[0], points_weekly_order)
+            last_tb_rows = get_last_tb_data_ordered(g[0], last_tb_data_order)
+            raid_progression_rows = read_raid_progression(
+                g[0], raid_progression_timeframe, raid_progression_order
+            )
+
         try:
             df_main = pd.DataFrame(
-                read_players_data_full_rote(g[0], check_order(g, MAIN_SHEET)),
+                main_rows,
                 columns=[
                     "nickname",
                     "last_activity",
@@ -73,19 +92,19 @@ def spreadsheet_update():
 
         try:
             df_weekly = pd.DataFrame(
-                read_tickets_weekly(g[0], check_order(g, TICKETS_WEEKLY_SHEET)),
+                tickets_weekly_rows,
                 columns=["nickname", "tickets_lost", "days_tickets_lost", "full_days_lost"],
             )
             df_weekly = df_weekly.dropna()
 
             df_monthly = pd.DataFrame(
-                read_tickets_monthly(g[0], check_order(g, TICKETS_MONTHLY_SHEET)),
+                tickets_monthly_rows,
                 columns=["nickname", "tickets_lost", "days_tickets_lost", "full_days_lost"],
             )
             df_monthly = df_monthly.dropna()
 
             df_weekly_points = pd.DataFrame(
-                read_member_points(g[0], check_order(g, POINTS_WEEKLY_SHEET)),
+                member_points_rows,
                 columns=[
                     "player_id",
                     "nickname",
@@ -111,7 +130,7 @@ def spreadsheet_update():
 
         try:
             df_tb = pd.DataFrame(
-                get_last_tb_data_ordered(g[0], check_order(g, LAST_TB_DATA_SHEET)),
+                last_tb_rows,
                 columns=[
                     "nickname",
                     "total_territory_points",
@@ -133,7 +152,7 @@ def spreadsheet_update():
         
         try:
             df_raid_progression = pd.DataFrame(
-                read_raid_progression(g[0], check_timeframe(g, RAID_PROGRESSION_SHEET), check_order(g, RAID_PROGRESSION_SHEET)),
+                raid_progression_rows,
                 columns=[
                     "nickname",
                     "last_raid_result",
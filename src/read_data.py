@@ -1,32 +1,17 @@
 import logging
-import psycopg2
-from .helper_functions import get_env, setup_logging
-
+from .db_connection import (
+    get_connection,
+    release_connection,
+    get_session_connection,
+    DatabaseError,
+)
+from .helper_functions import setup_logging
 
 
 logger = logging.getLogger("guild_data_app")
 setup_logging()
 
 
-def setup_connection() -> dict:
-    """
-    Set up psql connection dict with params from .env file
-    """
-    password : str = get_env("PASS")
-    host : str = get_env("HOST")
-    user : str = get_env("USER")
-    db_name : str = get_env("DBNAME")
-    port : int = int(get_env("PORT"))
-
-    connection_dict : dict = {
-        "dbname": db_name,
-        "user": user,
-        "password": password,
-        "port": port,
-        "host": host,
-    }
-    return connection_dict
-
 def get_valid_order_parameter(order_param: str) -> str:
     """
     Validate given order param from spreadsheet against whitelist to prevent SQL injection
@@ -94,13 +79,13 @@ def get_valid_timeframe_parameter(timeframe_param: str) -> str:
 
 def make_sql_query_single(sql_query_str: str, query_source: str, sql_tuple: tuple | None = None) -> list:
     """
-    Make a sql query to psql DB
+    Make a sql query to psql DB. Uses the connection of an active read session, if there is one
     """
-    pg_connection_dict = setup_connection()
+    session_conn = get_session_connection()
     conn = None
     try:
         logger.info("Getting guild from %s...", query_source)
-        conn = psycopg2.connect(**pg_connection_dict)
+        conn = session_conn or get_connection()
 
         with conn.cursor() as cur:
             if sql_tuple:
@@ -119,12 +104,18 @@ def make_sql_query_single(sql_query_str: str, query_source: str, sql_tuple: tupl
                 return []
             return rows
 
-    except psycopg2.Error as e:
+    except DatabaseError as e:
         logger.debug("Connection failed: %s", e)
+        if conn and conn is session_conn:
+            # Leave the aborted transaction, so later reads of the session still work
+            try:
+                conn.rollback()
+            except DatabaseError:
+                pass
         return []
     finally:
-        if conn:
-            conn.close()
+        if conn and conn is not session_conn:
+            release_connection(conn)
 
 
 def read_guild() -> list[tuple] | list:
@@ -156,7 +147,6 @@ def read_players(guild_id) -> list:
     return query_return
 
 
-
 def read_roster_check() -> list:
     """
     Get the players_roster_checks view for everyone in the DB
@@ -167,6 +157,27 @@ def read_roster_check() -> list:
     return query_return
 
 
+def read_roster_check_plan(rules_version: str, max_age_hours: int) -> list:
+    """
+    Get every player of the tracked guilds with the state of their last roster check and
+    whether they are new (never checked) or stale (checked under other rules or too long ago)
+    """
+    query_str: str = (
+        "SELECT p.player_id, p.guild_id, s.fingerprint, s.character_gp, s.rules_version, s.missing, "
+        "s.player_id IS NULL AS is_new, "
+        "s.player_id IS NOT NULL AND (s.rules_version <> %s "
+        "OR s.checked_at < NOW() - make_interval(hours => %s)) AS is_stale "
+        "FROM players p "
+        "JOIN guild g ON g.guild_id = p.guild_id "
+        "LEFT JOIN roster_check_state s ON s.player_id = p.player_id "
+        "ORDER BY p.guild_id, p.nickname DESC;"
+    )
+    query_source: str = "roster_check_state"
+    query_tuple: tuple = (rules_version, max_age_hours)
+    query_return: list = make_sql_query_single(query_str, query_source, query_tuple)
+    return query_return
+
+
 def read_tickets_weekly(guild_id: str, order_str: str) -> list:
     """
     Get the weekly accumulated ticket violations for guild_id, ordered by order_str
@@ -1,36 +1,15 @@
 import logging
-import psycopg2
-from .helper_functions import setup_logging, get_env
+from .db_connection import get_connection, release_connection, DatabaseError
+from .helper_functions import setup_logging
 
 logger = logging.getLogger("guild_data_app")
 setup_logging()
 
 
-def setup_connection():
-    """
-    Set up psql connection dict with params from .env file
-    """
-    password: str = get_env("PASS")
-    host: str = get_env("HOST")
-    user: str = get_env("USER")
-    db_name: str = get_env("DBNAME")
-    port: int = int(get_env("PORT"))
-
-    connection_dict = {
-        "dbname": db_name,
-        "user": user,
-        "password": password,
-        "port": port,
-        "host": host,
-    }
-    return connection_dict
-
-
 def remove_from_players(players_to_remove):
     """
     Remove a player from the players table
     """
-    pg_connection_dict = setup_connection()
     if not players_to_remove:
         logger.info("No players to remove.")
         return
@@ -38,7 +17,7 @@ def remove_from_players(players_to_remove):
     conn = None
     try:
         logger.info("Removing %s old guild members...", len(players_to_remove))
-        conn = psycopg2.connect(**pg_connection_dict)
+        conn = get_connection()
         with conn.cursor() as cur:
             cur.executemany(
                 "DELETE FROM players WHERE player_id = %s;",
@@ -48,10 +27,50 @@ def remove_from_players(players_to_remove):
             logger.info("Removed %s old guild members", deleted_count)
             conn.commit()
             logger.info("Done")
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
+        logger.error("Database error: %s", db_error)
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            release_connection(conn)
+
+
+def archive_players_outside(guild_ids: list[str]) -> int:
+    """
+    Move all players that are not in one of guild_ids from the players table
+    into the players_archive table in one statement
+    """
+    if not guild_ids:
+        logger.warning("No tracked guilds given. Not archiving any players.")
+        return 0
+
+    conn = None
+    archived_count = 0
+    try:
+        logger.info("Archiving players outside of %s tracked guilds...", len(guild_ids))
+        conn = get_connection()
+        with conn.cursor() as cur:
+            cur.execute(
+                "WITH moved AS ("
+                "DELETE FROM players "
+                "WHERE guild_id IS NULL OR guild_id::text <> ALL(%s) "
+                "RETURNING player_id, nickname, total_gp, guild_id"
+                ") "
+                "INSERT INTO players_archive "
+                "(player_id, nickname, total_gp, guild_id) "
+                "SELECT player_id, nickname, total_gp, guild_id FROM moved;",
+                (list(guild_ids),),
+            )
+            archived_count = cur.rowcount
+            logger.info("Archived %s old guild members", archived_count)
+            conn.commit()
+            logger.info("Done")
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+    return archived_count
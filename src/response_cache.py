@@ -0,0 +1,187 @@
+"""
+On-disk TTL cache for comlink responses, shared by all cron jobs of a container.
+Entries are keyed by endpoint and payload and written atomically, so a job never
+reads a half-written file. A lock file per key makes concurrent jobs wait for the
+first fetch instead of sending the same request again.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable
+from urllib.parse import urlsplit
+from .helper_functions import atomic_write_json, setup_logging
+
+try:
+    import fcntl
+except ImportError:  # no file locks on Windows, concurrent misses fetch twice there
+    fcntl = None
+
+
+logger = logging.getLogger("guild_data_app")
+setup_logging()
+
+DEFAULT_CACHE_TTLS: dict[str, float] = {"/guild": 60}
+
+_cache = None
+
+
+def get_cache_ttls() -> dict[str, float]:
+    """
+    Get the per-endpoint TTLs in seconds from the optional COMLINK_CACHE_TTLS env var,
+    e.g. '/guild=60,/player=300'. A TTL of 0 disables caching for that endpoint
+    """
+    ttls_str: str | None = os.getenv("COMLINK_CACHE_TTLS")
+    if not ttls_str:
+        return dict(DEFAULT_CACHE_TTLS)
+    ttls: dict[str, float] = {}
+    for entry in ttls_str.split(","):
+        endpoint, _, ttl = entry.strip().partition("=")
+        try:
+            ttls[endpoint.strip()] = float(ttl)
+        except ValueError:
+            logger.warning("Invalid COMLINK_CACHE_TTLS entry: %s", entry)
+    return ttls
+
+
+class ResponseCache:
+    """
+    Directory of JSON files, one per (endpoint, payload), each valid for the TTL of its endpoint
+    """
+
+    def __init__(self, directory: str, ttls: dict[str, float]):
+        self.directory = directory
+        self.ttls = ttls
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def log_stats(self) -> None:
+        """
+        Log the cache hits and misses
+        """
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        if hits + misses:
+            logger.info(
+                "Comlink cache: %s hits, %s misses, hit rate %.1f%%",
+                hits,
+                misses,
+                100 * hits / (hits + misses),
+            )
+
+    def ttl(self, url: str) -> float:
+        """
+        Get the TTL of the endpoint of url. 0 if its responses are not cached
+        """
+        return self.ttls.get(urlsplit(url).path or url, 0)
+
+    def _path(self, url: str, payload: dict) -> str:
+        """
+        Get the cache file path of a request
+        """
+        key_str: str = json.dumps(
+            [urlsplit(url).path or url, payload], sort_keys=True, separators=(",", ":")
+        )
+        return os.path.join(self.directory, hashlib.sha256(key_str.encode()).hexdigest() + ".json")
+
+    def get(self, url: str, payload: dict) -> Any | None:
+        """
+        Get the cached response of a request if it's younger than the endpoint TTL
+        """
+        ttl: float = self.ttl(url)
+        if ttl <= 0:
+            return None
+        try:
+            with open(self._path(url, payload), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("stored_at", 0) > ttl:
+            return None
+        return entry.get("response")
+
+    def put(self, url: str, payload: dict, response: Any) -> None:
+        """
+        Store a response. The file is written to a temp file first and then moved into place
+        """
+        if self.ttl(url) <= 0 or response is None:
+            return
+        path: str = self._path(url, payload)
+        try:
+            atomic_write_json(path, {"stored_at": time.time(), "response": response})
+        except OSError as e:
+            logger.warning("Could not write comlink cache file %s: %s", path, e)
+
+    @contextmanager
+    def _lock(self, url: str, payload: dict):
+        """
+        Hold an exclusive lock on the cache entry of a request
+        """
+        if fcntl is None:
+            yield
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            lock_file = open(self._path(url, payload) + ".lock", "a")
+        except OSError as e:
+            logger.warning("Could not lock comlink cache entry: %s", e)
+            yield
+            return
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_or_fetch(self, url: str, payload: dict, fetch: Callable[[], Any]) -> Any | None:
+        """
+        Return the cached response of a request or fetch and store it.
+        Concurrent callers of the same request wait for the first fetch
+        """
+        if self.ttl(url) <= 0:
+            return fetch()
+        response = self.get(url, payload)
+        if response is not None:
+            self._count(hit=True)
+            return response
+        with self._lock(url, payload):
+            # another job may have fetched it while we were waiting for the lock
+            response = self.get(url, payload)
+            if response is not None:
+                self._count(hit=True)
+                return response
+            self._count(hit=False)
+            response = fetch()
+            self.put(url, payload, response)
+        return response
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get the process-wide response cache, configured by the optional COMLINK_CACHE_* env vars
+    """
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(
+            os.getenv(
+                "COMLINK_CACHE_DIR", os.path.join(tempfile.gettempdir(), "swgoh_comlink_cache")
+            ),
+            get_cache_ttls(),
+        )
+        atexit.register(_cache.log_stats)
+    return _cache
@@ -3,23 +3,79 @@ Check zeffo, mandalore and reva readiness of the rosters currently in the guild.
 Writes the results into the provided psql db.
 """
 
+import argparse
+import asyncio
+import contextvars
 import os
-import json
 import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+import numpy as np
 from dotenv import load_dotenv
 
-from .read_data import read_players, read_roster_check, read_guild
-from .update_data import updateRosterChecks
-from .api_request import post_request
-from .enter_data import enter_player_check
+from .read_data import read_guild, read_roster_check_plan
+from .enter_data import (
+    ensure_roster_check_summary,
+    enter_roster_check_summary,
+    enter_roster_check_summary_async,
+)
+from .update_data import (
+    ensure_roster_check_state,
+    upsert_roster_checks_with_state,
+    upsert_roster_checks_with_state_async,
+)
+from .api_request import post_request, post_request_raw
+from .comlink_models import GuildSnapshot, PlayerRoster
+from .roster_parser import parse_roster, parse_roster_full
+from .roster_rules import get_rule_evaluator
+from .roster_snapshots import get_snapshot_mode, ensure_roster_snapshots, store_roster_snapshots
+from .db_async import use_async_db, run_async_job, run_overlapped
 from .helper_functions import (
-    check_none_str,check_none_list,is_list_or_tuple_instance,setup_logging
+    check_none_str,check_none_list,setup_logging
     )
 
 
 logger = logging.getLogger("guild_data_app")
 setup_logging()
 
+
+class GuildRosterChecks(NamedTuple):
+    """
+    The results of checking the rosters of one guild, ready to be persisted
+    """
+
+    check_rows: list[tuple]
+    summary_rows: list[tuple]
+    state_rows: list[tuple]
+    rosters: list[tuple[str, PlayerRoster]]
+
+
+class EvaluatedRoster(NamedTuple):
+    """
+    The result of evaluating a roster in an evaluation worker: its missing requirements per column,
+    its fingerprint and its parsed roster, if roster snapshots are stored
+    """
+
+    missing: list[int]
+    fingerprint: str
+    roster: PlayerRoster | None
+
+
+class PlannedCheck(NamedTuple):
+    """
+    A player of a tracked guild with the state of their last roster check, None if they are new
+    """
+
+    player_id: str
+    guild_id: str
+    state: tuple | None
+    is_new: bool
+    is_stale: bool
+
+
 def env_loading() -> tuple[str, str]:
     """
     Load the needed params from .env file
@@ -27,7 +83,7 @@ def env_loading() -> tuple[str, str]:
     load_dotenv()
     # get guild and player interfaces for comlink
     guild_url_var: str = check_none_str(
-        os.getenv("PASS"), "Error: Check .env file. PASS should not be None"
+        os.getenv("GUILD_URL"), "Error: Check .env file. GUILD_URL should not be None"
     )
     player_url_var: str = check_none_str(
         os.getenv("PLAYER_URL"), "Error: Check .env file. PLAYER_URL should not be None"
@@ -35,212 +91,478 @@ def env_loading() -> tuple[str, str]:
     return (guild_url_var, player_url_var)
 
 
-def check_roster(player_id: str, player_url: str) -> tuple:
-    """
-    Check the roster of a player for Zeffo, Mandalore & Reva readiness criteria
-    Zeffo readiness: Cere R7 + Jedi Cal R7
-    Mandalore: BKM R7 (as her unlock already implies the other requirements are ready)
-    Reva: 5 Inquisitors, including at least two out of GI, Reva or Marrok
-    """
-    player = json.dumps(post_request(player_url, {"payload": {"playerId": player_id}}))
-    player_data = json.loads(player).get("rosterUnit")
-    player_name = json.loads(player).get("name")
-
-
-    # Journey guide unit checks & default values
-    reva_ready = False
-    gi_r7 = any(
-        t.get("definitionId") == "GRANDINQUISITOR:SEVEN_STAR"
-        and t.get("relic") is not None
-        and t.get("relic").get("currentTier", 0) >= 9
-        for t in player_data
-    )
-    bkm_r7 = any(
-        t.get("definitionId") == "MANDALORBOKATAN:SEVEN_STAR"
-        and t.get("relic") is not None
-        and t.get("relic").get("currentTier", 0) >= 9
-        for t in player_data
-    )
-    reva_r7 = any(
-        t.get("definitionId") == "THIRDSISTER:SEVEN_STAR"
-        and t.get("relic") is not None
-        and t.get("relic").get("currentTier", 0) >= 9
-        for t in player_data
-    )
-    #-------
-    # Check reva ready required units
-    marrok_r7 = any(
-        t.get("definitionId") == "MARROK:SEVEN_STAR"
-        and t.get("relic") is not None
-        and t.get("relic").get("currentTier", 0) >= 9
-        for t in player_data
-    )
-    seventh_sister_r7 = any(
-        t.get("definitionId") == "SEVENTHSISTER:SEVEN_STAR"
-        and t.get("relic") is not None
-        and t.get("relic").get("currentTier", 0) >= 9
-        for t in player_data
-    )
-    fifth_brother_r7 = any(
-        t.get("definitionId") == "FIFTHBROTHER:SEVEN_STAR"
-        and t.get("relic") is not None
-        and t.get("relic").get("currentTier", 0) >= 9
-        for t in player_data
-    )
-    eighth_brother_r7 = any(
-        t.get("definitionId") == "EIGHTHBROTHER:SEVEN_STAR"
-        and t.get("relic") is not None
-        and t.get("relic").get("currentTier", 0) >= 9
-        for t in player_data
-    )
-    #ninth_sister_r7 =  any(
-    #    t.get("definitionId") == "NINTHSISTER:SEVEN_STAR"
-    #    and t.get("relic") is not None
-    #    and t.get("relic").get("currentTier", 0) >= 9
-    #    for t in player_data
-    #)
-    
-    #Check, if at least a full team is ready for the reva mission
-    all_inquisitors = [gi_r7, reva_r7, marrok_r7, seventh_sister_r7, fifth_brother_r7, eighth_brother_r7]
-    key_units = [gi_r7, reva_r7, marrok_r7]
-
-    if sum(all_inquisitors) >= 5 and sum(key_units) >= 2:
-        reva_ready = True
-
-    # Jedi Cal unlocked check
-    jedi_cal_unlocked = any(
-        t.get("definitionId") == "JEDIKNIGHTCAL:SEVEN_STAR" for t in player_data
-    )
-    # Check if Jedi Cal is at lvl 85
-    jedi_cal_leveled = any(
-        t.get("definitionId") == "JEDIKNIGHTCAL:SEVEN_STAR" and t.get("currentLevel") == 85
-        for t in player_data
-    )
-
-
-    if not jedi_cal_leveled:
-        check = reva_ready, gi_r7, bkm_r7, jedi_cal_unlocked, False, False, False, player_id
-        logging.info("Jedi Cal not lvl 85 yet")
-        logging.info(check)
-        logging.info(player_name)
-        return check
-
-    
-    # Relics checks
-    jedi_cal_r7 = any(
-        t.get("definitionId") == "JEDIKNIGHTCAL:SEVEN_STAR"
-        and t.get("relic") is not None
-        and t.get("relic").get("currentTier", 0) >= 9
-        for t in player_data
-    )
-    cere_r7 = any(
-        t.get("definitionId") == "CEREJUNDA:SEVEN_STAR"
-        and t.get("relic") is not None
-        and t.get("relic").get("currentTier", 0) >= 9
-        for t in player_data
-    )
-
-    # Ability level checks
-    skills = [
-        t for t in player_data if t.get("definitionId") == "JEDIKNIGHTCAL:SEVEN_STAR"
-        ][0]["skill"]
-    jedi_cal_unique = any(
-        t.get("id") == "uniqueskill_JEDIKNIGHTCAL01" and t.get("tier") >= 6 for t in skills
-    )
-    jedi_cal_leader = any(
-        t.get("id") == "leaderskill_JEDIKNIGHTCAL" and t.get("tier") >= 5 for t in skills
-    )
-
-    jedi_cal_special_03 = any(
-        t.get("id") == "specialskill_JEDIKNIGHTCAL03" and t.get("tier") >= 5 for t in skills
-    )
-
-    jedi_cal_special_02 = any(
-        t.get("id") == "specialskill_JEDIKNIGHTCAL02" and t.get("tier") >= 6 for t in skills
-    )
-
-    jedi_cal_special_01 = any(
-        t.get("id") == "specialskill_JEDIKNIGHTCAL01" and t.get("tier") >= 6 for t in skills
-    )
-    jedi_cal_skills_done = (
-        jedi_cal_unique
-        and jedi_cal_leader
-        and jedi_cal_special_03
-        and jedi_cal_special_02
-        and jedi_cal_special_01
-    )
-
-    check = (
-        reva_ready,
-        gi_r7,
-        bkm_r7,
-        jedi_cal_unlocked,
-        jedi_cal_r7,
-        cere_r7,
-        jedi_cal_skills_done,
-        player_id,
-    )
-    logging.info("Else reached")
-    logging.info(check)
-    logging.info(player_name)
+def force_full_check() -> bool:
+    """
+    Check the optional ROSTER_CHECK_FULL env var to re-check every roster instead of only changed ones
+    """
+    return os.getenv("ROSTER_CHECK_FULL", "").lower() in ("1", "true", "yes")
+
+
+def get_max_check_age() -> int:
+    """
+    Get the hours after which a roster is re-checked regardless of its GP
+    from the optional ROSTER_CHECK_MAX_AGE_HOURS env var
+    """
+    return max(0, int(os.getenv("ROSTER_CHECK_MAX_AGE_HOURS", "168")))
+
+
+def get_fetch_concurrency() -> int:
+    """
+    Get the max number of roster fetches in flight from the optional ROSTER_FETCH_CONCURRENCY env var
+    """
+    return max(1, int(os.getenv("ROSTER_FETCH_CONCURRENCY", "4")))
+
+
+def get_eval_workers() -> int:
+    """
+    Get the number of roster evaluation processes from the optional ROSTER_EVAL_WORKERS env var.
+    0 (default) parses and evaluates the rosters in the main process
+    """
+    return max(0, int(os.getenv("ROSTER_EVAL_WORKERS", "0")))
+
+
+def get_stream_batch_size() -> int:
+    """
+    Get the number of pool evaluated rosters whose checks are persisted together, while the
+    rest of the guild is still evaluated, from the optional ROSTER_STREAM_BATCH env var
+    """
+    return max(1, int(os.getenv("ROSTER_STREAM_BATCH", "50")))
+
+
+def prefetch(
+    items: Iterable, fetch: Callable[[Any], Any], max_in_flight: int
+) -> Iterator[tuple[Any, Any]]:
+    """
+    Yield (item, fetch(item)) in input order, while up to max_in_flight
+    later items are already being fetched in a thread pool
+    """
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        in_flight: deque = deque()
+        for item in items:
+            # fetches run in the context of the caller, like asyncio.to_thread
+            in_flight.append((item, executor.submit(contextvars.copy_context().run, fetch, item)))
+            if len(in_flight) >= max_in_flight:
+                next_item, future = in_flight.popleft()
+                yield next_item, future.result()
+        while in_flight:
+            next_item, future = in_flight.popleft()
+            yield next_item, future.result()
+
+
+def get_roster_parser() -> str:
+    """
+    Get the roster parsing mode from the optional ROSTER_PARSER env var.
+    'selective' (default) only decodes the watched units, 'full' decodes the whole response
+    """
+    parser: str = os.getenv("ROSTER_PARSER", "selective").lower()
+    if parser not in ("selective", "full"):
+        logger.warning("Invalid ROSTER_PARSER: %s. Using selective", parser)
+        return "selective"
+    return parser
+
+
+def fetch_roster(player_id: str, player_url: str) -> PlayerRoster | None:
+    """
+    Fetch the roster of a player from comlink and parse the watched units
+    """
+    raw = post_request_raw(player_url, {"payload": {"playerId": player_id}})
+    if raw is None:
+        return None
+    return parse_fetched_roster(raw)
+
+
+def parse_fetched_roster(raw: bytes) -> PlayerRoster:
+    """
+    Parse the watched units of a raw player response.
+    The whole roster is parsed, if it is parsed in full or snapshotted in full
+    """
+    if get_roster_parser() == "full" or get_snapshot_mode() == "all":
+        return parse_roster_full(raw)
+    return parse_roster(raw, get_rule_evaluator().watched_units)
+
+
+def evaluate_raw_roster(raw: bytes) -> EvaluatedRoster:
+    """
+    Parse and evaluate a raw player response, in an evaluation worker process.
+    Only the missing requirements, the fingerprint and, for the snapshots, the compact roster
+    are sent back
+    """
+    evaluator = get_rule_evaluator()
+    roster = parse_fetched_roster(raw)
+    missing = evaluator.missing_requirements(evaluator.build_matrix([roster]))
+    return EvaluatedRoster(
+        missing[0].tolist(),
+        evaluator.fingerprint(roster),
+        None if get_snapshot_mode() == "off" else roster,
+    )
+
+
+def evaluate_rosters_in_pool(
+    pool: Executor, player_ids: list[str], player_url: str
+) -> Iterator[tuple[str, EvaluatedRoster]]:
+    """
+    Fetch the raw rosters of the players and hand every response to the evaluation pool as soon as
+    it arrives. Yields (player_id, evaluated roster) as the evaluations finish, in completion order
+    """
+    pending: dict[Future, str] = {}
+    for player_id, raw in prefetch(
+        player_ids,
+        lambda p: post_request_raw(player_url, {"payload": {"playerId": p}}),
+        get_fetch_concurrency(),
+    ):
+        if raw is None:
+            logger.error("No roster for player %s. Skipping roster check", player_id)
+            continue
+        pending[pool.submit(evaluate_raw_roster, raw)] = player_id
+        for future in [f for f in pending if f.done()]:
+            yield pending.pop(future), future.result()
+
+    for future in as_completed(pending):
+        yield pending[future], future.result()
+
+
+def check_roster(player_id: str, player_url: str) -> tuple | None:
+    """
+    Fetch and check the roster of a player for Zeffo, Mandalore & Reva readiness criteria
+    """
+    return evaluate_roster(player_id, fetch_roster(player_id, player_url))
+
+
+def evaluate_roster(player_id: str, player_response: PlayerRoster | dict | None) -> tuple | None:
+    """
+    Check the roster of a player against the readiness rules of roster_rules.json.
+    Returns the rule results in column order, followed by the player_id
+    """
+    if player_response is None:
+        logger.error("No roster for player %s. Skipping roster check", player_id)
+        return None
+    roster = (
+        player_response
+        if isinstance(player_response, PlayerRoster)
+        else PlayerRoster.from_response(player_response)
+    )
+
+    check = get_rule_evaluator().evaluate(roster) + (player_id,)
+    logger.info("%s: %s", roster.name, check)
     return check
 
-def run_roster_checks():
+
+def evaluate_guild(
+    guild_id: str, player_ids: list[str], rosters: list[PlayerRoster]
+) -> tuple[list[tuple], list[tuple]]:
+    """
+    Evaluate every rule for all rosters of a guild at once on a players x units matrix.
+    Returns the (*checks, player_id) rows and the summary rows, see summarize_readiness
+    """
+    evaluator = get_rule_evaluator()
+    missing = evaluator.missing_requirements(evaluator.build_matrix(rosters))
+    return readiness_rows(player_ids, missing), summarize_readiness(guild_id, player_ids, missing)
+
+
+def readiness_rows(player_ids: list[str], missing: np.ndarray) -> list[tuple]:
+    """
+    Build the (*checks, player_id) rows from a players x columns matrix of missing requirements
+    """
+    return [
+        tuple(row) + (player_id,) for player_id, row in zip(player_ids, (missing == 0).tolist())
+    ]
+
+
+def summarize_readiness(guild_id: str, player_ids: list[str], missing: np.ndarray) -> list[tuple]:
+    """
+    Build the (guild_id, check_name, member_count, ready_count, one_short_count, one_short_players)
+    summary rows from a players x columns matrix of missing requirements
+    """
+    columns = get_rule_evaluator().columns
+    if len(player_ids) == 0:
+        missing = np.zeros((0, len(columns)), dtype=np.int32)
+    ready = missing == 0
+    one_short = missing == 1
+    return [
+        (
+            guild_id,
+            column,
+            len(player_ids),
+            int(ready[:, c].sum()),
+            int(one_short[:, c].sum()),
+            [player_ids[p] for p in np.flatnonzero(one_short[:, c])],
+        )
+        for c, column in enumerate(columns)
+    ]
+
+
+def fetch_character_gp(g: tuple, guild_url: str) -> dict[str, int]:
     """
-    Run roster checks for all players in all guilds
+    Get the character GP of every member of guild g from the (cached) guild payload
     """
-    env_vars = env_loading()
-    guild_url_env = env_vars[0]
-    player_url_env = env_vars[1]
-    roster_check_data = check_none_list(
-        read_roster_check(),
-        "roster_check_data should not be None. Check read_roster_check function",
+    response = post_request(
+        guild_url,
+        {"payload": {"guildId": g[0], "includeRecentGuildActivityInfo": True}},
+        cached=True,
     )
+    if response is None:
+        logger.warning("No guild payload for %s, checking every roster", g[1])
+        return {}
+    return {
+        m.player_id: m.character_galactic_power
+        for m in GuildSnapshot.from_response(response).members
+    }
 
 
-    guilds_config = check_none_list(
-        read_guild(), "read_guild should not be None! Check read_guild function"
+def needs_check(state: tuple | None, character_gp: int | None) -> bool:
+    """
+    Check if the roster of a player has to be fetched, given the state of its last check
+    and the current character GP. A roster without GP change has no changed units
+    """
+    if state is None or character_gp is None:
+        return True
+    _, _, checked_gp, rules_version, missing = state
+    return (
+        checked_gp != character_gp
+        or rules_version != get_rule_evaluator().version
+        or len(missing) != len(get_rule_evaluator().columns)
     )
-    logger.debug("Guilds config: %s", guilds_config)
 
-    for g in guilds_config:
-        read_players_data = check_none_list(
-            read_players(g[0]),
-            "read_players data should not be None. Check read_players function",
+
+def plan_roster_checks() -> dict[str, list[PlannedCheck]]:
+    """
+    Get the planned checks of every player in the tracked guilds by guild_id, in one query
+    """
+    evaluator = get_rule_evaluator()
+    plan: dict[str, list[PlannedCheck]] = {}
+    for row in read_roster_check_plan(evaluator.version, get_max_check_age()):
+        player_id, guild_id, fingerprint, character_gp, rules_version, missing, is_new, is_stale = row
+        state = None if is_new else (player_id, fingerprint, character_gp, rules_version, missing)
+        plan.setdefault(guild_id, []).append(
+            PlannedCheck(player_id, guild_id, state, is_new, is_stale)
         )
-        players = [
-            check_none_list(is_list_or_tuple_instance(x), "Cannot be None")[0]
-            if check_none_list(is_list_or_tuple_instance(x), "Cannot be None")[5] == g[0]
-            else None
-            for x in read_players_data
+    planned = [p for checks in plan.values() for p in checks]
+    logger.info(
+        "Planned roster checks of %s players: %s new, %s stale",
+        len(planned),
+        sum(p.is_new for p in planned),
+        sum(p.is_stale for p in planned),
+    )
+    return plan
+
+
+def is_changed(state: tuple | None, fingerprint: str) -> bool:
+    """
+    Check if a fetched roster needs a new check row, given the state of its last check
+    """
+    return (
+        state is None
+        or state[1] != fingerprint
+        or state[3] != get_rule_evaluator().version
+    )
+
+
+def check_rosters_in_pool(
+    pool: Executor,
+    player_ids: list[str],
+    player_url: str,
+    states: dict[str, tuple],
+    character_gp: dict[str, int],
+    persist: Callable[[list[tuple], list[tuple]], Any] | None = None,
+) -> tuple[list[tuple], list[tuple], dict[str, list[int]], list[tuple[str, PlayerRoster]]]:
+    """
+    Check the rosters of the players in the evaluation pool, passing every full batch of check rows
+    and state rows to persist as the evaluations finish. Returns the check rows and state rows
+    not persisted yet, the missing requirements of every fetched player and the rosters to snapshot
+    """
+    version = get_rule_evaluator().version
+    batch_size = get_stream_batch_size()
+    check_rows: list[tuple] = []
+    state_rows: list[tuple] = []
+    fetched: dict[str, list[int]] = {}
+    rosters: list[tuple[str, PlayerRoster]] = []
+    for player_id, result in evaluate_rosters_in_pool(pool, player_ids, player_url):
+        fetched[player_id] = result.missing
+        state_rows.append(
+            (player_id, result.fingerprint, character_gp.get(player_id), version, result.missing)
+        )
+        if is_changed(states.get(player_id), result.fingerprint):
+            check_rows.append(tuple(m == 0 for m in result.missing) + (player_id,))
+        if result.roster is not None:
+            rosters.append((player_id, result.roster))
+        if persist is not None and len(state_rows) >= batch_size:
+            persist(check_rows, state_rows)
+            check_rows, state_rows = [], []
+    return check_rows, state_rows, fetched, rosters
+
+
+def check_guild_rosters(
+    g: tuple,
+    player_url: str,
+    guild_url: str | None = None,
+    force_full: bool = True,
+    pool: Executor | None = None,
+    plan: list[PlannedCheck] | None = None,
+    persist: Callable[[list[tuple], list[tuple]], Any] | None = None,
+) -> GuildRosterChecks:
+    """
+    Check the rosters of all players of guild g, as planned by plan_roster_checks.
+    Incremental checks (force_full=False) fetch the rosters of new and stale players and of players
+    whose character GP changed since their last check, and reuse the stored results of everyone else.
+    With a process pool, the rosters are parsed and evaluated in its workers, and persist, if given,
+    is called with batches of check rows and state rows while the rest of the guild is evaluated.
+    Returns the changed roster check rows and the new check state rows not persisted yet,
+    the guild summary rows and the fetched rosters
+    """
+    if plan is None:
+        plan = plan_roster_checks().get(g[0], [])
+    players = [p.player_id for p in plan]
+
+    evaluator = get_rule_evaluator()
+    character_gp = fetch_character_gp(g, guild_url) if guild_url else {}
+    states: dict[str, tuple] = (
+        {} if force_full else {p.player_id: p.state for p in plan if p.state is not None}
+    )
+    to_fetch = [
+        p.player_id
+        for p in plan
+        if force_full
+        or p.is_new
+        or p.is_stale
+        or needs_check(p.state, character_gp.get(p.player_id))
+    ]
+    logger.info(
+        "Checking %s of %s rosters of %s (%s unchanged)",
+        len(to_fetch),
+        len(players),
+        g[1],
+        len(players) - len(to_fetch),
+    )
+
+    if pool is not None:
+        check_rows, state_rows, fetched, rosters = check_rosters_in_pool(
+            pool, to_fetch, player_url, states, character_gp, persist
+        )
+    else:
+        # Rosters are collected in order, while the next ones are already being fetched
+        fetched_ids: list[str] = []
+        fetched_rosters: list[PlayerRoster] = []
+        for player_id, roster in prefetch(
+            to_fetch, lambda p: fetch_roster(p, player_url), get_fetch_concurrency()
+        ):
+            if roster is None:
+                logger.error("No roster for player %s. Skipping roster check", player_id)
+                continue
+            fetched_ids.append(player_id)
+            fetched_rosters.append(roster)
+
+        missing = evaluator.missing_requirements(evaluator.build_matrix(fetched_rosters))
+        fingerprints = [evaluator.fingerprint(roster) for roster in fetched_rosters]
+        state_rows = [
+            (player_id, fingerprint, character_gp.get(player_id), evaluator.version, row)
+            for player_id, fingerprint, row in zip(fetched_ids, fingerprints, missing.tolist())
+        ]
+        # Only rosters whose watched units changed need new check rows
+        changed = [
+            i
+            for i, (player_id, fingerprint) in enumerate(zip(fetched_ids, fingerprints))
+            if is_changed(states.get(player_id), fingerprint)
         ]
-        logger.debug("players:")
-        logger.debug(players)
-        players = [x for x in players if x is not None]
+        check_rows = readiness_rows([fetched_ids[i] for i in changed], missing[changed])
+        fetched = dict(zip(fetched_ids, missing.tolist()))
+        rosters = list(zip(fetched_ids, fetched_rosters))
 
-        # Build set of player ids present in roster checks table for better lookup in next step
-        present_player_ids = {value[0] for value in roster_check_data} 
+    # The summary covers the fetched rosters and the stored results of the skipped ones
+    summary_ids = [p for p in players if p in fetched or p in states]
+    summary_missing = np.array(
+        [fetched[p] if p in fetched else states[p][4] for p in summary_ids], dtype=np.int32
+    )
+    summary_rows = summarize_readiness(g[0], summary_ids, summary_missing)
+    return GuildRosterChecks(check_rows, summary_rows, state_rows, rosters)
 
-        players_to_enter = [item for item in roster_check_data if item[0] not in present_player_ids]
 
-        # Set of player ids for those, that need to be newly created in db
-        players_to_enter_set = {value[0] for value in players_to_enter}
+def write_guild_roster_checks(g: tuple, guild_checks: GuildRosterChecks) -> None:
+    """
+    Persist the roster checks, the summary, the check state and the roster snapshots of guild g
+    """
+    logger.info("Persisting roster checks for: %s", g[1])
+    # The check state is only stored together with the check rows, a state saved without them
+    # would make the incremental checks skip these players until a full check
+    upsert_roster_checks_with_state(
+        guild_checks.check_rows, guild_checks.state_rows, get_rule_evaluator().columns
+    )
+    enter_roster_check_summary(guild_checks.summary_rows)
+    if get_snapshot_mode() != "off":
+        store_roster_snapshots(guild_checks.rosters)
 
-        # List of players that need to be updated in db
-        players_to_update = [item for item in players if item[0] not in players_to_enter_set]
-        logger.info("players_to_update: %s", players_to_update)
 
-        # Iterate through all players that need an initial entry in the table
-        roster_array = []
-        for e in players_to_enter:
-            roster_array.append(check_roster(e, player_url_env))
+async def write_guild_roster_checks_async(g: tuple, guild_checks: GuildRosterChecks) -> None:
+    """
+    Persist the roster checks, the summary and the check state of guild g through the async DB layer
+    """
+    logger.info("Persisting roster checks for: %s", g[1])
+    await upsert_roster_checks_with_state_async(
+        guild_checks.check_rows, guild_checks.state_rows, get_rule_evaluator().columns
+    )
+    await enter_roster_check_summary_async(guild_checks.summary_rows)
+    if get_snapshot_mode() != "off":
+        # the snapshot store shares the sync pool, keep it off the event loop
+        await asyncio.to_thread(store_roster_snapshots, guild_checks.rosters)
+
+
+def run_roster_checks(force_full: bool = False):
+    """
+    Run roster checks for all players in all guilds.
+    Only changed rosters are checked, unless force_full or ROSTER_CHECK_FULL is set
+    """
+    guild_url_env, player_url_env = env_loading()
+    force_full = force_full or force_full_check()
+    guilds_config = check_none_list(
+        read_guild(), "read_guild should not be None! Check read_guild function"
+    )
+    logger.debug("Guilds config: %s", guilds_config)
+    ensure_roster_check_state()
+    ensure_roster_check_summary()
+    if get_snapshot_mode() != "off":
+        ensure_roster_snapshots()
+    plan = plan_roster_checks()
+
+    eval_workers = get_eval_workers()
+    # One evaluation pool serves every guild of the run, while finished guilds are persisted
+    # Workers are spawned, not forked, as the fetch threads and DB pool may already be running
+    with (
+        ProcessPoolExecutor(eval_workers, mp_context=multiprocessing.get_context("spawn"))
+        if eval_workers
+        else nullcontext()
+    ) as pool:
 
-        enter_player_check(roster_array)
+        def persist_batch(check_rows: list[tuple], state_rows: list[tuple]) -> bool:
+            return upsert_roster_checks_with_state(
+                check_rows, state_rows, get_rule_evaluator().columns
+            )
+
+        def check_guild(g: tuple) -> GuildRosterChecks:
+            return check_guild_rosters(
+                g,
+                player_url_env,
+                guild_url_env,
+                force_full,
+                pool,
+                plan.get(g[0], []),
+                persist_batch if pool else None,
+            )
+
+        if use_async_db():
+            # Persist the checks of one guild while the rosters of the next guild are fetched
+            run_async_job(
+                run_overlapped(guilds_config, check_guild, write_guild_roster_checks_async)
+            )
+            return
+
+        for g in guilds_config:
+            # Check the rosters and persist the whole guild in one upsert
+            write_guild_roster_checks(g, check_guild(g))
 
-        # Iterate through all players that need an update in the table
-        for d in players_to_update:
-            updateRosterChecks(check_roster(d, player_url_env))
 
 if __name__ == "__main__":
-    run_roster_checks()
-    logger.info("Roster checks complete")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Check the rosters of all guild members")
+    parser.add_argument(
+        "--full", action="store_true", help="re-check every roster, not only changed ones"
+    )
+    run_roster_checks(force_full=parser.parse_args().full)
+    logger.info("Roster checks complete")
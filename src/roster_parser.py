@@ -0,0 +1,109 @@
+"""
+Selective parser for comlink player responses.
+Instead of decoding the whole rosterUnit array with every unit, mod and skill, it
+locates the watched units in the raw body and only decodes those objects.
+Anything it can't locate unambiguously falls back to a full decode.
+"""
+
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Iterable
+from .comlink_models import PlayerRoster
+from .helper_functions import setup_logging
+
+
+logger = logging.getLogger("guild_data_app")
+setup_logging()
+
+_decoder = json.JSONDecoder()
+_ROSTER_KEY_PATTERN = re.compile(rb'"rosterUnit"\s*:\s*\[')
+_NAME_PATTERN = re.compile(rb'"name"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_UNIT_WINDOW: int = 4096
+
+
+@lru_cache(maxsize=8)
+def _definition_id_pattern(watched_units: frozenset[str]) -> re.Pattern:
+    """
+    Compile one pattern matching the definitionId key of any watched unit
+    """
+    alternatives = b"|".join(re.escape(u.encode()) for u in sorted(watched_units))
+    return re.compile(rb'"definitionId"\s*:\s*"(' + alternatives + rb')"')
+
+
+def parse_roster_full(raw: bytes | str) -> PlayerRoster:
+    """
+    Decode the whole player response
+    """
+    return PlayerRoster.from_response(json.loads(raw))
+
+
+def _decode_object_at(raw: bytes, start: int) -> dict | None:
+    """
+    Decode the JSON object starting at raw[start], without decoding the rest of the body.
+    The decoded window grows until the object fits into it
+    """
+    window: int = _UNIT_WINDOW
+    while True:
+        # a multi-byte char cut at the window end is dropped, the object is then incomplete
+        chunk: str = raw[start : start + window].decode("utf-8", errors="ignore")
+        try:
+            obj, _ = _decoder.raw_decode(chunk)
+            return obj if isinstance(obj, dict) else None
+        except ValueError:
+            if start + window >= len(raw):
+                return None
+            window *= 4
+
+
+def _find_definition_ids(
+    raw: bytes, watched: frozenset[str], roster_start: int
+) -> list[tuple[str, int]]:
+    """
+    Get the definitionId and key position of the first unit of every watched definitionId in the roster.
+    Compact bodies are searched with a plain substring search per unit, others with one regex pass
+    """
+    if raw.find(b'"definitionId":"', roster_start) != -1:
+        found = []
+        for definition_id in watched:
+            key_pos = raw.find(b'"definitionId":"' + definition_id.encode() + b'"', roster_start)
+            if key_pos != -1:
+                found.append((definition_id, key_pos))
+        return found
+
+    first_match: dict[str, int] = {}
+    for match in _definition_id_pattern(watched).finditer(raw, roster_start):
+        first_match.setdefault(match.group(1).decode(), match.start())
+    return list(first_match.items())
+
+
+def parse_roster(raw: bytes | str, watched_units: Iterable[str]) -> PlayerRoster:
+    """
+    Build a PlayerRoster holding only the watched units and the player name from a raw player response
+    """
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    watched = frozenset(watched_units)
+    roster_key = _ROSTER_KEY_PATTERN.search(raw)
+    if roster_key is None or not watched:
+        return parse_roster_full(raw)
+
+    units: list[dict] = []
+    for definition_id, key_pos in _find_definition_ids(raw, watched, roster_key.end()):
+        # definitionId is one of the leading scalar keys of a unit, so the
+        # nearest opening brace before it is the start of the unit object
+        start = raw.rfind(b"{", roster_key.end(), key_pos)
+        unit = _decode_object_at(raw, start) if start != -1 else None
+        if unit is None or unit.get("definitionId") != definition_id:
+            logger.debug("Could not isolate unit %s, decoding the full roster", definition_id)
+            return parse_roster_full(raw)
+        units.append(unit)
+
+    # units have no name key, so the first one is the player name
+    name_pos = raw.find(b'"name":')
+    name_match = (
+        _NAME_PATTERN.match(raw, name_pos) if name_pos != -1 else _NAME_PATTERN.search(raw)
+    )
+    name: str = json.loads(b'"' + name_match.group(1) + b'"') if name_match else ""
+    return PlayerRoster.from_units(name, units)
@@ -0,0 +1,360 @@
+"""
+Declarative readiness rules for the roster checks.
+The rules are read from a JSON file (ROSTER_RULES_PATH, default roster_rules.json in the
+project root) and compiled once into an evaluator. Every rule maps to a boolean column
+of the players_roster_checks table.
+
+Rule grammar:
+    {"unlocked": UNIT}                        the player has the unit
+    {"level": UNIT, "min": N}                 unit level >= N
+    {"relic": UNIT, "min_tier": N}            relic currentTier >= N (9 is R7)
+    {"skills": UNIT, "min_tiers": {ID: N}}    every listed ability at tier >= N
+    {"all": [RULE, ...]}, {"any": [RULE, ...]}
+    {"at_least": K, "of": [RULE, ...]}        K of the listed rules hold
+
+Every rule is compiled twice: into a per-roster check and into a vectorized form, that
+evaluates all players of a guild at once on a RosterMatrix and also tells how many
+units a player is short of a rule, counting every unit once however many of its
+requirements are missing.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from itertools import combinations
+from pathlib import Path
+from typing import Any, Callable
+import numpy as np
+from .comlink_models import PlayerRoster, UnitRecord
+from .helper_functions import check_sql_identifier, setup_logging
+
+
+logger = logging.getLogger("guild_data_app")
+setup_logging()
+
+DEFAULT_RULES_PATH: Path = Path(__file__).resolve().parent.parent / "roster_rules.json"
+# Part of the rules version, bumped when the evaluation of the same config changes,
+# so stored check states of the old evaluation are re-checked
+EVALUATION_VERSION: int = 2
+
+_evaluator = None
+
+# A compiled rule reads the records of the watched units, in watched_units order
+CompiledRule = Callable[[tuple[UnitRecord | None, ...]], bool]
+# A vectorized rule reads a RosterMatrix and returns the number of
+# units every player is short of the rule, 0 meaning the rule holds
+VectorizedRule = Callable[["RosterMatrix"], np.ndarray]
+# A vectorized condition reads a RosterMatrix and the watched unit columns assumed to meet
+# every requirement, and returns if the rule holds for every player
+VectorizedCondition = Callable[["RosterMatrix", frozenset[int]], np.ndarray]
+
+
+class RosterMatrix:
+    """
+    Players x watched units matrices of the values the rules look at.
+    Units a player hasn't got are level 0, relic tier 0 and skill tier 0
+    """
+
+    def __init__(
+        self,
+        rosters: list[PlayerRoster],
+        watched_units: tuple[str, ...],
+        skill_columns: tuple[tuple[str, str], ...],
+    ):
+        shape = (len(rosters), len(watched_units))
+        self.unlocked = np.zeros(shape, dtype=bool)
+        self.level = np.zeros(shape, dtype=np.int16)
+        self.relic_tier = np.zeros(shape, dtype=np.int16)
+        self.skill_tier = np.zeros((len(rosters), len(skill_columns)), dtype=np.int16)
+        for row, roster in enumerate(rosters):
+            for column, definition_id in enumerate(watched_units):
+                unit = roster.units.get(definition_id)
+                if unit is not None:
+                    self.unlocked[row, column] = True
+                    self.level[row, column] = unit.level
+                    self.relic_tier[row, column] = unit.relic_tier
+            for column, (definition_id, skill_id) in enumerate(skill_columns):
+                unit = roster.units.get(definition_id)
+                if unit is not None:
+                    self.skill_tier[row, column] = unit.skill_tiers.get(skill_id, 0)
+
+
+class RosterRuleEvaluator:
+    """
+    All readiness rules compiled against one shared list of watched units.
+    A roster is looked up once per watched unit, every rule then reads those records
+    """
+
+    def __init__(
+        self,
+        columns: tuple[str, ...],
+        rules: tuple[CompiledRule, ...],
+        watched_units: tuple[str, ...],
+        vectorized_rules: tuple[VectorizedRule, ...] = (),
+        skill_columns: tuple[tuple[str, str], ...] = (),
+        version: str = "",
+    ):
+        self.columns = columns
+        self.rules = rules
+        self.watched_units = watched_units
+        self.vectorized_rules = vectorized_rules
+        self.skill_columns = skill_columns
+        self.version = version
+
+    def evaluate(self, roster: PlayerRoster) -> tuple[bool, ...]:
+        """
+        Evaluate every rule for a roster, in column order
+        """
+        records = tuple(roster.units.get(u) for u in self.watched_units)
+        return tuple(rule(records) for rule in self.rules)
+
+    def fingerprint(self, roster: PlayerRoster) -> str:
+        """
+        Hash the level, relic tier and rule relevant skill tiers of the watched units of a roster.
+        Rosters with the same fingerprint get the same results for every rule
+        """
+        values: list = []
+        for definition_id in self.watched_units:
+            unit = roster.units.get(definition_id)
+            values.append(None if unit is None else (unit.level, unit.relic_tier))
+        for definition_id, skill_id in self.skill_columns:
+            unit = roster.units.get(definition_id)
+            values.append(None if unit is None else unit.skill_tiers.get(skill_id, 0))
+        return hashlib.blake2b(repr(values).encode(), digest_size=16).hexdigest()
+
+    def build_matrix(self, rosters: list[PlayerRoster]) -> RosterMatrix:
+        return RosterMatrix(rosters, self.watched_units, self.skill_columns)
+
+    def missing_requirements(self, matrix: RosterMatrix) -> np.ndarray:
+        """
+        Get a players x columns matrix of how many units of every rule each player is short.
+        0 means the player meets the rule, 1 that they are one unit short
+        """
+        if not self.vectorized_rules:
+            raise ValueError("Evaluator has no vectorized rules")
+        return np.stack([rule(matrix) for rule in self.vectorized_rules], axis=1)
+
+
+def _compile_rule(rule: dict[str, Any], unit_index: dict[str, int]) -> CompiledRule:
+    """
+    Compile a rule into a function over the watched unit records, registering its units in unit_index
+    """
+
+    def slot(definition_id: Any) -> int:
+        if not isinstance(definition_id, str) or not definition_id:
+            raise ValueError(f"Invalid unit in roster rule {rule!r}")
+        return unit_index.setdefault(definition_id, len(unit_index))
+
+    if not isinstance(rule, dict):
+        raise ValueError(f"Roster rule must be an object: {rule!r}")
+
+    if "unlocked" in rule:
+        i = slot(rule["unlocked"])
+        return lambda records: records[i] is not None
+
+    if "level" in rule:
+        i, min_level = slot(rule["level"]), int(rule["min"])
+        return lambda records: records[i] is not None and records[i].level >= min_level
+
+    if "relic" in rule:
+        i, min_tier = slot(rule["relic"]), int(rule["min_tier"])
+        return lambda records: records[i] is not None and records[i].relic_tier >= min_tier
+
+    if "skills" in rule:
+        i = slot(rule["skills"])
+        min_tiers = tuple((skill_id, int(tier)) for skill_id, tier in rule["min_tiers"].items())
+        return lambda records: records[i] is not None and all(
+            records[i].skill_tiers.get(skill_id, 0) >= tier for skill_id, tier in min_tiers
+        )
+
+    if "all" in rule:
+        parts = tuple(_compile_rule(r, unit_index) for r in rule["all"])
+        return lambda records: all(part(records) for part in parts)
+
+    if "any" in rule:
+        parts = tuple(_compile_rule(r, unit_index) for r in rule["any"])
+        return lambda records: any(part(records) for part in parts)
+
+    if "at_least" in rule:
+        k = int(rule["at_least"])
+        parts = tuple(_compile_rule(r, unit_index) for r in rule["of"])
+        return lambda records: sum(part(records) for part in parts) >= k
+
+    raise ValueError(f"Unknown roster rule: {rule!r}")
+
+
+def _compile_condition_vectorized(
+    rule: dict[str, Any],
+    unit_index: dict[str, int],
+    skill_index: dict[tuple[str, str], int],
+    rule_units: set[int],
+) -> VectorizedCondition:
+    """
+    Compile a rule into a condition over a RosterMatrix, collecting the unit columns it reads in rule_units
+    """
+
+    def leaf(i: int, condition: Callable[[RosterMatrix], np.ndarray]) -> VectorizedCondition:
+        rule_units.add(i)
+        return lambda m, fixed: (
+            np.ones(len(m.unlocked), dtype=bool) if i in fixed else condition(m)
+        )
+
+    if "unlocked" in rule:
+        i = unit_index[rule["unlocked"]]
+        return leaf(i, lambda m: m.unlocked[:, i])
+
+    if "level" in rule:
+        i, min_level = unit_index[rule["level"]], int(rule["min"])
+        return leaf(i, lambda m: m.unlocked[:, i] & (m.level[:, i] >= min_level))
+
+    if "relic" in rule:
+        i, min_tier = unit_index[rule["relic"]], int(rule["min_tier"])
+        return leaf(i, lambda m: m.unlocked[:, i] & (m.relic_tier[:, i] >= min_tier))
+
+    if "skills" in rule:
+        i = unit_index[rule["skills"]]
+        columns = [
+            skill_index.setdefault((rule["skills"], skill_id), len(skill_index))
+            for skill_id in rule["min_tiers"]
+        ]
+        min_tiers = np.array([int(tier) for tier in rule["min_tiers"].values()], dtype=np.int16)
+        return leaf(
+            i,
+            lambda m: m.unlocked[:, i] & np.all(m.skill_tier[:, columns] >= min_tiers, axis=1),
+        )
+
+    if "all" in rule:
+        parts = [
+            _compile_condition_vectorized(r, unit_index, skill_index, rule_units)
+            for r in rule["all"]
+        ]
+
+        def all_hold(m: RosterMatrix, fixed: frozenset[int]) -> np.ndarray:
+            holds = np.ones(len(m.unlocked), dtype=bool)
+            for part in parts:
+                holds &= part(m, fixed)
+            return holds
+
+        return all_hold
+
+    if "any" in rule:
+        parts = [
+            _compile_condition_vectorized(r, unit_index, skill_index, rule_units)
+            for r in rule["any"]
+        ]
+
+        def any_holds(m: RosterMatrix, fixed: frozenset[int]) -> np.ndarray:
+            holds = np.zeros(len(m.unlocked), dtype=bool)
+            for part in parts:
+                holds |= part(m, fixed)
+            return holds
+
+        return any_holds
+
+    if "at_least" in rule:
+        k = int(rule["at_least"])
+        parts = [
+            _compile_condition_vectorized(r, unit_index, skill_index, rule_units)
+            for r in rule["of"]
+        ]
+        return lambda m, fixed: (
+            sum((part(m, fixed) for part in parts), np.zeros(len(m.unlocked), dtype=np.int32))
+            >= k
+        )
+
+    raise ValueError(f"Unknown roster rule: {rule!r}")
+
+
+def _compile_rule_vectorized(
+    rule: dict[str, Any], unit_index: dict[str, int], skill_index: dict[tuple[str, str], int]
+) -> VectorizedRule:
+    """
+    Compile a rule into a function over a RosterMatrix, that counts the units every player is short:
+    the size of the smallest set of units that makes the rule hold, once they meet every requirement.
+    Requirements overlapping on one unit count once. A rule that can never hold counts
+    one more than all of its units
+    """
+    rule_units: set[int] = set()
+    condition = _compile_condition_vectorized(rule, unit_index, skill_index, rule_units)
+    units = sorted(rule_units)
+
+    def short_units(m: RosterMatrix) -> np.ndarray:
+        short = np.full(len(m.unlocked), len(units) + 1, dtype=np.int32)
+        unresolved = np.ones(len(m.unlocked), dtype=bool)
+        # smallest unit sets first, a player is resolved by the first set that makes the rule hold
+        for size in range(len(units) + 1):
+            for fixed in combinations(units, size):
+                holds = unresolved & condition(m, frozenset(fixed))
+                short[holds] = size
+                unresolved &= ~holds
+                if not unresolved.any():
+                    return short
+        return short
+
+    return short_units
+
+
+def compile_rules(config: dict[str, Any]) -> RosterRuleEvaluator:
+    """
+    Compile a rules config into an evaluator. Raises ValueError on invalid rules or columns
+    """
+    unit_index: dict[str, int] = {}
+    columns: list[str] = []
+    rules: list[CompiledRule] = []
+    vectorized_rules: list[VectorizedRule] = []
+    skill_index: dict[tuple[str, str], int] = {}
+    for entry in config.get("columns", []):
+        column = check_sql_identifier(
+            entry.get("column"), f"Invalid roster check column name: {entry.get('column')!r}"
+        )
+        if column == "player_id":
+            raise ValueError("player_id is not a roster check column")
+        if column in columns:
+            raise ValueError(f"Duplicate roster check column: {column!r}")
+        try:
+            rules.append(_compile_rule(entry["rule"], unit_index))
+            vectorized_rules.append(
+                _compile_rule_vectorized(entry["rule"], unit_index, skill_index)
+            )
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid rule for roster check column {column!r}: {e}") from e
+        columns.append(column)
+    if not columns:
+        raise ValueError("Roster rules config has no columns")
+    return RosterRuleEvaluator(
+        tuple(columns),
+        tuple(rules),
+        tuple(unit_index),
+        tuple(vectorized_rules),
+        tuple(skill_index),
+        version=hashlib.blake2b(
+            json.dumps([EVALUATION_VERSION, config], sort_keys=True).encode(), digest_size=8
+        ).hexdigest(),
+    )
+
+
+def load_rules(path: str | Path | None = None) -> RosterRuleEvaluator:
+    """
+    Read and compile the rules file from path, ROSTER_RULES_PATH or the default location
+    """
+    rules_path = Path(path or os.getenv("ROSTER_RULES_PATH") or DEFAULT_RULES_PATH)
+    with open(rules_path, encoding="utf-8") as f:
+        evaluator = compile_rules(json.load(f))
+    logger.info(
+        "Compiled %s roster rules over %s units from %s",
+        len(evaluator.columns),
+        len(evaluator.watched_units),
+        rules_path,
+    )
+    return evaluator
+
+
+def get_rule_evaluator() -> RosterRuleEvaluator:
+    """
+    Get the rule evaluator of this run, compiled on first use
+    """
+    global _evaluator
+    if _evaluator is None:
+        _evaluator = load_rules()
+    return _evaluator
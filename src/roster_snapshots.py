@@ -0,0 +1,263 @@
+"""
+Compact history of roster progression, fed by the roster checks.
+Unit states are stored integer coded in a narrow Postgres table: one row per player, unit
+and day the unit changed, with the definitionId and the skill ids of a unit kept once in
+a unit dictionary. A unit state is valid from its snapshot_date until the next row of that
+player and unit, so the roster on a date is the latest row per unit up to that date.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date
+from .comlink_models import PlayerRoster
+from .db_connection import (
+    get_connection,
+    release_connection,
+    execute_batch_values,
+    DatabaseError,
+    IntegrityError,
+)
+from .read_data import make_sql_query_single
+from .helper_functions import setup_logging
+
+
+logger = logging.getLogger("guild_data_app")
+setup_logging()
+
+# One statement each, psycopg3 prepares every statement and a prepared statement holds one command
+ROSTER_SNAPSHOT_DDL: tuple[str, ...] = (
+    "CREATE TABLE IF NOT EXISTS roster_unit_dictionary ("
+    "unit_id smallserial PRIMARY KEY, "
+    "definition_id text NOT NULL UNIQUE, "
+    "skill_ids text[] NOT NULL DEFAULT '{}');",
+    "CREATE TABLE IF NOT EXISTS roster_unit_snapshot ("
+    "player_id text NOT NULL, "
+    "unit_id smallint NOT NULL REFERENCES roster_unit_dictionary (unit_id), "
+    "snapshot_date date NOT NULL, "
+    "rarity smallint NOT NULL, "
+    "level smallint NOT NULL, "
+    "gear_tier smallint NOT NULL, "
+    "relic_tier smallint NOT NULL, "
+    "skill_tiers smallint[] NOT NULL, "
+    "PRIMARY KEY (player_id, unit_id, snapshot_date));",
+    "CREATE INDEX IF NOT EXISTS roster_unit_snapshot_unit_idx "
+    "ON roster_unit_snapshot (unit_id, snapshot_date);",
+)
+# Skill ids are only ever appended, so stored skill_tiers arrays keep their meaning
+UNIT_DICTIONARY_UPSERT_SQL: str = (
+    "INSERT INTO roster_unit_dictionary AS d (definition_id, skill_ids) "
+    "VALUES %s "
+    "ON CONFLICT (definition_id) DO UPDATE SET skill_ids = d.skill_ids || ARRAY("
+    "SELECT s FROM unnest(EXCLUDED.skill_ids) AS s WHERE s <> ALL(d.skill_ids)) "
+    "WHERE NOT (EXCLUDED.skill_ids <@ d.skill_ids);"
+)
+UNIT_DICTIONARY_TEMPLATE: str = "(%s, %s::text[])"
+# Only units that differ from their latest stored state get a new row
+UNIT_SNAPSHOT_INSERT_SQL: str = (
+    "INSERT INTO roster_unit_snapshot "
+    "(player_id, unit_id, snapshot_date, rarity, level, gear_tier, relic_tier, skill_tiers) "
+    "SELECT v.player_id, v.unit_id, CURRENT_DATE, v.rarity, v.level, v.gear_tier, "
+    "v.relic_tier, v.skill_tiers "
+    "FROM (VALUES %s) AS v (player_id, unit_id, rarity, level, gear_tier, relic_tier, skill_tiers) "
+    "LEFT JOIN LATERAL (SELECT s.rarity, s.level, s.gear_tier, s.relic_tier, s.skill_tiers "
+    "FROM roster_unit_snapshot AS s "
+    "WHERE s.player_id = v.player_id AND s.unit_id = v.unit_id "
+    "ORDER BY s.snapshot_date DESC LIMIT 1) AS last ON true "
+    "WHERE (last.rarity, last.level, last.gear_tier, last.relic_tier, last.skill_tiers) "
+    "IS DISTINCT FROM (v.rarity, v.level, v.gear_tier, v.relic_tier, v.skill_tiers) "
+    "ON CONFLICT (player_id, unit_id, snapshot_date) DO UPDATE SET "
+    "rarity = EXCLUDED.rarity, level = EXCLUDED.level, gear_tier = EXCLUDED.gear_tier, "
+    "relic_tier = EXCLUDED.relic_tier, skill_tiers = EXCLUDED.skill_tiers;"
+)
+UNIT_SNAPSHOT_TEMPLATE: str = (
+    "(%s, %s::smallint, %s::smallint, %s::smallint, %s::smallint, %s::smallint, %s::smallint[])"
+)
+
+
+@dataclass(slots=True, frozen=True)
+class UnitState:
+    """
+    The stored state of a unit on a snapshot date
+    """
+
+    definition_id: str
+    snapshot_date: date
+    rarity: int
+    level: int
+    gear_tier: int
+    relic_tier: int
+    skill_tiers: dict[str, int]
+
+
+def get_snapshot_mode() -> str:
+    """
+    Get the snapshot scope from the optional ROSTER_SNAPSHOT env var.
+    'watched' (default) stores the units of the roster rules, 'all' every unit
+    (the rosters are then fully decoded), 'off' disables snapshots
+    """
+    mode: str = os.getenv("ROSTER_SNAPSHOT", "watched").lower()
+    if mode not in ("watched", "all", "off"):
+        logger.warning("Invalid ROSTER_SNAPSHOT: %s. Using watched", mode)
+        return "watched"
+    return mode
+
+
+def _dictionary_rows(rosters: list[tuple[str, PlayerRoster]]) -> list[tuple]:
+    """
+    Build (definition_id, skill_ids) rows of every unit in the rosters, skill ids in first seen order
+    """
+    skill_ids: dict[str, dict[str, None]] = {}
+    for _, roster in rosters:
+        for definition_id, unit in roster.units.items():
+            skill_ids.setdefault(definition_id, {}).update(dict.fromkeys(unit.skill_tiers))
+    return [(definition_id, list(ids)) for definition_id, ids in skill_ids.items()]
+
+
+def _snapshot_rows(
+    rosters: list[tuple[str, PlayerRoster]], dictionary: dict[str, tuple[int, list[str]]]
+) -> list[tuple]:
+    """
+    Integer code the units of the rosters with the unit dictionary
+    """
+    rows = []
+    for player_id, roster in rosters:
+        for definition_id, unit in roster.units.items():
+            unit_id, skill_ids = dictionary[definition_id]
+            rows.append(
+                (
+                    player_id,
+                    unit_id,
+                    unit.rarity,
+                    unit.level,
+                    unit.gear_tier,
+                    unit.relic_tier,
+                    [unit.skill_tiers.get(skill_id, 0) for skill_id in skill_ids],
+                )
+            )
+    return rows
+
+
+def ensure_roster_snapshots():
+    """
+    Create the unit dictionary and snapshot tables, if they don't exist yet
+    """
+    conn = None
+    try:
+        conn = get_connection()
+
+        with conn.cursor() as cur:
+            for ddl_str in ROSTER_SNAPSHOT_DDL:
+                cur.execute(ddl_str)
+            conn.commit()
+
+    except DatabaseError as db_error:
+        logger.error("Database error: %s", db_error)
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            release_connection(conn)
+
+
+def store_roster_snapshots(rosters: list[tuple[str, PlayerRoster]]) -> int:
+    """
+    Store today's state of every unit of the (player_id, roster) pairs, that changed since
+    its latest snapshot, in one transaction. Returns the number of stored unit states.
+    The tables have to exist, see ensure_roster_snapshots
+    """
+    if not rosters:
+        return 0
+
+    conn = None
+    stored_count = 0
+    try:
+        conn = get_connection()
+
+        with conn.cursor() as cur:
+            dictionary_rows = _dictionary_rows(rosters)
+            execute_batch_values(
+                cur, UNIT_DICTIONARY_UPSERT_SQL, dictionary_rows, UNIT_DICTIONARY_TEMPLATE
+            )
+            cur.execute(
+                "SELECT definition_id, unit_id, skill_ids FROM roster_unit_dictionary "
+                "WHERE definition_id = ANY(%s);",
+                ([row[0] for row in dictionary_rows],),
+            )
+            dictionary = {row[0]: (row[1], list(row[2])) for row in cur.fetchall()}
+            stored_count = execute_batch_values(
+                cur,
+                UNIT_SNAPSHOT_INSERT_SQL,
+                _snapshot_rows(rosters, dictionary),
+                UNIT_SNAPSHOT_TEMPLATE,
+            )
+            conn.commit()
+            logger.info(
+                "Stored %s changed unit states of %s rosters", stored_count, len(rosters)
+            )
+
+    except IntegrityError as ie:
+        logger.error(
+            "Data integrity error (duplicate keys, constraint violations): %s", ie
+        )
+        if conn:
+            conn.rollback()
+    except DatabaseError as db_error:
+        logger.error("Database error: %s", db_error)
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            release_connection(conn)
+    return stored_count
+
+
+def _unit_state(row: tuple) -> UnitState:
+    """
+    Decode a (definition_id, skill_ids, snapshot_date, rarity, level, gear_tier, relic_tier, skill_tiers) row
+    """
+    definition_id, skill_ids, snapshot_date, rarity, level, gear_tier, relic_tier, skill_tiers = row
+    return UnitState(
+        definition_id=definition_id,
+        snapshot_date=snapshot_date,
+        rarity=rarity,
+        level=level,
+        gear_tier=gear_tier,
+        relic_tier=relic_tier,
+        skill_tiers=dict(zip(skill_ids, skill_tiers)),
+    )
+
+
+def read_unit_history(definition_id: str, player_id: str | None = None) -> list[tuple[str, UnitState]]:
+    """
+    Get every stored state of a unit as (player_id, state), for one player or all players,
+    ordered by player and date
+    """
+    query_str: str = (
+        "SELECT s.player_id, d.definition_id, d.skill_ids, s.snapshot_date, s.rarity, "
+        "s.level, s.gear_tier, s.relic_tier, s.skill_tiers "
+        "FROM roster_unit_snapshot AS s "
+        "JOIN roster_unit_dictionary AS d USING (unit_id) "
+        "WHERE d.definition_id = %s AND (%s::text IS NULL OR s.player_id = %s) "
+        "ORDER BY s.player_id, s.snapshot_date;"
+    )
+    rows = make_sql_query_single(
+        query_str, "roster_unit_snapshot", (definition_id, player_id, player_id)
+    )
+    return [(row[0], _unit_state(row[1:])) for row in rows]
+
+
+def read_roster_on_date(player_id: str, on_date: date) -> dict[str, UnitState]:
+    """
+    Get the state of every stored unit of a player on a date, by definitionId
+    """
+    query_str: str = (
+        "SELECT DISTINCT ON (s.unit_id) d.definition_id, d.skill_ids, s.snapshot_date, "
+        "s.rarity, s.level, s.gear_tier, s.relic_tier, s.skill_tiers "
+        "FROM roster_unit_snapshot AS s "
+        "JOIN roster_unit_dictionary AS d USING (unit_id) "
+        "WHERE s.player_id = %s AND s.snapshot_date <= %s "
+        "ORDER BY s.unit_id, s.snapshot_date DESC;"
+    )
+    rows = make_sql_query_single(query_str, "roster_unit_snapshot", (player_id, on_date))
+    return {row[0]: _unit_state(row) for row in rows}
@@ -0,0 +1,257 @@
+"""
+Long running scheduler for the cron jobs of the container.
+Runs every job on the schedule of its crontab line in scripts/entrypoint.sh, inside one
+process, so the imports, the DB pool, the comlink session and cache and the Sheets client
+stay warm between runs. A job that is still running when it is due again is skipped.
+The jobs are run in process instead of through their scripts/run_*.sh wrappers, which only
+start the same entrypoint functions with python -m. With SCHEDULER_LOG_DIR set, the log
+records of every job are also written to its log file of the crontab in that directory.
+
+Usage: python -m src.scheduler [--list]
+"""
+
+import argparse
+import contextvars
+import logging
+import logging.handlers
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable
+from dotenv import load_dotenv
+
+from .check_raid_results import process_raid_results
+from .log_gp import process_gp_log
+from .log_raid_score import process_raid_score_log
+from .log_tickets import process_ticket_log
+from .manage_members import process_members
+from .push_to_sheets import spreadsheet_update
+from .roster_checks import run_roster_checks
+from .db_connection import close_pool, log_pool_stats
+from .db_async import shutdown_async_db
+from .response_cache import get_response_cache
+from .helper_functions import setup_logging
+
+
+logger = logging.getLogger("guild_data_app")
+setup_logging()
+
+# Name of the job the current thread works for, read by the per job log handlers
+current_job: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_job", default=None)
+
+# Job log files are rotated at midnight, keeping a week like the logrotate config of the cron mode
+JOB_LOG_BACKUPS: int = 7
+
+# (min, max) of the minute, hour, day of month, month and day of week fields
+CRON_FIELD_RANGES: tuple[tuple[int, int], ...] = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def parse_cron_field(field_str: str, low: int, high: int) -> frozenset[int]:
+    """
+    Get the values of a crontab field: *, N, N-M and */S or N-M/S steps, comma separated
+    """
+    values: set[int] = set()
+    for part in field_str.split(","):
+        range_str, _, step_str = part.partition("/")
+        if range_str == "*":
+            start, end = low, high
+        elif "-" in range_str:
+            start_str, end_str = range_str.split("-", 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = int(range_str)
+            end = high if step_str else start
+        step = int(step_str) if step_str else 1
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Invalid crontab field: {field_str!r}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(slots=True, frozen=True)
+class CronSchedule:
+    """
+    A parsed five field crontab schedule
+    """
+
+    expression: str
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]
+    any_day: bool
+    any_weekday: bool
+
+    @classmethod
+    def parse(cls, cron_str: str) -> "CronSchedule":
+        fields = cron_str.split()
+        if len(fields) != 5:
+            raise ValueError(f"Crontab schedule needs 5 fields: {cron_str!r}")
+        minutes, hours, days, months, weekdays = (
+            parse_cron_field(f, low, high) for f, (low, high) in zip(fields, CRON_FIELD_RANGES)
+        )
+        return cls(
+            cron_str,
+            minutes,
+            hours,
+            days,
+            months,
+            # day of week 7 is sunday like 0
+            frozenset(d % 7 for d in weekdays),
+            # like cron, a field starting with * (also */S) counts as unrestricted
+            fields[2].startswith("*"),
+            fields[4].startswith("*"),
+        )
+
+    def matches(self, moment: datetime) -> bool:
+        """
+        Check if the schedule is due in the minute of moment.
+        Like cron, a restricted day of month and day of week match if either matches
+        """
+        if (
+            moment.minute not in self.minutes
+            or moment.hour not in self.hours
+            or moment.month not in self.months
+        ):
+            return False
+        day_match = moment.day in self.days
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+
+@dataclass(slots=True)
+class Job:
+    """
+    A scheduled job. Its lock is held while it runs, so it never overlaps itself
+    """
+
+    name: str
+    schedule: CronSchedule
+    run: Callable[[], None]
+    log_file: str | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    skipped: int = 0
+
+
+# Same schedules and log files as the crontab of scripts/entrypoint.sh
+JOBS: tuple[Job, ...] = (
+    Job("push_to_sheets", CronSchedule.parse("*/2 * * * *"), spreadsheet_update, "push_to_sheets.log"),
+    Job("log_raid_score", CronSchedule.parse("0 7 */3 * *"), process_raid_score_log, "run_log_raid_score.log"),
+    Job("log_tickets", CronSchedule.parse("29 * * * *"), process_ticket_log, "run_log_tickets.log"),
+    Job("manage_members", CronSchedule.parse("*/3 * * * *"), process_members, "run_manage_members.log"),
+    Job("check_raid_results", CronSchedule.parse("0 4 * * *"), process_raid_results, "run_check_raid_results.log"),
+    Job("roster_checks", CronSchedule.parse("0 5 * * *"), run_roster_checks, "run_roster_checks.log"),
+    Job("log_gp", CronSchedule.parse("0 6 * * */2"), process_gp_log, "run_log_gp.log"),
+)
+
+
+def add_job_log_handlers(jobs: tuple[Job, ...], log_dir: str) -> list[logging.Handler]:
+    """
+    Write the log records of every job with a log file to that file in log_dir,
+    in the detailed format of logging_config.json. The files are rotated daily
+    """
+    formatter = logging.Formatter(
+        "[%(levelname)s|%(module)s|L%(lineno)d] %(asctime)s: %(message)s", "%Y-%m-%dT%H:%M:%S%z"
+    )
+    handlers: list[logging.Handler] = []
+    for job in jobs:
+        if job.log_file is None:
+            continue
+        handler = logging.handlers.TimedRotatingFileHandler(
+            os.path.join(log_dir, job.log_file),
+            when="midnight",
+            backupCount=JOB_LOG_BACKUPS,
+            encoding="utf-8",
+        )
+        handler.setFormatter(formatter)
+        handler.addFilter(lambda record, name=job.name: current_job.get() == name)
+        logger.addHandler(handler)
+        handlers.append(handler)
+    return handlers
+
+
+def run_job(job: Job) -> None:
+    """
+    Run a job, whose lock is already held, and release the lock afterwards
+    """
+    current_job.set(job.name)
+    start = time.perf_counter()
+    logger.info("Starting %s...", job.name)
+    try:
+        load_dotenv()
+        job.run()
+        logger.info("%s finished in %.1fs", job.name, time.perf_counter() - start)
+    except Exception:
+        # A failed run must not stop the scheduler, the next run starts fresh
+        logger.exception("%s failed after %.1fs", job.name, time.perf_counter() - start)
+    finally:
+        job.lock.release()
+
+
+def start_due_jobs(jobs: tuple[Job, ...], moment: datetime) -> list[threading.Thread]:
+    """
+    Start every job due at moment in its own thread, skipping jobs whose last run is still going
+    """
+    threads: list[threading.Thread] = []
+    for job in jobs:
+        if not job.schedule.matches(moment):
+            continue
+        if not job.lock.acquire(blocking=False):
+            job.skipped += 1
+            logger.warning("%s is still running, skipping its %s run", job.name, f"{moment:%H:%M}")
+            continue
+        thread = threading.Thread(target=run_job, args=(job,), name=job.name)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def run_scheduler(jobs: tuple[Job, ...] = JOBS, stop: threading.Event | None = None) -> None:
+    """
+    Start the due jobs at the beginning of every minute until stop is set,
+    then wait for the running jobs and close the DB pools
+    """
+    stop = stop or threading.Event()
+    log_dir: str | None = os.getenv("SCHEDULER_LOG_DIR")
+    log_handlers = add_job_log_handlers(jobs, log_dir) if log_dir else []
+    running: list[threading.Thread] = []
+    next_minute = datetime.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    logger.info("Scheduler started with jobs: %s", ", ".join(job.name for job in jobs))
+    while not stop.wait(max(0.0, (next_minute - datetime.now()).total_seconds())):
+        running = [t for t in running if t.is_alive()]
+        running += start_due_jobs(jobs, next_minute)
+        if next_minute.minute == 0:
+            log_pool_stats()
+            get_response_cache().log_stats()
+        next_minute += timedelta(minutes=1)
+        if next_minute < datetime.now() - timedelta(minutes=1):
+            # like cron, minutes missed while the host was suspended are not caught up
+            next_minute = datetime.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+
+    logger.info("Scheduler stopping, waiting for %s running jobs", len(running))
+    for thread in running:
+        thread.join()
+    for handler in log_handlers:
+        logger.removeHandler(handler)
+        handler.close()
+    shutdown_async_db()
+    close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the guild data jobs on their schedules")
+    parser.add_argument("--list", action="store_true", help="list the jobs and exit")
+    if parser.parse_args().list:
+        for scheduled_job in JOBS:
+            print(f"{scheduled_job.schedule.expression:<16}{scheduled_job.name}")
+    else:
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+        run_scheduler(stop=stop_event)
@@ -16,12 +16,29 @@ setup_logging()
 load_dotenv()
 
 
+_gc = None
 
-filepath: str = check_none_str(
-    os.getenv("FILEPATH_CREDENTIALS"),
-    "FILEPATH_CREDENTIALS should not be None. Check .env file",
-)
-gc = gspread.service_account(filename=Path(filepath))
+
+def get_gspread_client() -> gspread.Client:
+    """
+    Authenticate the gspread service account on first use and reuse the client afterwards
+    """
+    global _gc
+    if _gc is None:
+        filepath: str = check_none_str(
+            os.getenv("FILEPATH_CREDENTIALS"),
+            "FILEPATH_CREDENTIALS should not be None. Check .env file",
+        )
+        _gc = gspread.service_account(filename=Path(filepath))
+    return _gc
+
+
+@cache
+def open_spreadsheet(spreadsheet_name: str) -> gspread.Spreadsheet:
+    """
+    Open a spreadsheet by name once and reuse the handle afterwards
+    """
+    return get_gspread_client().open(spreadsheet_name)
 
 
 def rate_limit(calls_per_minute: float):
@@ -61,7 +78,7 @@ def _get_spreadsheet_values_cached(
         g_config[1],
     )
     logger.info(g_config)
-    sheet = gc.open(g_config[3])
+    sheet = open_spreadsheet(g_config[3])
     try:
         active_worksheet = sheet.worksheet(worksheet_name)
         values_in_sheets: list[list] = active_worksheet.get_all_values(
@@ -70,7 +87,7 @@ def _get_spreadsheet_values_cached(
         return values_in_sheets
     except gspread.exceptions.SpreadsheetNotFound as e:
         logger.error(e)
-        logger.debug("Spreadsheet %s is non-existent or inaccessible", gc)
+        logger.debug("Spreadsheet %s is non-existent or inaccessible", g_config[3])
     except gspread.exceptions.WorksheetNotFound:
         logger.warning("Worksheet %s is non-existent or inaccessible", worksheet_name)
     except gspread.exceptions.GSpreadException as e:
@@ -81,6 +98,13 @@ def _get_spreadsheet_values_cached(
         )
 
 
+def clear_spreadsheet_values() -> None:
+    """
+    Forget the values read in an earlier spreadsheet update, so a long running process reads them again
+    """
+    _get_spreadsheet_values_cached.__wrapped__.cache_clear()
+
+
 def get_spreadsheet_values(g_config: list, worksheet_name: str) -> list[list] | None:
     """
     Wrapper for the cached spreadsheet read function
@@ -174,7 +198,7 @@ def write_to_sheet(
         g_config[1],
         worksheet_range,
     )
-    sheet = gc.open(g_config[3])
+    sheet = open_spreadsheet(g_config[3])
 
     try:
         active_worksheet = sheet.worksheet(worksheet_name)
@@ -186,7 +210,7 @@ def write_to_sheet(
         )
     except gspread.exceptions.SpreadsheetNotFound as e:
         logger.error(e)
-        logger.debug("Spreadsheet %s is non-existent or inaccessible", gc)
+        logger.debug("Spreadsheet %s is non-existent or inaccessible", g_config[3])
     except gspread.exceptions.WorksheetNotFound:
         logger.warning("Worksheet %s is non-existent or inaccessible", worksheet_name)
     except gspread.exceptions.GSpreadException as e:
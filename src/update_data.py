@@ -1,219 +1,428 @@
 import logging
-import psycopg2
-from .helper_functions import get_env, setup_logging
+from typing import Any
+from .comlink_models import Member
+from .membership_diff import MembershipDiff
+from .db_connection import (
+    get_connection,
+    release_connection,
+    execute_batch_values,
+    DatabaseError,
+    IntegrityError,
+)
+from .db_async import execute_async, execute_batch_values_async, execute_transaction_async
+from .helper_functions import check_sql_identifier, setup_logging
 
 logger = logging.getLogger("guild_data_app")
 setup_logging()
 
-def setup_connection():
+MEMBER_STATE_SYNC_SQL: str = (
+    "UPDATE players AS p SET "
+    "last_activity_time = v.last_activity_time, total_gp = v.total_gp "
+    "FROM (VALUES %s) AS v (player_id, last_activity_time, total_gp) "
+    "WHERE p.player_id = v.player_id;"
+)
+MEMBER_STATE_TEMPLATE: str = "(%s, %s::timestamp, %s::bigint)"
+
+# Joined players may still have a row from another tracked guild, those rows are moved
+MEMBER_MOVE_SQL: str = (
+    "UPDATE players AS p SET nickname = v.nickname, guild_id = v.guild_id "
+    "FROM (VALUES %s) AS v (player_id, nickname, guild_id) "
+    "WHERE p.player_id = v.player_id;"
+)
+MEMBER_MOVE_TEMPLATE: str = "(%s, %s, %s)"
+MEMBER_JOIN_SQL: str = (
+    "INSERT INTO players "
+    "(player_id, nickname, total_gp, guild_id, last_activity_time) "
+    "SELECT v.player_id, v.nickname, v.total_gp, v.guild_id, v.last_activity_time "
+    "FROM (VALUES %s) AS v (player_id, nickname, total_gp, guild_id, last_activity_time) "
+    "WHERE NOT EXISTS (SELECT 1 FROM players p WHERE p.player_id = v.player_id);"
+)
+MEMBER_JOIN_TEMPLATE: str = "(%s, %s, %s::bigint, %s, %s::timestamp)"
+MEMBER_RENAME_SQL: str = (
+    "UPDATE players AS p SET nickname = v.nickname "
+    "FROM (VALUES %s) AS v (player_id, nickname) "
+    "WHERE p.player_id = v.player_id;"
+)
+MEMBER_RENAME_TEMPLATE: str = "(%s, %s)"
+# Only detach players still in the guild, a player may already have joined another tracked guild
+MEMBER_LEAVE_SQL: str = (
+    "UPDATE players SET guild_id = %s WHERE player_id = ANY(%s) AND guild_id::text = %s;"
+)
+# The members FULL JOIN the current players of the guild, so players that left are source rows
+# without member columns. Postgres 15 has no WHEN NOT MATCHED BY SOURCE
+MEMBERSHIP_MERGE_SQL: str = (
+    "MERGE INTO players AS p "
+    "USING (SELECT COALESCE(v.player_id, cur.player_id) AS player_id, v.nickname, v.total_gp, "
+    "v.last_activity_time, v.player_id IS NULL AS has_left "
+    "FROM (VALUES %s) AS v (player_id, nickname, total_gp, last_activity_time) "
+    "FULL JOIN (SELECT player_id FROM players WHERE guild_id::text = %s) AS cur "
+    "ON cur.player_id = v.player_id) AS s "
+    "ON p.player_id = s.player_id "
+    "WHEN MATCHED AND s.has_left THEN UPDATE SET guild_id = %s "
+    "WHEN MATCHED THEN UPDATE SET nickname = s.nickname, total_gp = s.total_gp, "
+    "last_activity_time = s.last_activity_time, guild_id = %s "
+    "WHEN NOT MATCHED THEN INSERT (player_id, nickname, total_gp, guild_id, last_activity_time) "
+    "VALUES (s.player_id, s.nickname, s.total_gp, %s, s.last_activity_time);"
+)
+MEMBERSHIP_MERGE_TEMPLATE: str = "(%s, %s, %s::bigint, %s::timestamp)"
+
+LAST_RAID_RESULTS_SQL: str = (
+    "UPDATE players AS p SET last_raid_result = v.last_raid_result "
+    "FROM (VALUES %s) AS v (player_id, last_raid_result) "
+    "WHERE p.player_id = v.player_id;"
+)
+LAST_RAID_RESULTS_TEMPLATE: str = "(%s, %s::bigint)"
+
+ROSTER_CHECK_COLUMNS: tuple[str, ...] = (
+    "reva_ready",
+    "gi_r7",
+    "bkm_r7",
+    "jkck_unlocked",
+    "jkck_r7",
+    "cere_r7",
+    "jkck_skill_levels_done",
+)
+
+
+def build_roster_checks_upsert(columns: tuple[str, ...]) -> tuple[str, str]:
     """
-    Set up psql connection dict with params from .env file
+    Build the upsert SQL and VALUES template for (*columns, player_id) roster check rows.
+    Rows whose checks have not changed are left untouched
     """
-    password: str = get_env("PASS")
-    host: str = get_env("HOST")
-    user: str = get_env("USER")
-    db_name: str = get_env("DBNAME")
-    port: int = int(get_env("PORT"))
-
-    connection_dict = {
-        "dbname": db_name,
-        "user": user,
-        "password": password,
-        "port": port,
-        "host": host,
-    }
-    return connection_dict
+    for column in columns:
+        check_sql_identifier(column, f"Invalid roster check column name: {column!r}")
+        if column == "player_id":
+            raise ValueError("player_id is not a roster check column")
+    column_list: str = ", ".join(columns)
+    sql_str: str = (
+        f"INSERT INTO players_roster_checks AS prc ({column_list}, player_id) "
+        "VALUES %s "
+        "ON CONFLICT (player_id) DO UPDATE SET "
+        + ", ".join(f"{c} = EXCLUDED.{c}" for c in columns)
+        + " WHERE ("
+        + ", ".join(f"prc.{c}" for c in columns)
+        + ") IS DISTINCT FROM ("
+        + ", ".join(f"EXCLUDED.{c}" for c in columns)
+        + ");"
+    )
+    template: str = "(" + ", ".join(["%s"] * (len(columns) + 1)) + ")"
+    return sql_str, template
+
+
+ROSTER_CHECK_STATE_DDL: str = (
+    "CREATE TABLE IF NOT EXISTS roster_check_state ("
+    "player_id text PRIMARY KEY, "
+    "fingerprint text NOT NULL, "
+    "character_gp bigint, "
+    "rules_version text NOT NULL, "
+    "missing integer[] NOT NULL, "
+    "checked_at timestamp NOT NULL DEFAULT NOW());"
+)
+ROSTER_CHECK_STATE_UPSERT_SQL: str = (
+    "INSERT INTO roster_check_state "
+    "(player_id, fingerprint, character_gp, rules_version, missing, checked_at) "
+    "VALUES %s "
+    "ON CONFLICT (player_id) DO UPDATE SET "
+    "fingerprint = EXCLUDED.fingerprint, character_gp = EXCLUDED.character_gp, "
+    "rules_version = EXCLUDED.rules_version, missing = EXCLUDED.missing, "
+    "checked_at = EXCLUDED.checked_at;"
+)
+ROSTER_CHECK_STATE_TEMPLATE: str = "(%s, %s, %s, %s, %s, NOW())"
+
+
+def _member_state_rows(members: list[Member]) -> list[tuple]:
+    """
+    Build (player_id, last_activity_time, total_gp) rows from the members of a guild
+    """
+    return [(m.player_id, m.last_activity_time, m.galactic_power) for m in members]
 
 
-def remove_from_guild(player_id: str):
+def _membership_statements(diff: MembershipDiff) -> list[tuple[str, Any, str | None]]:
+    """
+    Build the (sql_str, params, template) statements applying a membership diff,
+    leaving out statements without rows
+    """
+    statements: list[tuple[str, Any, str | None]] = [
+        (
+            MEMBER_MOVE_SQL,
+            [(m.player_id, m.player_name, diff.guild_id) for m in diff.joined],
+            MEMBER_MOVE_TEMPLATE,
+        ),
+        (MEMBER_JOIN_SQL, diff.joined_rows(), MEMBER_JOIN_TEMPLATE),
+        (MEMBER_RENAME_SQL, list(diff.renamed), MEMBER_RENAME_TEMPLATE),
+        (MEMBER_STATE_SYNC_SQL, _member_state_rows(list(diff.members)), MEMBER_STATE_TEMPLATE),
+    ]
+    if diff.left:
+        statements.append((MEMBER_LEAVE_SQL, (" ", list(diff.left), diff.guild_id), None))
+    return [statement for statement in statements if statement[1]]
+
+
+def _membership_merge(guild_id: str, members: tuple[Member, ...] | list[Member]) -> tuple[str, list]:
+    """
+    Build the MERGE statement and its params reconciling the players of a guild with its members
+    """
+    if not members:
+        # an empty VALUES list is no valid source, without members everyone left
+        return "UPDATE players SET guild_id = %s WHERE guild_id::text = %s;", [" ", guild_id]
+    values_str: str = ", ".join([MEMBERSHIP_MERGE_TEMPLATE] * len(members))
+    params: list = [
+        value
+        for m in members
+        for value in (m.player_id, m.player_name, m.galactic_power, m.last_activity_time)
+    ]
+    return (
+        MEMBERSHIP_MERGE_SQL.replace("VALUES %s", f"VALUES {values_str}", 1),
+        params + [guild_id, " ", guild_id, guild_id],
+    )
+
+
+def reconcile_guild_members(guild_id: str, members: tuple[Member, ...] | list[Member]) -> int:
     """
-    Remove guild_id from a player record to update guild affiliation status
+    Insert, update and detach the players of a guild to match its members with a single MERGE.
+    Returns the number of merged players
     """
-    pg_connection_dict = setup_connection()
+    sql_str, params = _membership_merge(guild_id, members)
     conn = None
+    merged_count = 0
     try:
-        # read the connection parameters
-
-        # connect to the PostgreSQL server
-        logger.info("Removing from SON...")
-        conn = psycopg2.connect(**pg_connection_dict)
+        conn = get_connection()
 
         with conn.cursor() as cur:
-            # Update a data row in the table
-            cur.execute(
-                "UPDATE players SET guild_id = %s WHERE nickname = %s ;",
-                (" ", player_id),
-            )
-
-            # Commit the changes
+            cur.execute(sql_str, params)
+            merged_count = max(cur.rowcount, 0)
             conn.commit()
+            logger.info("Reconciled %s players of %s", merged_count, guild_id)
 
-    except psycopg2.IntegrityError as ie:
+    except IntegrityError as ie:
         logger.error(
             "Data integrity error (duplicate keys, constraint violations): %s", ie
         )
         if conn:
             conn.rollback()
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+    return merged_count
 
 
-def update_activity(activity_time, player_id: str):
+def apply_membership_diff(diff: MembershipDiff) -> bool:
     """
-    Update the last activity time for a player
+    Add the joined players, rename the renamed ones, sync activity and GP of all members
+    and detach the players that left from the guild, in a single transaction
     """
-    pg_connection_dict = setup_connection()
+    logger.info(
+        "%s: %s joined, %s renamed, %s left",
+        diff.guild_id,
+        len(diff.joined),
+        len(diff.renamed),
+        len(diff.left),
+    )
+    statements = _membership_statements(diff)
+    if not statements:
+        return True
+
     conn = None
+    applied = False
     try:
-        # read the connection parameters
-
-        # connect to the PostgreSQL server
-        conn = psycopg2.connect(**pg_connection_dict)
-        # Open a cursor to perform database operations
+        conn = get_connection()
 
         with conn.cursor() as cur:
-            # Update a data row in the table
-            cur.execute(
-                ("UPDATE players SET last_activity_time = %s WHERE player_id = %s ;"),
-                (activity_time, player_id),
-            )
-
-            # Commit the changes
+            for sql_str, params, template in statements:
+                if template is None:
+                    cur.execute(sql_str, params)
+                else:
+                    execute_batch_values(cur, sql_str, params, template)
             conn.commit()
+            applied = True
 
-    except psycopg2.IntegrityError as ie:
+    except IntegrityError as ie:
         logger.error(
             "Data integrity error (duplicate keys, constraint violations): %s", ie
         )
         if conn:
             conn.rollback()
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+    return applied
 
 
-def updateGP(gp, player_id: str):
+def update_last_raid_results(raid_results: list[tuple]) -> int:
     """
-    Update the current total GP for a player
+    Update the last raid result for many (player_id, last_raid_result) rows in one statement
     """
-    pg_connection_dict = setup_connection()
+    if not raid_results:
+        logger.info("No raid results to update.")
+        return 0
+
     conn = None
+    updated_count = 0
     try:
-
-        # connect to the PostgreSQL server
-        conn = psycopg2.connect(**pg_connection_dict)
-        # Open a cursor to perform database operations
+        logger.info("Updating %s last raid results in DB...", len(raid_results))
+        conn = get_connection()
 
         with conn.cursor() as cur:
-            # Update a data row in the table
-            cur.execute(
-                "UPDATE players SET total_gp = %s WHERE player_id = %s ;",
-                (gp, player_id),
+            updated_count = execute_batch_values(
+                cur, LAST_RAID_RESULTS_SQL, raid_results, LAST_RAID_RESULTS_TEMPLATE
             )
-
-            # Commit the changes
             conn.commit()
 
-    except psycopg2.IntegrityError as ie:
+    except IntegrityError as ie:
         logger.error(
             "Data integrity error (duplicate keys, constraint violations): %s", ie
         )
         if conn:
             conn.rollback()
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+    return updated_count
 
 
-def updateLastRaidResult(last_raid_result, player_id: str):
+def _latest_roster_checks(player_checks) -> list[tuple]:
     """
-    Update the last raid result for a player
+    ON CONFLICT can only touch a row once per statement, keep the latest check per player
+    """
+    return list({check[-1]: tuple(check) for check in player_checks}.values())
+
+
+def ensure_roster_check_state():
+    """
+    Create the roster_check_state table, if it doesn't exist yet, so it can be planned against
     """
-    pg_connection_dict = setup_connection()
     conn = None
     try:
-        # read the connection parameters
-
-        # connect to the PostgreSQL server
-        logger.info("Updating last raid result in DB...")
-        conn = psycopg2.connect(**pg_connection_dict)
-        # Open a cursor to perform database operations
+        conn = get_connection()
 
         with conn.cursor() as cur:
-            # Update a data row in the table
-            cur.execute(
-                "UPDATE players SET last_raid_result = %s WHERE player_id = %s ;",
-                (last_raid_result, player_id),
-            )
-
-            # Commit the changes
+            cur.execute(ROSTER_CHECK_STATE_DDL)
             conn.commit()
 
-    except psycopg2.IntegrityError as ie:
-        logger.error(
-            "Data integrity error (duplicate keys, constraint violations): %s", ie
-        )
-        if conn:
-            conn.rollback()
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+
+
+def _roster_check_statements(
+    player_checks, states: list[tuple], columns: tuple[str, ...]
+) -> list[tuple[str, Any, str]]:
+    """
+    Build the (sql_str, rows, template) statements upserting roster checks and their check state,
+    leaving out statements without rows
+    """
+    upsert_sql, template = build_roster_checks_upsert(columns)
+    statements: list[tuple[str, Any, str]] = [
+        (upsert_sql, _latest_roster_checks(player_checks), template),
+        (ROSTER_CHECK_STATE_UPSERT_SQL, list(states), ROSTER_CHECK_STATE_TEMPLATE),
+    ]
+    return [statement for statement in statements if statement[1]]
 
 
-def updateRosterChecks(player_checks):
+def upsert_roster_checks_with_state(
+    player_checks, states: list[tuple], columns: tuple[str, ...] = ROSTER_CHECK_COLUMNS
+) -> bool:
     """
-    Update the roster check entry for a player
+    Upsert the (*columns, player_id) roster checks of a guild and store the
+    (player_id, fingerprint, character_gp, rules_version, missing) check state of its fetched
+    players in a single transaction, so no state is stored without its checks
     """
-    pg_connection_dict = setup_connection()
+    statements = _roster_check_statements(player_checks, states, columns)
+    if not statements:
+        logger.info("No roster checks to persist.")
+        return True
+
     conn = None
+    persisted = False
     try:
-        # read the connection parameters
-
-        # connect to the PostgreSQL server
-        logger.info("Updating roster checks in DB...")
-        conn = psycopg2.connect(**pg_connection_dict)
-        # Open a cursor to perform database operations
+        conn = get_connection()
 
         with conn.cursor() as cur:
-            # Update a data row in the table
-            cur.execute(
-                "UPDATE players_roster_checks SET reva_ready = %s,"
-                " gi_r7 = %s, bkm_r7 = %s,"
-                " jkck_unlocked = %s, jkck_r7 = %s, cere_r7 = %s,"
-                " jkck_skill_levels_done = %s WHERE player_id = %s ;",
-                player_checks,
-            )
-
-            # Commit the changes
+            for sql_str, rows, template in statements:
+                execute_batch_values(cur, sql_str, rows, template)
             conn.commit()
+            persisted = True
+            logger.info(
+                "Persisted %s roster checks and the check state of %s players",
+                len(player_checks),
+                len(states),
+            )
 
-    except psycopg2.IntegrityError as ie:
+    except IntegrityError as ie:
         logger.error(
             "Data integrity error (duplicate keys, constraint violations): %s", ie
         )
         if conn:
             conn.rollback()
-    except psycopg2.Error as db_error:
+    except DatabaseError as db_error:
         logger.error("Database error: %s", db_error)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+    return persisted
+
+
+async def apply_membership_diff_async(diff: MembershipDiff) -> bool:
+    """
+    Async variant of apply_membership_diff
+    """
+    logger.info(
+        "%s: %s joined, %s renamed, %s left",
+        diff.guild_id,
+        len(diff.joined),
+        len(diff.renamed),
+        len(diff.left),
+    )
+    statements = _membership_statements(diff)
+    if not statements:
+        return True
+    return await execute_transaction_async(statements) is not None
+
+
+async def reconcile_guild_members_async(
+    guild_id: str, members: tuple[Member, ...] | list[Member]
+) -> int:
+    """
+    Async variant of reconcile_guild_members
+    """
+    merged_count = await execute_async(*_membership_merge(guild_id, members))
+    logger.info("Reconciled %s players of %s", merged_count, guild_id)
+    return merged_count
+
+
+async def update_last_raid_results_async(raid_results: list[tuple]) -> int:
+    """
+    Async variant of update_last_raid_results
+    """
+    return await execute_batch_values_async(
+        LAST_RAID_RESULTS_SQL, raid_results, LAST_RAID_RESULTS_TEMPLATE
+    )
+
+
+async def upsert_roster_checks_with_state_async(
+    player_checks, states: list[tuple], columns: tuple[str, ...] = ROSTER_CHECK_COLUMNS
+) -> bool:
+    """
+    Async variant of upsert_roster_checks_with_state
+    """
+    statements = _roster_check_statements(player_checks, states, columns)
+    if not statements:
+        return True
+    return await execute_transaction_async(statements) is not None
@@ -0,0 +1,88 @@
+from unittest.mock import Mock
+import pytest
+import requests
+
+from src.comlink_client import ComlinkClient
+
+
+@pytest.fixture
+def client(mocker):
+    """
+    Comlink client with a mocked session and no real backoff sleeps
+    """
+    mocker.patch("src.comlink_client.time.sleep")
+    comlink_client = ComlinkClient(timeout=5, retries=2)
+    comlink_client.session = Mock()
+    return comlink_client
+
+
+def make_response(status_code: int, content: dict | None = None) -> Mock:
+    response = Mock()
+    response.status_code = status_code
+    response.json.return_value = content
+    return response
+
+
+def test_successful_post(client):
+    """
+    A 200 response returns the decoded JSON and records the latency of the endpoint
+    """
+    client.session.post.return_value = make_response(200, {"guild": {}})
+
+    assert client.post("http://comlink:3000/guild", {"payload": {}}) == {"guild": {}}
+
+    client.session.post.assert_called_once_with(
+        "http://comlink:3000/guild", json={"payload": {}}, timeout=5
+    )
+    stats = client.get_stats()["/guild"]
+    assert stats["requests"] == 1
+    assert stats["errors"] == 0
+    assert stats["retries"] == 0
+
+
+def test_retries_server_errors_and_timeouts(client):
+    """
+    5xx responses and timeouts are retried until a request succeeds
+    """
+    client.session.post.side_effect = [
+        make_response(503),
+        requests.exceptions.Timeout("timed out"),
+        make_response(200, {"name": "player"}),
+    ]
+
+    assert client.post("http://comlink:3000/player", {"payload": {}}) == {"name": "player"}
+
+    assert client.session.post.call_count == 3
+    stats = client.get_stats()["/player"]
+    assert stats["requests"] == 3
+    assert stats["errors"] == 2
+    assert stats["retries"] == 2
+
+
+def test_gives_up_after_retries(client):
+    """
+    Requests that keep failing return None after all retries
+    """
+    client.session.post.return_value = make_response(500)
+
+    assert client.post("http://comlink:3000/guild", {"payload": {}}) is None
+    assert client.session.post.call_count == 3
+
+
+def test_client_errors_are_not_retried(client):
+    """
+    4xx responses are returned as None without retrying
+    """
+    client.session.post.return_value = make_response(400)
+
+    assert client.post("http://comlink:3000/guild", {"payload": {}}) is None
+    client.session.post.assert_called_once()
+
+
+def test_backoff_is_jittered_and_capped():
+    """
+    The backoff wait is random, but never above the exponential backoff or the cap
+    """
+    comlink_client = ComlinkClient(backoff_base=1.0, backoff_max=3.0)
+    for attempt in range(6):
+        assert 0 <= comlink_client._backoff(attempt) <= min(3.0, 2**attempt)
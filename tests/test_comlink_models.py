@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from src.comlink_models import GuildSnapshot, Member, PlayerRoster
+
+GUILD_RESPONSE = {
+    "guild": {
+        "member": [
+            {
+                "playerId": "P1",
+                "playerName": "One",
+                "galacticPower": 100,
+                "shipGalacticPower": 40,
+                "characterGalacticPower": 60,
+                "lastActivityTime": "1700000000000",
+                "memberContribution": [
+                    {"type": 1, "currentValue": 7},
+                    {"type": 2, "currentValue": "450"},
+                ],
+            },
+            {"playerId": "P2", "playerName": "Two", "memberContribution": []},
+        ],
+        "recentRaidResult": [
+            {"raidId": "order66", "raidMember": [{"playerId": "P1", "memberProgress": "1234"}]},
+            {"raidId": "order66", "raidMember": [{"playerId": "P1", "memberProgress": "1"}]},
+            {"raidId": "naboo", "raidMember": [{"playerId": "P2", "memberProgress": "99"}]},
+        ],
+    }
+}
+
+
+def test_guild_snapshot_indexes_members_and_contributions():
+    guild = GuildSnapshot.from_response(GUILD_RESPONSE)
+
+    assert [m.player_id for m in guild.members] == ["P1", "P2"]
+    member = guild.member("P1")
+    assert member.contribution(1) == 7
+    assert member.missing_tickets == 150
+    assert member.last_activity_time == datetime.fromtimestamp(1700000000)
+    assert guild.member("P2").missing_tickets == 600
+    assert guild.member("P3") is None
+
+
+def test_guild_snapshot_raid_results():
+    """
+    The first result of a raid is used and absent players get None
+    """
+    guild = GuildSnapshot.from_response(GUILD_RESPONSE)
+
+    assert guild.has_raid("order66")
+    assert guild.raid_result("order66", "P1") == "1234"
+    assert guild.raid_result("order66", "P2") is None
+    assert guild.raid_result("naboo", "P2") == "99"
+    assert not guild.has_raid("rancor")
+
+
+def test_member_uses_slots():
+    member = Member.from_dict({"playerId": "P1"})
+    assert not hasattr(member, "__dict__")
+
+
+def test_player_roster_accessors():
+    roster = PlayerRoster.from_response(
+        {
+            "name": "Player",
+            "rosterUnit": [
+                {
+                    "definitionId": "JEDIKNIGHTCAL:SEVEN_STAR",
+                    "currentLevel": 85,
+                    "relic": {"currentTier": 9},
+                    "skill": [{"id": "leaderskill_JEDIKNIGHTCAL", "tier": 5}],
+                },
+                {"definitionId": "CEREJUNDA:SEVEN_STAR", "currentLevel": 80},
+            ],
+        }
+    )
+
+    assert roster.name == "Player"
+    assert roster.is_r7("JEDIKNIGHTCAL:SEVEN_STAR")
+    assert roster.relic_tier("CEREJUNDA:SEVEN_STAR") == 0
+    assert not roster.has_unit("MARROK:SEVEN_STAR")
+    assert roster.level("MARROK:SEVEN_STAR") is None
+    assert roster.skill_tiers("JEDIKNIGHTCAL:SEVEN_STAR") == {"leaderskill_JEDIKNIGHTCAL": 5}
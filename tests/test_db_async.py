@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import psycopg2
+
+import src.db_async as db_async
+
+
+def test_use_async_db(monkeypatch):
+    """
+    The async DB layer is only used when DB_ASYNC is set
+    """
+    monkeypatch.delenv("DB_ASYNC", raising=False)
+    assert db_async.use_async_db() is False
+
+    monkeypatch.setenv("DB_ASYNC", "1")
+    assert db_async.use_async_db() is True
+
+
+def test_run_overlapped_fetches_next_item_during_processing():
+    """
+    The fetch for item N+1 is already running while item N is processed
+    """
+    events = []
+    second_fetch_started = threading.Event()
+
+    def fetch(item):
+        events.append(f"fetch {item}")
+        if item == "G2":
+            second_fetch_started.set()
+        return item.lower()
+
+    async def process(item, fetched):
+        if item == "G1":
+            # G2 must be in flight before G1 is written
+            await asyncio.to_thread(second_fetch_started.wait, 5)
+        events.append(f"write {item} {fetched}")
+
+    asyncio.run(db_async.run_overlapped(["G1", "G2"], fetch, process))
+
+    assert events == ["fetch G1", "fetch G2", "write G1 g1", "write G2 g2"]
+
+
+def test_execute_batch_values_async_pipelines_rows():
+    """
+    Rows are sent through one pipelined executemany on a pooled async connection
+    """
+    cur = MagicMock()
+    cur.executemany = AsyncMock()
+    cur.rowcount = 2
+    cur.__aenter__ = AsyncMock(return_value=cur)
+    cur.__aexit__ = AsyncMock(return_value=None)
+    conn = MagicMock()
+    conn.cursor.return_value = cur
+    conn.__aenter__ = AsyncMock(return_value=conn)
+    conn.__aexit__ = AsyncMock(return_value=None)
+    pool = MagicMock()
+    pool.connection.return_value = conn
+
+    rows = [("P1", 100), ("P2", 200)]
+    with patch("src.db_async._get_async_pool", AsyncMock(return_value=pool)):
+        affected = asyncio.run(
+            db_async.execute_batch_values_async("INSERT INTO t (a, b) VALUES %s;", rows, "(%s, %s)")
+        )
+
+    assert affected == 2
+    cur.executemany.assert_awaited_once_with("INSERT INTO t (a, b) VALUES (%s, %s);", rows)
+
+
+def test_execute_async_logs_db_errors():
+    """
+    DB errors are logged and reported as zero affected rows
+    """
+    failing_pool = AsyncMock(side_effect=psycopg2.OperationalError("DB down"))
+    with (
+        patch("src.db_async._get_async_pool", failing_pool),
+        patch("src.db_async.logger") as mock_logger,
+    ):
+        assert asyncio.run(db_async.execute_async("SELECT 1;")) == 0
+        mock_logger.error.assert_called_once()
+
+
+def test_async_jobs_share_one_loop_and_pool():
+    """
+    Async jobs of every thread run on one event loop, whose pool is only opened once
+    and closed at shutdown
+    """
+    pool = MagicMock()
+    pool.open = AsyncMock()
+    pool.close = AsyncMock()
+
+    async def job():
+        return asyncio.get_running_loop(), await db_async._get_async_pool()
+
+    with (
+        patch("src.db_async.AsyncConnectionPool", return_value=pool) as mock_pool_class,
+        patch("src.db_async.make_conninfo", return_value=""),
+        patch("src.db_async.setup_connection", return_value={}),
+    ):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(db_async.run_async_job(job())))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        db_async.shutdown_async_db()
+
+    assert len({loop for loop, _ in results}) == 1
+    assert all(result_pool is pool for _, result_pool in results)
+    mock_pool_class.assert_called_once()
+    pool.open.assert_awaited_once()
+    pool.close.assert_awaited_once()
@@ -0,0 +1,210 @@
+import psycopg
+import pytest
+from unittest.mock import MagicMock, call, patch
+
+import src.db_connection as db_connection
+
+
+@pytest.fixture
+def mock_pool(monkeypatch):
+    """
+    Fixture to replace the psycopg2 pool with a mock and reset the module state
+    """
+    pool = MagicMock()
+    monkeypatch.setattr(db_connection, "_pool", None)
+    monkeypatch.setattr(db_connection, "_pool_slots", None)
+    monkeypatch.setattr(db_connection, "_pool_backend", "psycopg2")
+    monkeypatch.delenv("DB_BACKEND", raising=False)
+    monkeypatch.setattr(db_connection, "_seen_connections", set())
+    monkeypatch.setattr(
+        db_connection,
+        "_pool_stats",
+        {"checkouts": 0, "waits": 0, "wait_seconds": 0.0, "connections_opened": 0},
+    )
+    monkeypatch.setattr(db_connection, "setup_connection", lambda: {})
+    monkeypatch.setattr(db_connection.atexit, "register", MagicMock())
+    with patch("src.db_connection.ThreadedConnectionPool", return_value=pool) as mock_cls:
+        yield pool, mock_cls
+
+
+@patch("src.db_connection.get_env")
+def test_setup_connection(mock_get_env):
+    """
+    Tests that setup_connection correctly builds the connection dictionary
+    """
+    env_vars = {
+        "PASS": "test_password",
+        "HOST": "test_host",
+        "USER": "test_user",
+        "DBNAME": "test_db",
+        "PORT": "1234",
+    }
+    mock_get_env.side_effect = lambda key: env_vars[key]
+
+    expected_dict = {
+        "dbname": "test_db",
+        "user": "test_user",
+        "password": "test_password",
+        "port": 1234,
+        "host": "test_host",
+    }
+
+    assert db_connection.setup_connection() == expected_dict
+    mock_get_env.assert_has_calls(
+        [call("PASS"), call("HOST"), call("USER"), call("DBNAME"), call("PORT")]
+    )
+
+
+def test_pool_is_built_once(mock_pool):
+    """
+    The pool is created on first checkout and reused for every later checkout
+    """
+    pool, mock_cls = mock_pool
+    conn = MagicMock(closed=0)
+    pool.getconn.return_value = conn
+
+    for _ in range(3):
+        checked_out = db_connection.get_connection()
+        assert checked_out is conn
+        db_connection.release_connection(checked_out)
+
+    mock_cls.assert_called_once()
+    assert pool.getconn.call_count == 3
+    pool.putconn.assert_called_with(conn, close=False)
+
+    stats = db_connection.get_pool_stats()
+    assert stats["checkouts"] == 3
+    assert stats["connections_opened"] == 1
+    assert stats["waits"] == 0
+
+
+def test_broken_connection_is_discarded(mock_pool):
+    """
+    Connections that were closed while checked out are not handed out again
+    """
+    pool, _ = mock_pool
+    conn = MagicMock(closed=1)
+    pool.getconn.return_value = conn
+
+    db_connection.release_connection(db_connection.get_connection())
+
+    pool.putconn.assert_called_once_with(conn, close=True)
+
+
+def test_get_pool_size_defaults(monkeypatch):
+    """
+    Pool size falls back to defaults and max is never below min
+    """
+    monkeypatch.delenv("DB_POOL_MIN", raising=False)
+    monkeypatch.delenv("DB_POOL_MAX", raising=False)
+    assert db_connection.get_pool_size() == (1, 5)
+
+    monkeypatch.setenv("DB_POOL_MIN", "4")
+    monkeypatch.setenv("DB_POOL_MAX", "2")
+    assert db_connection.get_pool_size() == (4, 4)
+
+
+def test_execute_batch_values_pages_rows():
+    """
+    Rows are expanded into multi-row VALUES lists, one statement per page
+    """
+    cur = MagicMock()
+    cur.rowcount = 2
+    rows = [("1", 10), ("2", 20), ("3", 30)]
+
+    affected = db_connection.execute_batch_values(
+        cur, "INSERT INTO t (a, b) VALUES %s;", rows, "(%s, %s)", page_size=2
+    )
+
+    assert affected == 4
+    cur.execute.assert_has_calls(
+        [
+            call("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s);", ["1", 10, "2", 20]),
+            call("INSERT INTO t (a, b) VALUES (%s, %s);", ["3", 30]),
+        ]
+    )
+
+
+def test_read_session_shares_one_snapshot(mock_pool):
+    """
+    Reads inside a read session reuse its REPEATABLE READ connection and do not release it
+    """
+    pool, _ = mock_pool
+    conn = MagicMock(closed=0)
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchall.return_value = [("row",)]
+    pool.getconn.return_value = conn
+
+    from src.read_data import make_sql_query_single
+
+    with db_connection.read_session() as session_conn:
+        assert session_conn is conn
+        assert db_connection.get_session_connection() is conn
+        make_sql_query_single("SELECT 1;", "first")
+        make_sql_query_single("SELECT 2;", "second")
+        pool.putconn.assert_not_called()
+
+    assert db_connection.get_session_connection() is None
+    assert pool.getconn.call_count == 1
+    conn.set_session.assert_has_calls(
+        [
+            call(
+                isolation_level=db_connection.ISOLATION_LEVEL_REPEATABLE_READ,
+                readonly=True,
+            ),
+            call(isolation_level="DEFAULT", readonly="DEFAULT"),
+        ]
+    )
+    conn.rollback.assert_called_once()
+    pool.putconn.assert_called_once_with(conn, close=False)
+
+
+def test_get_db_backend(monkeypatch):
+    """
+    The backend defaults to psycopg2 and falls back to it on invalid values
+    """
+    monkeypatch.delenv("DB_BACKEND", raising=False)
+    assert db_connection.get_db_backend() == "psycopg2"
+
+    monkeypatch.setenv("DB_BACKEND", "psycopg3")
+    assert db_connection.get_db_backend() == "psycopg3"
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    assert db_connection.get_db_backend() == "psycopg2"
+
+
+def test_psycopg3_pool_prepares_statements(mock_pool, monkeypatch):
+    """
+    DB_BACKEND=psycopg3 builds a psycopg 3 pool whose connections prepare every statement
+    """
+    pool, mock_threaded_cls = mock_pool
+    monkeypatch.setenv("DB_BACKEND", "psycopg3")
+    psycopg3_pool = MagicMock()
+    conn = MagicMock(closed=False)
+    conn.info.transaction_status = psycopg.pq.TransactionStatus.INTRANS
+    psycopg3_pool.getconn.return_value = conn
+
+    with patch("src.db_connection.ConnectionPool", return_value=psycopg3_pool) as mock_cls:
+        db_connection.release_connection(db_connection.get_connection())
+
+    mock_threaded_cls.assert_not_called()
+    assert mock_cls.call_args.kwargs["kwargs"] == {"prepare_threshold": 0}
+    conn.rollback.assert_called_once()
+    psycopg3_pool.putconn.assert_called_once_with(conn)
+
+
+def test_execute_batch_values_psycopg3_pipelines():
+    """
+    psycopg 3 cursors get the single row statement through the pipelined executemany
+    """
+    cur = MagicMock(spec=psycopg.Cursor)
+    cur.rowcount = 3
+    rows = [("1", 10), ("2", 20), ("3", 30)]
+
+    affected = db_connection.execute_batch_values(
+        cur, "INSERT INTO t (a, b) VALUES %s;", rows, "(%s, %s)"
+    )
+
+    assert affected == 3
+    cur.executemany.assert_called_once_with("INSERT INTO t (a, b) VALUES (%s, %s);", rows)
+    cur.execute.assert_not_called()
@@ -1,13 +1,15 @@
 import pytest
 from unittest.mock import MagicMock
 from src.enter_data import (
-    enter_players,
     enter_gp_logs,
-    enter_player_check,
     enter_tickets,
     enter_raid_score_log,
     enter_player_archive,
     enter_tb_data,
+    enter_gp_snapshot,
+    enter_raid_score_snapshot,
+    enter_roster_check_summary,
+    ensure_roster_check_summary,
 )
 import psycopg2
 
@@ -15,26 +17,12 @@ import psycopg2
 @pytest.mark.parametrize(
     "func, table_name, data, expected_sql",
     [
-        (
-            enter_players,
-            "players",
-            [("1", "player1", 1000, "guild1", "2023-01-01")],
-            "INSERT INTO players (player_id, nickname, total_gp, guild_id, last_activity_time) VALUES (%s, %s, %s, %s, %s);",
-        ),
         (
             enter_gp_logs,
             "gp_history",
             [("1", 1000)],
             "INSERT INTO gp_history (player_id, total_gp, timestamp) VALUES (%s, %s, NOW());",
         ),
-        (
-            enter_player_check,
-            "players_roster_checks",
-            [("True", "False", "True", "True", "False", "True", "True", "1")],
-            "INSERT INTO players_roster_checks (reva_ready, gi_r7, bkm_r7, jkck_unlocked, "
-            "jkck_r7, cere_r7, jkck_skill_levels_done, player_id) "
-            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s);",
-        ),
         (
             enter_tickets,
             "ticket_log",
@@ -61,23 +49,55 @@ import psycopg2
         ),
     ],
 )
-def test_data_insertion_success(mock_db_connection, func, table_name, data, expected_sql):
+def test_data_insertion_success(mock_db_connection, monkeypatch, func, table_name, data, expected_sql):
     """
     Each function successfully inserts data into the correct table.
-    Correct SQL query and data used, connection is committed and closed.
+    Correct SQL query and data used, connection is committed and released.
+    """
+    mock_conn, mock_cur, mock_release = mock_db_connection
+    monkeypatch.setenv("DB_INGEST_MODE", "values")
+    func(data)
+    mock_cur.executemany.assert_not_called()
+    mock_cur.execute.assert_called_once_with(expected_sql, list(data[0]))
+    mock_conn.commit.assert_called_once()
+    mock_release.assert_called_once_with(mock_conn)
+
+
+@pytest.mark.parametrize(
+    "func, data, expected_sql",
+    [
+        (
+            enter_gp_logs,
+            [("1", 1000)],
+            "INSERT INTO gp_history (player_id, total_gp, timestamp) VALUES (%s, %s, NOW());",
+        ),
+        (
+            enter_tickets,
+            [("1", 100)],
+            "INSERT INTO ticket_log (player_id, created_at, tickets_lost) VALUES (%s, NOW(), %s);",
+        ),
+        (
+            enter_raid_score_log,
+            [("1", 100000, 0.95)],
+            "INSERT INTO raid_score_log (player_id, raid_score, percent_of_avg) VALUES (%s, %s, %s);",
+        ),
+    ],
+)
+def test_data_insertion_executemany_mode(mock_db_connection, monkeypatch, func, data, expected_sql):
+    """
+    The executemany ingest mode keeps sending one INSERT per row.
     """
-    mock_conn, mock_cur = mock_db_connection
+    mock_conn, mock_cur, mock_release = mock_db_connection
+    monkeypatch.setenv("DB_INGEST_MODE", "executemany")
     func(data)
     mock_cur.executemany.assert_called_once_with(expected_sql, data)
     mock_conn.commit.assert_called_once()
-    mock_conn.close.assert_called_once()
+    mock_release.assert_called_once_with(mock_conn)
 
 @pytest.mark.parametrize(
     "func, data, exception_type",
     [
-        (enter_players, [("1", "player1", 1000, "guild1", "2023-01-01")], psycopg2.IntegrityError),
         (enter_gp_logs, [("1", 1000)], psycopg2.Error),
-        (enter_player_check, [("True", "True", "False", "True", "True", "1")], psycopg2.Error),
         (enter_tickets, [("1", 100)], psycopg2.IntegrityError),
         (enter_raid_score_log, [("1", 100000, 0.95)], psycopg2.Error),
         (enter_player_archive, [("1", "player1", 1000, "guild1")], psycopg2.Error),
@@ -87,30 +107,110 @@ def test_data_insertion_success(mock_db_connection, func, table_name, data, expe
 def test_data_insertion_failure(mock_db_connection, func, data, exception_type):
     """
     Each function handles database errors correctly.
-    Connection is rolled back and closed on error.
+    Connection is rolled back and released on error.
     """
-    mock_conn, mock_cur = mock_db_connection
-    mock_cur.executemany.side_effect = exception_type("Mocked error")
+    mock_conn, mock_cur, mock_release = mock_db_connection
+    mock_cur.execute.side_effect = exception_type("Mocked error")
     func(data)
     mock_conn.rollback.assert_called_once()
-    mock_conn.close.assert_called_once()
+    mock_release.assert_called_once_with(mock_conn)
 
 def test_enter_player_archive_no_data(mock_db_connection):
     """
     Case: enter_player_archive with no data.
     """
-    mock_conn, mock_cur = mock_db_connection
+    mock_conn, mock_cur, mock_release = mock_db_connection
     enter_player_archive([])
-    mock_cur.executemany.assert_not_called()
+    mock_cur.execute.assert_not_called()
     mock_conn.commit.assert_not_called()
-    mock_conn.close.assert_not_called()
+    mock_release.assert_not_called()
 
 def test_enter_tb_data_no_data(mock_db_connection):
     """
     Case: enter_tb_data with no data.
     """
-    mock_conn, mock_cur = mock_db_connection
+    mock_conn, mock_cur, mock_release = mock_db_connection
     enter_tb_data([])
-    mock_cur.executemany.assert_not_called()
+    mock_cur.execute.assert_not_called()
     mock_conn.commit.assert_not_called()
-    mock_conn.close.assert_not_called()
+    mock_release.assert_not_called()
+
+def test_enter_gp_logs_single_round_trip(mock_db_connection, monkeypatch):
+    """
+    Case: several rows are sent as one multi-row INSERT.
+    """
+    mock_conn, mock_cur, mock_release = mock_db_connection
+    monkeypatch.setenv("DB_INGEST_MODE", "values")
+    enter_gp_logs([("1", 1000), ("2", 2000), ("3", 3000)])
+    mock_cur.execute.assert_called_once_with(
+        "INSERT INTO gp_history (player_id, total_gp, timestamp) "
+        "VALUES (%s, %s, NOW()), (%s, %s, NOW()), (%s, %s, NOW());",
+        ["1", 1000, "2", 2000, "3", 3000],
+    )
+    mock_conn.commit.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "func, target_table",
+    [
+        (enter_gp_snapshot, "INSERT INTO gp_history"),
+        (enter_raid_score_snapshot, "INSERT INTO raid_score_log"),
+    ],
+)
+def test_snapshot_insert_select(mock_db_connection, func, target_table):
+    """
+    Snapshot writers copy all guilds' rows with one INSERT ... SELECT inside the DB.
+    """
+    mock_conn, mock_cur, mock_release = mock_db_connection
+    mock_cur.rowcount = 42
+    assert func(["G1", "G2"]) == 42
+    mock_cur.execute.assert_called_once()
+    sql_str, params = mock_cur.execute.call_args[0]
+    assert sql_str.startswith(target_table)
+    assert "SELECT" in sql_str and "= ANY(%s)" in sql_str
+    assert params == (["G1", "G2"],)
+    mock_conn.commit.assert_called_once()
+    mock_release.assert_called_once_with(mock_conn)
+
+
+@pytest.mark.parametrize("func", [enter_gp_snapshot, enter_raid_score_snapshot])
+def test_snapshot_no_guilds(mock_db_connection, func):
+    """
+    Case: snapshot writers without guilds do not touch the DB.
+    """
+    mock_conn, mock_cur, mock_release = mock_db_connection
+    assert func([]) == 0
+    mock_cur.execute.assert_not_called()
+    mock_release.assert_not_called()
+
+
+def test_roster_check_summary_inserts_in_one_statement(mock_db_connection):
+    """
+    The summary writer inserts all rows in one statement, without creating its table.
+    """
+    mock_conn, mock_cur, mock_release = mock_db_connection
+    mock_cur.rowcount = 2
+    rows = [("G1", "gi_r7", 50, 30, 4, ["P1"]), ("G1", "bkm_r7", 50, 10, 2, [])]
+
+    assert enter_roster_check_summary(rows) == 2
+
+    mock_cur.execute.assert_called_once()
+    insert = mock_cur.execute.call_args
+    assert "VALUES (%s, %s, NOW(), %s, %s, %s, %s), (%s, %s, NOW(), %s, %s, %s, %s);" in insert[0][0]
+    assert insert[0][1][:6] == ["G1", "gi_r7", 50, 30, 4, ["P1"]]
+    mock_conn.commit.assert_called_once()
+    mock_release.assert_called_once_with(mock_conn)
+
+
+def test_ensure_roster_check_summary_creates_table(mock_db_connection):
+    """
+    The summary table is created by its own call, once per run.
+    """
+    mock_conn, mock_cur, mock_release = mock_db_connection
+
+    ensure_roster_check_summary()
+
+    ddl = mock_cur.execute.call_args
+    assert ddl[0][0].startswith("CREATE TABLE IF NOT EXISTS roster_check_summary")
+    mock_conn.commit.assert_called_once()
+    mock_release.assert_called_once_with(mock_conn)
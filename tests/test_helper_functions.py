@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 from unittest.mock import patch
@@ -8,6 +9,7 @@ from src.helper_functions import (
     check_none_str,
     is_list_or_tuple_instance,
     floatify,
+    atomic_write_json,
 )
 
 class TestHelperFunctions():
@@ -122,3 +124,29 @@ class TestHelperFunctions():
         assert floatify("string") == "-"
         assert floatify("5.5") == 5.5
         assert type(floatify("55")) is float
+
+
+    def test_atomic_write_json(self, tmp_path):
+        """
+        Tests that atomic_write_json creates the directory, replaces the file and leaves no temp file
+        """
+        path = tmp_path / "sub" / "state.json"
+        atomic_write_json(str(path), {"a": 1})
+        atomic_write_json(str(path), {"a": 2}, separators=(",", ":"))
+
+        assert path.read_text(encoding="utf-8") == '{"a":2}'
+        assert os.listdir(path.parent) == ["state.json"]
+
+
+    def test_atomic_write_json_failure_keeps_old_file(self, tmp_path):
+        """
+        Tests that a failing dump raises and leaves the previous file and no temp file behind
+        """
+        path = tmp_path / "state.json"
+        atomic_write_json(str(path), {"a": 1})
+
+        with pytest.raises(TypeError):
+            atomic_write_json(str(path), {"a": object()})
+
+        assert json.loads(path.read_text(encoding="utf-8")) == {"a": 1}
+        assert os.listdir(tmp_path) == ["state.json"]
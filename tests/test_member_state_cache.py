@@ -0,0 +1,68 @@
+import json
+
+from src.comlink_models import Member
+from src.member_state_cache import MemberStateCache
+from src.membership_diff import diff_membership
+
+
+def member(player_id: str, gp: int, last_activity: int = 1700000000000, name: str = "") -> Member:
+    return Member.from_dict(
+        {
+            "playerId": player_id,
+            "playerName": name or player_id,
+            "galacticPower": gp,
+            "lastActivityTime": str(last_activity),
+        }
+    )
+
+
+def test_unchanged_members_are_suppressed(tmp_path):
+    cache = MemberStateCache(str(tmp_path / "state.json"))
+    cache.record("G1", [member("P1", 100), member("P2", 200)])
+
+    changed = cache.changed_members("G1", [member("P1", 100), member("P2", 250)])
+
+    assert [m.player_id for m in changed] == ["P2"]
+    assert cache.suppressed == 1
+
+
+def test_state_survives_between_runs(tmp_path):
+    path = str(tmp_path / "state" / "members.json")
+    cache = MemberStateCache(path)
+    cache.record("G1", [member("P1", 100)])
+    cache.save()
+
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"G1": {"P1": ["P1", 100, 1700000000000]}}
+    reloaded = MemberStateCache(path)
+    assert reloaded.changed_members("G1", [member("P1", 100)]) == []
+    assert reloaded.changed_members("G1", [member("P1", 100, 1700000180000)]) != []
+
+
+def test_suppress_unchanged_keeps_joins_and_leaves(tmp_path):
+    cache = MemberStateCache(str(tmp_path / "state.json"))
+    cache.record("G1", [member("P1", 100), member("P2", 200)])
+    diff = diff_membership("G1", [member("P1", 100), member("P3", 300)], [("P1", "P1"), ("P2", "P2")])
+
+    suppressed = cache.suppress_unchanged(diff)
+
+    assert [m.player_id for m in suppressed.members] == ["P3"]
+    assert [m.player_id for m in suppressed.joined] == ["P3"]
+    assert suppressed.left == ("P2",)
+
+
+def test_is_unchanged_needs_same_members(tmp_path):
+    cache = MemberStateCache(str(tmp_path / "state.json"))
+    cache.record("G1", [member("P1", 100), member("P2", 200)])
+
+    assert not cache.is_unchanged("G1", [member("P1", 100)])
+    assert not cache.is_unchanged("G2", [member("P1", 100), member("P2", 200)])
+    assert cache.is_unchanged("G1", [member("P1", 100), member("P2", 200)])
+    assert cache.suppressed == 2
+
+
+def test_unreadable_state_file_starts_empty(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("not json")
+
+    assert MemberStateCache(str(path)).guilds == {}
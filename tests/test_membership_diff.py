@@ -0,0 +1,45 @@
+from src.comlink_models import Member
+from src.membership_diff import diff_membership
+
+
+def member(player_id: str, name: str, gp: int = 1000) -> Member:
+    return Member.from_dict({"playerId": player_id, "playerName": name, "galacticPower": gp})
+
+
+def test_diff_membership_joins_and_leaves():
+    members = [member("P1", "One"), member("P3", "Three")]
+    db_players = [("P1", "One", 1000, None, None, "G1"), ("P2", "Two", 2000, None, None, "G1")]
+
+    diff = diff_membership("G1", members, db_players)
+
+    assert [m.player_id for m in diff.joined] == ["P3"]
+    assert diff.left == ("P2",)
+    assert diff.renamed == ()
+    assert diff.members == tuple(members)
+
+
+def test_renamed_player_is_no_leave_and_join():
+    diff = diff_membership("G1", [member("P1", "New Name")], [("P1", "Old Name")])
+
+    assert diff.renamed == (("P1", "New Name"),)
+    assert diff.joined == ()
+    assert diff.left == ()
+
+
+def test_players_sharing_a_nickname_are_told_apart():
+    """
+    Two players with the same nickname are different players, a nickname diff saw one
+    """
+    members = [member("P1", "Twin"), member("P2", "Twin")]
+
+    diff = diff_membership("G1", members, [("P1", "Twin")])
+
+    assert [m.player_id for m in diff.joined] == ["P2"]
+    assert diff.joined_rows()[0][:4] == ("P2", "Twin", 1000, "G1")
+
+
+def test_empty_guild_response_removes_everyone():
+    diff = diff_membership("G1", [], [("P1", "One"), ("P2", "Two")])
+
+    assert diff.left == ("P1", "P2")
+    assert diff.joined == diff.renamed == ()
@@ -1,6 +1,6 @@
 import unittest
 import psycopg2
-from unittest.mock import patch, MagicMock, call
+from unittest.mock import patch, MagicMock
 from datetime import datetime
 
 
@@ -11,34 +11,6 @@ class TestReadData(unittest.TestCase):
     Tests for database reading functions in read_data.py
     """
 
-    @patch('src.read_data.get_env')
-    def test_setup_connection(self, mock_get_env):
-        """
-        Tests that setup_connection correctly builds the connection dictionary
-        """
-
-        env_vars = {
-            "PASS": "test_password",
-            "HOST": "test_host",
-            "USER": "test_user",
-            "DBNAME": "test_db",
-            "PORT": "1234"
-        }
-        mock_get_env.side_effect = lambda key: env_vars[key]
-        
-        expected_dict = {
-            "dbname": "test_db",
-            "user": "test_user",
-            "password": "test_password",
-            "port": 1234,
-            "host": "test_host",
-        }
-        
-        self.assertEqual(read_data.setup_connection(), expected_dict)
-        mock_get_env.assert_has_calls([
-            call("PASS"), call("HOST"), call("USER"), call("DBNAME"), call("PORT")
-        ])
-
     def test_get_valid_order_parameter(self):
         """
         Tests the SQL injection prevention for order parameters
@@ -64,9 +36,9 @@ class TestReadData(unittest.TestCase):
         self.assertEqual(read_data.get_valid_timeframe_parameter('year'), 'nickname ASC')
 
 
-    @patch('src.read_data.psycopg2.connect')
-    @patch('src.read_data.setup_connection')
-    def test_make_sql_query_single_success(self, mock_setup_connection, mock_connect):
+    @patch('src.read_data.release_connection')
+    @patch('src.read_data.get_connection')
+    def test_make_sql_query_single_success(self, mock_connect, mock_release):
         """
         Tests a successful database query execution
         """
@@ -84,12 +56,12 @@ class TestReadData(unittest.TestCase):
         mock_connect.assert_called_once()
         mock_cursor.execute.assert_called_once_with(sql_query_str)
         mock_cursor.fetchall.assert_called_once()
-        mock_conn.close.assert_called_once()
+        mock_release.assert_called_once_with(mock_conn)
     
 
-    @patch('src.read_data.psycopg2.connect')
-    @patch('src.read_data.setup_connection')
-    def test_make_sql_query_single_no_data(self, mock_setup_connection, mock_connect):
+    @patch('src.read_data.release_connection')
+    @patch('src.read_data.get_connection')
+    def test_make_sql_query_single_no_data(self, mock_connect, mock_release):
         """
         Tests a query that returns no rows
         """
@@ -105,12 +77,12 @@ class TestReadData(unittest.TestCase):
         
         self.assertEqual(result, [])
         mock_connect.assert_called_once()
-        mock_conn.close.assert_called_once()
+        mock_release.assert_called_once_with(mock_conn)
     
 
-    @patch('src.read_data.psycopg2.connect', side_effect=psycopg2.Error("Connection failed"))
-    @patch('src.read_data.setup_connection')
-    def test_make_sql_query_single_connection_error(self, mock_setup_connection, mock_connect):
+    @patch('src.read_data.release_connection')
+    @patch('src.read_data.get_connection', side_effect=psycopg2.Error("Connection failed"))
+    def test_make_sql_query_single_connection_error(self, mock_connect, mock_release):
         """
         Tests error handling for a failed database connection
         """
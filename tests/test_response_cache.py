@@ -0,0 +1,117 @@
+import json
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.api_request import post_request
+from src.response_cache import ResponseCache, get_cache_ttls
+
+GUILD_URL = "http://comlink:3000/guild"
+PAYLOAD = {"payload": {"guildId": "G1", "includeRecentGuildActivityInfo": True}}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path), {"/guild": 60})
+
+
+def test_second_request_is_served_from_cache(cache):
+    """
+    Only the first of two identical requests reaches comlink
+    """
+    fetch = Mock(return_value={"guild": {"member": []}})
+
+    first = cache.get_or_fetch(GUILD_URL, PAYLOAD, fetch)
+    second = cache.get_or_fetch(GUILD_URL, PAYLOAD, fetch)
+
+    assert first == second == {"guild": {"member": []}}
+    fetch.assert_called_once()
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_log_stats_reports_hits_and_misses(cache, caplog):
+    """
+    The hits and misses of the cache are logged with its hit rate
+    """
+    fetch = Mock(return_value={"guild": {"member": []}})
+    for _ in range(4):
+        cache.get_or_fetch(GUILD_URL, PAYLOAD, fetch)
+
+    with caplog.at_level("INFO", logger="guild_data_app"):
+        cache.log_stats()
+
+    assert "Comlink cache: 3 hits, 1 misses, hit rate 75.0%" in caplog.text
+
+
+def test_key_includes_payload(cache):
+    """
+    Requests for different guilds get their own entries
+    """
+    fetch = Mock(side_effect=[{"guild": "G1"}, {"guild": "G2"}])
+    other_payload = {"payload": {"guildId": "G2", "includeRecentGuildActivityInfo": True}}
+
+    assert cache.get_or_fetch(GUILD_URL, PAYLOAD, fetch) == {"guild": "G1"}
+    assert cache.get_or_fetch(GUILD_URL, other_payload, fetch) == {"guild": "G2"}
+    assert fetch.call_count == 2
+
+
+def test_expired_entry_is_refetched(cache, mocker):
+    """
+    Entries older than the endpoint TTL are fetched again
+    """
+    fetch = Mock(side_effect=[{"v": 1}, {"v": 2}])
+    mock_time = mocker.patch("src.response_cache.time.time", return_value=1000.0)
+    cache.get_or_fetch(GUILD_URL, PAYLOAD, fetch)
+
+    mock_time.return_value = 1061.0
+    assert cache.get_or_fetch(GUILD_URL, PAYLOAD, fetch) == {"v": 2}
+    assert fetch.call_count == 2
+
+
+def test_uncached_endpoint_and_failed_fetch(cache, tmp_path):
+    """
+    Endpoints without TTL bypass the cache and None responses are never stored
+    """
+    fetch = Mock(return_value=None)
+    cache.get_or_fetch("http://comlink:3000/player", {"payload": {}}, fetch)
+    cache.get_or_fetch(GUILD_URL, PAYLOAD, fetch)
+    cache.get_or_fetch(GUILD_URL, PAYLOAD, fetch)
+
+    assert fetch.call_count == 3
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".json")]
+
+
+def test_atomic_write_leaves_no_temp_files(cache, tmp_path):
+    """
+    Entries are complete JSON files and no temp files stay behind
+    """
+    cache.put(GUILD_URL, PAYLOAD, {"guild": {}})
+
+    files = os.listdir(tmp_path)
+    assert not [f for f in files if f.endswith(".tmp")]
+    [entry_file] = [f for f in files if f.endswith(".json")]
+    with open(tmp_path / entry_file, encoding="utf-8") as f:
+        assert json.load(f)["response"] == {"guild": {}}
+
+
+def test_cache_ttls_from_env(monkeypatch):
+    monkeypatch.setenv("COMLINK_CACHE_TTLS", "/guild=30, /player=0,broken")
+    assert get_cache_ttls() == {"/guild": 30.0, "/player": 0.0}
+
+
+def test_post_request_reads_through_cache(cache):
+    """
+    cached=True routes the request through the response cache
+    """
+    client = Mock()
+    client.post.return_value = {"guild": {}}
+    with (
+        patch("src.api_request.get_comlink_client", return_value=client),
+        patch("src.api_request.get_response_cache", return_value=cache),
+    ):
+        post_request(GUILD_URL, PAYLOAD, cached=True)
+        post_request(GUILD_URL, PAYLOAD, cached=True)
+        post_request(GUILD_URL, PAYLOAD)
+
+    assert client.post.call_count == 2
@@ -0,0 +1,376 @@
+import json
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import src.roster_checks as roster_checks
+from src.comlink_models import PlayerRoster
+from src.roster_rules import get_rule_evaluator
+
+
+def make_unit(definition_id: str, relic_tier: int | None = None, level: int = 85, skills=None) -> dict:
+    """
+    Build a comlink rosterUnit entry
+    """
+    unit = {"definitionId": definition_id, "currentLevel": level, "skill": skills or []}
+    if relic_tier is not None:
+        unit["relic"] = {"currentTier": relic_tier}
+    return unit
+
+
+JEDI_CAL_SKILLS = [
+    {"id": "uniqueskill_JEDIKNIGHTCAL01", "tier": 6},
+    {"id": "leaderskill_JEDIKNIGHTCAL", "tier": 5},
+    {"id": "specialskill_JEDIKNIGHTCAL03", "tier": 5},
+    {"id": "specialskill_JEDIKNIGHTCAL02", "tier": 6},
+    {"id": "specialskill_JEDIKNIGHTCAL01", "tier": 6},
+]
+
+ROSTERS = {
+    "P_FULL": {
+        "name": "Full",
+        "rosterUnit": [
+            make_unit("GRANDINQUISITOR:SEVEN_STAR", 9),
+            make_unit("MANDALORBOKATAN:SEVEN_STAR", 9),
+            make_unit("THIRDSISTER:SEVEN_STAR", 9),
+            make_unit("MARROK:SEVEN_STAR", 9),
+            make_unit("SEVENTHSISTER:SEVEN_STAR", 9),
+            make_unit("FIFTHBROTHER:SEVEN_STAR", 9),
+            make_unit("JEDIKNIGHTCAL:SEVEN_STAR", 9, skills=JEDI_CAL_SKILLS),
+            make_unit("CEREJUNDA:SEVEN_STAR", 9),
+        ],
+    },
+    "P_LOW_CAL": {
+        "name": "Low Cal",
+        "rosterUnit": [
+            make_unit("GRANDINQUISITOR:SEVEN_STAR", 8),
+            make_unit("JEDIKNIGHTCAL:SEVEN_STAR", 3, level=80),
+            make_unit("CEREJUNDA:SEVEN_STAR", 9),
+        ],
+    },
+    "P_EMPTY": {"name": "Empty", "rosterUnit": [make_unit("BOBAFETT:SEVEN_STAR", 5)]},
+}
+
+
+def plan_rows(player_ids, states=(), stale=()) -> list[tuple]:
+    """
+    Build read_roster_check_plan rows of guild G1 from (player_id, fingerprint, gp, version, missing) states
+    """
+    by_id = {state[0]: state for state in states}
+    return [
+        (p, "G1", *by_id[p][1:], False, p in stale) if p in by_id else (p, "G1", None, None, None, None, True, False)
+        for p in player_ids
+    ]
+
+
+def test_evaluate_roster_full_readiness():
+    """
+    A roster meeting every requirement passes every check
+    """
+    check = roster_checks.evaluate_roster("P_FULL", ROSTERS["P_FULL"])
+    assert check == (True, True, True, True, True, True, True, "P_FULL")
+
+
+def test_evaluate_roster_jedi_cal_not_leveled():
+    """
+    Without a level 85 Jedi Cal the Zeffo checks stay False
+    """
+    check = roster_checks.evaluate_roster("P_LOW_CAL", ROSTERS["P_LOW_CAL"])
+    assert check == (False, False, False, True, False, False, False, "P_LOW_CAL")
+
+
+def test_prefetch_keeps_order_and_bounds_in_flight():
+    """
+    Results come back in input order and never more than max_in_flight fetches run at once
+    """
+    lock = threading.Lock()
+    running = [0]
+    max_running = [0]
+
+    def fetch(item):
+        with lock:
+            running[0] += 1
+            max_running[0] = max(max_running[0], running[0])
+        time.sleep(0.01 * (5 - item))
+        with lock:
+            running[0] -= 1
+        return item * 10
+
+    results = list(roster_checks.prefetch(range(5), fetch, max_in_flight=2))
+
+    assert results == [(0, 0), (1, 10), (2, 20), (3, 30), (4, 40)]
+    assert max_running[0] <= 2
+
+
+def test_check_guild_rosters_matches_sequential_run(monkeypatch):
+    """
+    Concurrent fetching and the vectorized guild evaluation produce
+    the same checks as checking one player after the other
+    """
+    monkeypatch.setenv("ROSTER_FETCH_CONCURRENCY", "3")
+
+    with (
+        patch("src.roster_checks.read_roster_check_plan", return_value=plan_rows(ROSTERS)),
+        patch(
+            "src.roster_checks.post_request_raw",
+            side_effect=lambda url, data: json.dumps(ROSTERS[data["payload"]["playerId"]]).encode(),
+        ),
+    ):
+        concurrent_checks, _, _, _ = roster_checks.check_guild_rosters(("G1", "Guild"), "http://player")
+        sequential_checks = [roster_checks.check_roster(p, "http://player") for p in ROSTERS]
+
+    assert concurrent_checks == sequential_checks
+
+
+def test_check_guild_rosters_pool_matches_in_process(monkeypatch):
+    """
+    Parsing and evaluating the rosters in a process pool gives the same results as in process
+    """
+    players = plan_rows([*ROSTERS, "P_GONE"])
+    monkeypatch.setenv("ROSTER_SNAPSHOT", "all")
+
+    with (
+        patch("src.roster_checks.read_roster_check_plan", return_value=players),
+        patch(
+            "src.roster_checks.post_request_raw",
+            side_effect=lambda url, data: (
+                json.dumps(ROSTERS[data["payload"]["playerId"]]).encode()
+                if data["payload"]["playerId"] in ROSTERS
+                else None
+            ),
+        ),
+    ):
+        in_process = roster_checks.check_guild_rosters(("G1", "Guild"), "http://player")
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            pooled = roster_checks.check_guild_rosters(("G1", "Guild"), "http://player", pool=pool)
+
+    # pooled results arrive in completion order
+    assert sorted(pooled.check_rows, key=lambda row: row[-1]) == sorted(in_process.check_rows, key=lambda row: row[-1])
+    assert sorted(pooled.state_rows) == sorted(in_process.state_rows)
+    assert pooled.summary_rows == in_process.summary_rows
+    assert sorted(pooled.rosters, key=lambda r: r[0]) == sorted(in_process.rosters, key=lambda r: r[0])
+
+
+def test_pooled_checks_are_persisted_in_batches(monkeypatch):
+    """
+    Batches of pool evaluated checks are handed to persist while the guild is evaluated,
+    the rest is returned with the guild results
+    """
+    monkeypatch.setenv("ROSTER_STREAM_BATCH", "2")
+    monkeypatch.setenv("ROSTER_SNAPSHOT", "off")
+    persist = MagicMock()
+
+    with (
+        patch("src.roster_checks.read_roster_check_plan", return_value=plan_rows(ROSTERS)),
+        patch(
+            "src.roster_checks.post_request_raw",
+            side_effect=lambda url, data: json.dumps(ROSTERS[data["payload"]["playerId"]]).encode(),
+        ),
+        ProcessPoolExecutor(max_workers=2) as pool,
+    ):
+        result = roster_checks.check_guild_rosters(
+            ("G1", "Guild"), "http://player", pool=pool, persist=persist
+        )
+
+    persist.assert_called_once()
+    check_rows, state_rows = persist.call_args[0]
+    assert len(check_rows) == 2 and len(state_rows) == 2
+    assert {row[-1] for row in check_rows + result.check_rows} == set(ROSTERS)
+    assert {row[0] for row in state_rows + result.state_rows} == set(ROSTERS)
+    assert result.rosters == []
+
+
+def test_check_guild_rosters_skips_failed_fetches():
+    """
+    A player whose roster could not be fetched is left out instead of failing the guild
+    """
+    with (
+        patch("src.roster_checks.read_roster_check_plan", return_value=plan_rows(["P_FULL", "P_GONE"])),
+        patch(
+            "src.roster_checks.post_request_raw",
+            side_effect=lambda url, data: (
+                json.dumps(ROSTERS[data["payload"]["playerId"]]).encode()
+                if data["payload"]["playerId"] in ROSTERS
+                else None
+            ),
+        ),
+    ):
+        checks, _, _, _ = roster_checks.check_guild_rosters(("G1", "Guild"), "http://player")
+
+    assert [check[-1] for check in checks] == ["P_FULL"]
+
+
+def test_reva_ready_needs_two_key_units():
+    """
+    Five R7 inquisitors only count if at least two of them are GI, Reva or Marrok
+    """
+    fillers = ["SEVENTHSISTER:SEVEN_STAR", "FIFTHBROTHER:SEVEN_STAR", "EIGHTHBROTHER:SEVEN_STAR"]
+    one_key_unit = {
+        "name": "One key",
+        "rosterUnit": [make_unit(u, 9) for u in fillers + ["GRANDINQUISITOR:SEVEN_STAR"]]
+        + [make_unit("THIRDSISTER:SEVEN_STAR", 8)],
+    }
+    two_key_units = {
+        "name": "Two keys",
+        "rosterUnit": [
+            make_unit(u, 9) for u in fillers + ["GRANDINQUISITOR:SEVEN_STAR", "MARROK:SEVEN_STAR"]
+        ],
+    }
+
+    assert roster_checks.evaluate_roster("P1", one_key_unit)[0] is False
+    assert roster_checks.evaluate_roster("P2", two_key_units)[0] is True
+
+
+def test_evaluate_guild_summary_counts():
+    """
+    The summary counts ready players and players one requirement short of every check
+    """
+    rosters = [PlayerRoster.from_response(ROSTERS[p]) for p in ROSTERS]
+    check_rows, summary_rows = roster_checks.evaluate_guild("G1", list(ROSTERS), rosters)
+
+    assert check_rows == [roster_checks.evaluate_roster(p, ROSTERS[p]) for p in ROSTERS]
+    summary = {row[1]: row for row in summary_rows}
+    assert summary["gi_r7"] == ("G1", "gi_r7", 3, 1, 2, ["P_LOW_CAL", "P_EMPTY"])
+    # Cere is R7, only the Jedi Cal level is missing
+    assert summary["cere_r7"][3:] == (1, 1, ["P_LOW_CAL"])
+    assert all(isinstance(value, bool) for row in check_rows for value in row[:-1])
+
+
+def make_guild_response(character_gp: dict[str, int]) -> dict:
+    return {
+        "guild": {
+            "member": [
+                {"playerId": p, "playerName": p, "characterGalacticPower": gp}
+                for p, gp in character_gp.items()
+            ]
+        }
+    }
+
+
+def test_needs_check():
+    evaluator = get_rule_evaluator()
+    missing = [0] * len(evaluator.columns)
+    state = ("P1", "fp", 1000, evaluator.version, missing)
+
+    assert roster_checks.needs_check(None, 1000)
+    assert roster_checks.needs_check(state, None)
+    assert roster_checks.needs_check(state, 1001)
+    assert roster_checks.needs_check(("P1", "fp", 1000, "old rules", missing), 1000)
+    assert not roster_checks.needs_check(state, 1000)
+
+
+def test_incremental_check_skips_unchanged_players():
+    """
+    Only players with changed GP are fetched and only changed rosters get new check rows,
+    while the summary still covers the whole guild
+    """
+    evaluator = get_rule_evaluator()
+    low_cal = PlayerRoster.from_response(ROSTERS["P_LOW_CAL"])
+    full_missing = [0] * len(evaluator.columns)
+    low_cal_missing = evaluator.missing_requirements(evaluator.build_matrix([low_cal]))[0].tolist()
+    states = [
+        ("P_FULL", "fp-full", 9000, evaluator.version, full_missing),
+        ("P_LOW_CAL", evaluator.fingerprint(low_cal), 5000, evaluator.version, low_cal_missing),
+    ]
+    fetched = []
+
+    def post_raw(url, data):
+        fetched.append(data["payload"]["playerId"])
+        return json.dumps(ROSTERS[data["payload"]["playerId"]]).encode()
+
+    with (
+        patch("src.roster_checks.read_roster_check_plan", return_value=plan_rows(ROSTERS, states)),
+        patch(
+            "src.roster_checks.post_request",
+            return_value=make_guild_response({"P_FULL": 9000, "P_LOW_CAL": 5100, "P_EMPTY": 10}),
+        ),
+        patch("src.roster_checks.post_request_raw", side_effect=post_raw),
+    ):
+        check_rows, summary_rows, state_rows, _ = roster_checks.check_guild_rosters(
+            ("G1", "Guild"), "http://player", "http://guild", force_full=False
+        )
+
+    assert sorted(fetched) == ["P_EMPTY", "P_LOW_CAL"]
+    # P_LOW_CAL gained GP, but none of its watched units changed
+    assert [row[-1] for row in check_rows] == ["P_EMPTY"]
+    assert [(row[0], row[2]) for row in state_rows] == [("P_LOW_CAL", 5100), ("P_EMPTY", 10)]
+    summary = {row[1]: row for row in summary_rows}
+    assert summary["gi_r7"][2:5] == (3, 1, 2)
+
+
+def test_full_check_ignores_stored_state():
+    evaluator = get_rule_evaluator()
+    states = [(p, "fp", 0, evaluator.version, [0] * len(evaluator.columns)) for p in ROSTERS]
+    with (
+        patch("src.roster_checks.read_roster_check_plan", return_value=plan_rows(ROSTERS, states)),
+        patch("src.roster_checks.post_request", return_value=make_guild_response({})),
+        patch(
+            "src.roster_checks.post_request_raw",
+            side_effect=lambda url, data: json.dumps(ROSTERS[data["payload"]["playerId"]]).encode(),
+        ),
+    ):
+        check_rows, _, state_rows, _ = roster_checks.check_guild_rosters(
+            ("G1", "Guild"), "http://player", "http://guild", force_full=True
+        )
+
+    assert len(check_rows) == len(state_rows) == 3
+
+
+def test_stale_players_are_fetched_despite_unchanged_gp():
+    """
+    A player whose last check is too old is re-checked, but only gets a new check row if it changed
+    """
+    evaluator = get_rule_evaluator()
+    full = PlayerRoster.from_response(ROSTERS["P_FULL"])
+    states = [
+        (p, evaluator.fingerprint(full), 9000, evaluator.version, [0] * len(evaluator.columns))
+        for p in ("P_FULL", "P_EMPTY")
+    ]
+    fetched = []
+
+    def post_raw(url, data):
+        fetched.append(data["payload"]["playerId"])
+        return json.dumps(ROSTERS[data["payload"]["playerId"]]).encode()
+
+    with (
+        patch(
+            "src.roster_checks.read_roster_check_plan",
+            return_value=plan_rows(["P_FULL", "P_EMPTY"], states, stale={"P_FULL", "P_EMPTY"}),
+        ),
+        patch(
+            "src.roster_checks.post_request",
+            return_value=make_guild_response({"P_FULL": 9000, "P_EMPTY": 9000}),
+        ),
+        patch("src.roster_checks.post_request_raw", side_effect=post_raw),
+    ):
+        check_rows, _, state_rows, _ = roster_checks.check_guild_rosters(
+            ("G1", "Guild"), "http://player", "http://guild", force_full=False
+        )
+
+    assert sorted(fetched) == ["P_EMPTY", "P_FULL"]
+    assert [row[-1] for row in check_rows] == ["P_EMPTY"]
+    assert len(state_rows) == 2
+
+
+def test_plan_roster_checks_groups_by_guild(monkeypatch):
+    rows = [
+        ("P1", "G1", None, None, None, None, True, False),
+        ("P2", "G2", "fp", 100, "v1", [0], False, True),
+    ]
+    mock_plan = MagicMock(return_value=rows)
+    monkeypatch.setattr("src.roster_checks.read_roster_check_plan", mock_plan)
+    monkeypatch.setenv("ROSTER_CHECK_MAX_AGE_HOURS", "24")
+
+    plan = roster_checks.plan_roster_checks()
+
+    assert mock_plan.call_args[0] == (get_rule_evaluator().version, 24)
+    assert plan["G1"] == [roster_checks.PlannedCheck("P1", "G1", None, True, False)]
+    assert plan["G2"][0].state == ("P2", "fp", 100, "v1", [0])
+    assert plan["G2"][0].is_stale
+
+
+def test_env_loading_reads_guild_url(monkeypatch):
+    monkeypatch.setenv("GUILD_URL", "http://guild")
+    monkeypatch.setenv("PLAYER_URL", "http://player")
+    assert roster_checks.env_loading() == ("http://guild", "http://player")
@@ -0,0 +1,78 @@
+import json
+
+from src.comlink_models import UnitRecord
+from src.roster_parser import parse_roster, parse_roster_full
+
+WATCHED = ("JEDIKNIGHTCAL:SEVEN_STAR", "CEREJUNDA:SEVEN_STAR", "MARROK:SEVEN_STAR")
+
+
+def make_unit(definition_id: str, relic_tier: int = 9) -> dict:
+    """
+    Build a rosterUnit entry in comlink key order, with mods and skills
+    """
+    return {
+        "id": f"id-{definition_id}",
+        "definitionId": definition_id,
+        "currentRarity": 7,
+        "currentLevel": 85,
+        "skill": [{"id": f"specialskill_{definition_id.split(':')[0]}01", "tier": 8}],
+        "equippedStatMod": [
+            {"id": "mod1", "definitionId": "131", "primaryStat": {"stat": {"unitStatId": 5}}}
+        ],
+        "relic": {"currentTier": relic_tier},
+    }
+
+
+def make_response(units: list[dict], name: str = 'Player "One"') -> dict:
+    return {
+        "rosterUnit": units,
+        "profileStat": [{"nameKey": "STAT_GALACTIC_POWER_ACQUIRED_NAME", "value": "5000000"}],
+        "name": name,
+        "level": 85,
+        "playerId": "P1",
+    }
+
+
+RESPONSE = make_response(
+    [
+        make_unit("BOBAFETT:SEVEN_STAR"),
+        make_unit("JEDIKNIGHTCAL:SEVEN_STAR", 8),
+        make_unit("DARTHVADER:SEVEN_STAR"),
+        make_unit("CEREJUNDA:SEVEN_STAR"),
+    ]
+)
+
+
+def test_selective_parse_keeps_only_watched_units():
+    roster = parse_roster(json.dumps(RESPONSE, separators=(",", ":")).encode(), WATCHED)
+
+    assert set(roster.units) == {"JEDIKNIGHTCAL:SEVEN_STAR", "CEREJUNDA:SEVEN_STAR"}
+    assert roster.units["JEDIKNIGHTCAL:SEVEN_STAR"] == UnitRecord.from_dict(RESPONSE["rosterUnit"][1])
+    assert roster.relic_tier("JEDIKNIGHTCAL:SEVEN_STAR") == 8
+    assert roster.name == 'Player "One"'
+
+
+def test_selective_parse_matches_full_parse_for_watched_units():
+    """
+    Whitespace in the body doesn't change the result
+    """
+    raw = json.dumps(RESPONSE, indent=2)
+    selective = parse_roster(raw, WATCHED)
+    full = parse_roster_full(raw)
+
+    assert selective.name == full.name
+    for definition_id in WATCHED:
+        assert selective.units.get(definition_id) == full.units.get(definition_id)
+
+
+def test_falls_back_to_full_decode_when_unit_start_is_ambiguous():
+    """
+    A nested object before definitionId is detected and the whole roster decoded
+    """
+    unit = {"meta": {"x": 1}, **make_unit("CEREJUNDA:SEVEN_STAR")}
+    response = make_response([make_unit("BOBAFETT:SEVEN_STAR"), unit])
+
+    roster = parse_roster(json.dumps(response), WATCHED)
+
+    assert roster.units["CEREJUNDA:SEVEN_STAR"] == UnitRecord.from_dict(unit)
+    assert "BOBAFETT:SEVEN_STAR" in roster.units
@@ -0,0 +1,215 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.comlink_models import PlayerRoster
+from src.roster_rules import compile_rules, load_rules
+from src.update_data import ROSTER_CHECK_COLUMNS, build_roster_checks_upsert
+
+ROSTER = PlayerRoster.from_response(
+    {
+        "name": "Player",
+        "rosterUnit": [
+            {"definitionId": "A", "currentLevel": 85, "relic": {"currentTier": 9}},
+            {"definitionId": "B", "currentLevel": 80, "relic": {"currentTier": 5}},
+            {
+                "definitionId": "C",
+                "currentLevel": 85,
+                "skill": [{"id": "s1", "tier": 8}, {"id": "s2", "tier": 3}],
+            },
+        ],
+    }
+)
+
+
+def make_config(*rules) -> dict:
+    return {"columns": [{"column": f"c{i}", "rule": rule} for i, rule in enumerate(rules)]}
+
+
+def test_rule_primitives():
+    evaluator = compile_rules(
+        make_config(
+            {"unlocked": "B"},
+            {"unlocked": "MISSING"},
+            {"level": "B", "min": 85},
+            {"relic": "A", "min_tier": 9},
+            {"relic": "MISSING", "min_tier": 0},
+            {"skills": "C", "min_tiers": {"s1": 8}},
+            {"skills": "C", "min_tiers": {"s1": 8, "s2": 4}},
+        )
+    )
+
+    assert evaluator.evaluate(ROSTER) == (True, False, False, True, False, True, False)
+
+
+def test_combinators():
+    relic_a = {"relic": "A", "min_tier": 9}
+    relic_b = {"relic": "B", "min_tier": 9}
+    evaluator = compile_rules(
+        make_config(
+            {"all": [relic_a, relic_b]},
+            {"any": [relic_a, relic_b]},
+            {"at_least": 1, "of": [relic_a, relic_b]},
+            {"at_least": 2, "of": [relic_a, relic_b]},
+        )
+    )
+
+    assert evaluator.evaluate(ROSTER) == (False, True, True, False)
+
+
+def test_watched_units_are_shared_between_rules():
+    evaluator = compile_rules(
+        make_config({"relic": "A", "min_tier": 9}, {"all": [{"unlocked": "A"}, {"unlocked": "B"}]})
+    )
+    assert evaluator.watched_units == ("A", "B")
+    assert evaluator.columns == ("c0", "c1")
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"columns": []},
+        {"columns": [{"column": "Bad-Name", "rule": {"unlocked": "A"}}]},
+        {"columns": [{"column": "x; DROP TABLE players", "rule": {"unlocked": "A"}}]},
+        {"columns": [{"column": "player_id", "rule": {"unlocked": "A"}}]},
+        make_config({"unknown": "A"}),
+        make_config({"relic": "A"}),
+        {
+            "columns": [
+                {"column": "c", "rule": {"unlocked": "A"}},
+                {"column": "c", "rule": {"unlocked": "B"}},
+            ]
+        },
+    ],
+)
+def test_invalid_configs_are_rejected(config):
+    with pytest.raises(ValueError):
+        compile_rules(config)
+
+
+def test_default_rules_match_roster_check_columns():
+    """
+    The shipped rules file produces the columns of the players_roster_checks table
+    """
+    assert load_rules().columns == ROSTER_CHECK_COLUMNS
+
+
+def test_rules_path_from_env(tmp_path, monkeypatch):
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text(json.dumps(make_config({"unlocked": "A"})), encoding="utf-8")
+    monkeypatch.setenv("ROSTER_RULES_PATH", str(rules_file))
+
+    assert load_rules().columns == ("c0",)
+
+
+def test_upsert_sql_follows_rule_columns():
+    sql_str, template = build_roster_checks_upsert(("mission_a", "mission_b"))
+
+    assert "(mission_a, mission_b, player_id) VALUES %s" in sql_str
+    assert "mission_b = EXCLUDED.mission_b" in sql_str
+    assert "(prc.mission_a, prc.mission_b) IS DISTINCT FROM" in sql_str
+    assert template == "(%s, %s, %s)"
+    with pytest.raises(ValueError):
+        build_roster_checks_upsert(("ok", "not ok"))
+
+
+def test_vectorized_rules_match_per_roster_rules():
+    """
+    The matrix evaluation gives the same results as evaluating every roster on its own
+    """
+    evaluator = load_rules()
+    rng = np.random.default_rng(7)
+    rosters = []
+    for _ in range(40):
+        units = [
+            {
+                "definitionId": unit,
+                "currentLevel": int(rng.choice([80, 85])),
+                "relic": {"currentTier": int(rng.integers(7, 11))},
+                "skill": [
+                    {"id": skill_id, "tier": int(rng.integers(4, 9))}
+                    for _, skill_id in evaluator.skill_columns
+                ],
+            }
+            for unit in evaluator.watched_units
+            if rng.random() < 0.8
+        ]
+        rosters.append(PlayerRoster.from_response({"rosterUnit": units}))
+
+    ready = evaluator.missing_requirements(evaluator.build_matrix(rosters)) == 0
+
+    assert ready.tolist() == [list(evaluator.evaluate(r)) for r in rosters]
+
+
+def test_missing_requirements_counts():
+    relic_a = {"relic": "A", "min_tier": 9}
+    relic_b = {"relic": "B", "min_tier": 9}
+    relic_c = {"relic": "C", "min_tier": 9}
+    evaluator = compile_rules(
+        make_config(
+            {"all": [relic_a, relic_b, relic_c]},
+            {"any": [relic_b, relic_c]},
+            {"at_least": 2, "of": [relic_a, relic_b, relic_c]},
+            {"at_least": 4, "of": [relic_a, relic_b, relic_c]},
+        )
+    )
+
+    missing = evaluator.missing_requirements(evaluator.build_matrix([ROSTER]))
+
+    # a rule that can never hold is one more unit short than all of its units
+    assert missing.tolist() == [[2, 1, 1, 4]]
+
+
+def test_overlapping_requirements_count_units_once():
+    """
+    Requirements on the same unit, in one rule or in overlapping sub-rules, count as one unit
+    """
+    evaluator = compile_rules(
+        make_config(
+            {"all": [{"level": "B", "min": 85}, {"relic": "B", "min_tier": 9}]},
+            {"all": [{"level": "MISSING", "min": 85}, {"relic": "A", "min_tier": 9}]},
+            {
+                "all": [
+                    {"at_least": 2, "of": [{"relic": u, "min_tier": 9} for u in "ABC"]},
+                    {"at_least": 1, "of": [{"relic": u, "min_tier": 9} for u in "BC"]},
+                ]
+            },
+        )
+    )
+
+    missing = evaluator.missing_requirements(evaluator.build_matrix([ROSTER]))
+
+    assert missing.tolist() == [[1, 1, 1]]
+    assert evaluator.evaluate(ROSTER) == (False, False, False)
+
+
+def test_default_rules_one_unit_short():
+    """
+    GI, 7th Sister, 5th Brother and 8th Brother at R7 are only Reva R7 short of reva_ready,
+    and a roster without Jedi Cal is only Jedi Cal short of jkck_r7 and cere_r7
+    """
+    evaluator = load_rules()
+    roster = PlayerRoster.from_response(
+        {
+            "rosterUnit": [
+                {"definitionId": unit, "currentLevel": 85, "relic": {"currentTier": 9}}
+                for unit in (
+                    "GRANDINQUISITOR:SEVEN_STAR",
+                    "SEVENTHSISTER:SEVEN_STAR",
+                    "FIFTHBROTHER:SEVEN_STAR",
+                    "EIGHTHBROTHER:SEVEN_STAR",
+                    "CEREJUNDA:SEVEN_STAR",
+                )
+            ]
+        }
+    )
+
+    checks = dict(zip(evaluator.columns, evaluator.evaluate(roster)))
+    missing = dict(
+        zip(evaluator.columns, evaluator.missing_requirements(evaluator.build_matrix([roster]))[0])
+    )
+
+    for column in ("reva_ready", "jkck_r7", "cere_r7"):
+        assert checks[column] is False
+        assert missing[column] == 1
@@ -0,0 +1,146 @@
+from datetime import date
+from unittest.mock import MagicMock
+
+import pytest
+
+import src.roster_snapshots as roster_snapshots
+from src.comlink_models import PlayerRoster
+
+
+def make_roster(name: str, units: list[dict]) -> PlayerRoster:
+    return PlayerRoster.from_units(name, units)
+
+
+ROSTER_A = make_roster(
+    "A",
+    [
+        {
+            "definitionId": "JEDIKNIGHTCAL:SEVEN_STAR",
+            "currentRarity": 7,
+            "currentLevel": 85,
+            "currentTier": 13,
+            "relic": {"currentTier": 9},
+            "skill": [{"id": "skill1", "tier": 8}, {"id": "skill2", "tier": 3}],
+        },
+        {"definitionId": "CEREJUNDA:SEVEN_STAR", "currentRarity": 6, "currentLevel": 80},
+    ],
+)
+ROSTER_B = make_roster(
+    "B",
+    [
+        {
+            "definitionId": "JEDIKNIGHTCAL:SEVEN_STAR",
+            "currentRarity": 5,
+            "currentLevel": 70,
+            "currentTier": 8,
+            "skill": [{"id": "skill3", "tier": 2}, {"id": "skill1", "tier": 4}],
+        }
+    ],
+)
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    mock_cur = MagicMock()
+    mock_conn = MagicMock()
+    mock_release = MagicMock()
+    mock_cur.rowcount = 3
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cur
+    monkeypatch.setattr("src.roster_snapshots.get_connection", lambda: mock_conn)
+    monkeypatch.setattr("src.roster_snapshots.release_connection", mock_release)
+    return mock_conn, mock_cur, mock_release
+
+
+def test_dictionary_rows_merge_skill_ids_in_first_seen_order():
+    rows = roster_snapshots._dictionary_rows([("P1", ROSTER_A), ("P2", ROSTER_B)])
+    assert rows == [
+        ("JEDIKNIGHTCAL:SEVEN_STAR", ["skill1", "skill2", "skill3"]),
+        ("CEREJUNDA:SEVEN_STAR", []),
+    ]
+
+
+def test_snapshot_rows_align_skill_tiers_with_dictionary():
+    dictionary = {
+        "JEDIKNIGHTCAL:SEVEN_STAR": (1, ["skill1", "skill2", "skill3"]),
+        "CEREJUNDA:SEVEN_STAR": (2, []),
+    }
+    rows = roster_snapshots._snapshot_rows([("P1", ROSTER_A), ("P2", ROSTER_B)], dictionary)
+    assert rows == [
+        ("P1", 1, 7, 85, 13, 9, [8, 3, 0]),
+        ("P1", 2, 6, 80, 0, 0, []),
+        ("P2", 1, 5, 70, 8, 0, [4, 0, 2]),
+    ]
+
+
+def test_store_roster_snapshots_one_transaction(mock_db):
+    mock_conn, mock_cur, mock_release = mock_db
+    mock_cur.fetchall.return_value = [
+        ("JEDIKNIGHTCAL:SEVEN_STAR", 1, ["skill1", "skill2"]),
+        ("CEREJUNDA:SEVEN_STAR", 2, []),
+    ]
+
+    assert roster_snapshots.store_roster_snapshots([("P1", ROSTER_A)]) == 3
+
+    dictionary, lookup, insert = mock_cur.execute.call_args_list
+    assert dictionary[0][0].startswith("INSERT INTO roster_unit_dictionary")
+    assert lookup[0][1] == (["JEDIKNIGHTCAL:SEVEN_STAR", "CEREJUNDA:SEVEN_STAR"],)
+    assert "IS DISTINCT FROM" in insert[0][0]
+    assert insert[0][1] == ["P1", 1, 7, 85, 13, 9, [8, 3], "P1", 2, 6, 80, 0, 0, []]
+    mock_conn.commit.assert_called_once()
+    mock_release.assert_called_once_with(mock_conn)
+
+
+def test_ensure_roster_snapshots_creates_tables(mock_db):
+    mock_conn, mock_cur, mock_release = mock_db
+    roster_snapshots.ensure_roster_snapshots()
+    # one statement per execute, a prepared statement can't hold several commands
+    executed = [c[0][0] for c in mock_cur.execute.call_args_list]
+    assert executed == list(roster_snapshots.ROSTER_SNAPSHOT_DDL)
+    assert all(ddl_str.count(";") == 1 for ddl_str in executed)
+    mock_conn.commit.assert_called_once()
+    mock_release.assert_called_once_with(mock_conn)
+
+
+def test_store_roster_snapshots_no_rosters(mock_db):
+    mock_conn, mock_cur, mock_release = mock_db
+    assert roster_snapshots.store_roster_snapshots([]) == 0
+    mock_cur.execute.assert_not_called()
+    mock_release.assert_not_called()
+
+
+def test_read_roster_on_date_decodes_skill_tiers(monkeypatch):
+    rows = [
+        ("JEDIKNIGHTCAL:SEVEN_STAR", ["skill1", "skill2"], date(2026, 3, 1), 7, 85, 13, 9, [8, 3]),
+    ]
+    mock_query = MagicMock(return_value=rows)
+    monkeypatch.setattr("src.roster_snapshots.make_sql_query_single", mock_query)
+
+    roster = roster_snapshots.read_roster_on_date("P1", date(2026, 3, 5))
+
+    assert mock_query.call_args[0][2] == ("P1", date(2026, 3, 5))
+    unit = roster["JEDIKNIGHTCAL:SEVEN_STAR"]
+    assert unit.snapshot_date == date(2026, 3, 1)
+    assert unit.relic_tier == 9
+    assert unit.skill_tiers == {"skill1": 8, "skill2": 3}
+
+
+def test_read_unit_history_keeps_player_ids(monkeypatch):
+    rows = [
+        ("P1", "CEREJUNDA:SEVEN_STAR", [], date(2026, 3, 1), 6, 80, 8, 0, []),
+        ("P1", "CEREJUNDA:SEVEN_STAR", [], date(2026, 3, 4), 7, 85, 13, 5, []),
+    ]
+    monkeypatch.setattr("src.roster_snapshots.make_sql_query_single", MagicMock(return_value=rows))
+
+    history = roster_snapshots.read_unit_history("CEREJUNDA:SEVEN_STAR", "P1")
+
+    assert [(p, s.snapshot_date, s.relic_tier) for p, s in history] == [
+        ("P1", date(2026, 3, 1), 0),
+        ("P1", date(2026, 3, 4), 5),
+    ]
+
+
+def test_snapshot_mode_defaults_to_watched(monkeypatch):
+    monkeypatch.setenv("ROSTER_SNAPSHOT", "bogus")
+    assert roster_snapshots.get_snapshot_mode() == "watched"
+    monkeypatch.setenv("ROSTER_SNAPSHOT", "ALL")
+    assert roster_snapshots.get_snapshot_mode() == "all"
@@ -0,0 +1,126 @@
+import logging
+import threading
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import src.scheduler as scheduler
+import src.spreadsheet_operations as spreadsheet_operations
+
+
+def test_parse_cron_field():
+    assert scheduler.parse_cron_field("*/20", 0, 59) == {0, 20, 40}
+    assert scheduler.parse_cron_field("1-5,30", 0, 59) == {1, 2, 3, 4, 5, 30}
+    assert scheduler.parse_cron_field("*/3", 1, 31) == set(range(1, 32, 3))
+    with pytest.raises(ValueError):
+        scheduler.parse_cron_field("61", 0, 59)
+
+
+@pytest.mark.parametrize(
+    "cron_str, moment, due",
+    [
+        ("*/2 * * * *", datetime(2026, 3, 2, 10, 4), True),
+        ("*/2 * * * *", datetime(2026, 3, 2, 10, 5), False),
+        ("0 7 */3 * *", datetime(2026, 3, 4, 7, 0), True),
+        ("0 7 */3 * *", datetime(2026, 3, 3, 7, 0), False),
+        # 2026-03-01 is a sunday, 2026-03-02 a monday
+        ("0 6 * * */2", datetime(2026, 3, 1, 6, 0), True),
+        ("0 6 * * */2", datetime(2026, 3, 2, 6, 0), False),
+        ("0 6 * * 7", datetime(2026, 3, 1, 6, 0), True),
+        # restricted day of month and day of week match if either does
+        ("0 6 15 * 1", datetime(2026, 3, 2, 6, 0), True),
+        # a stepped */S field is unrestricted like *, so both fields have to match
+        ("0 6 */2 * 1", datetime(2026, 3, 2, 6, 0), False),
+        ("0 6 */2 * 1", datetime(2026, 3, 3, 6, 0), False),
+        ("0 6 */2 * 1", datetime(2026, 3, 9, 6, 0), True),
+        ("0 6 15 * */2", datetime(2026, 3, 3, 6, 0), False),
+        ("0 6 15 * */2", datetime(2026, 3, 15, 6, 0), True),
+    ],
+)
+def test_cron_schedule_matches(cron_str, moment, due):
+    assert scheduler.CronSchedule.parse(cron_str).matches(moment) is due
+
+
+def test_jobs_cover_the_entrypoint_crontab():
+    with open("scripts/entrypoint.sh", encoding="utf-8") as f:
+        crontab = f.read()
+    for job in scheduler.JOBS:
+        assert (
+            f"{job.schedule.expression} /scripts/run_{job.name}.sh >> /var/log/{job.log_file} 2>&1"
+            in crontab
+        )
+
+
+def test_job_logs_go_to_their_log_file(tmp_path, caplog):
+    caplog.set_level(logging.INFO, logger="guild_data_app")
+    jobs = (
+        scheduler.Job("first", scheduler.CronSchedule.parse("* * * * *"), lambda: scheduler.logger.info("from first"), "first.log"),
+        scheduler.Job("second", scheduler.CronSchedule.parse("* * * * *"), lambda: scheduler.logger.info("from second"), "second.log"),
+    )
+    handlers = scheduler.add_job_log_handlers(jobs, str(tmp_path))
+    try:
+        for thread in scheduler.start_due_jobs(jobs, datetime(2026, 3, 2, 10, 0)):
+            thread.join()
+        scheduler.logger.info("from the scheduler")
+    finally:
+        for handler in handlers:
+            scheduler.logger.removeHandler(handler)
+            handler.close()
+
+    first_log = (tmp_path / "first.log").read_text(encoding="utf-8")
+    assert "from first" in first_log and "first finished" in first_log
+    assert "from second" not in first_log
+    assert "from the scheduler" not in first_log
+    assert "from second" in (tmp_path / "second.log").read_text(encoding="utf-8")
+    assert all(
+        isinstance(handler, scheduler.logging.handlers.TimedRotatingFileHandler)
+        and handler.backupCount == scheduler.JOB_LOG_BACKUPS
+        for handler in handlers
+    )
+
+
+def test_running_job_is_not_started_again():
+    release = threading.Event()
+    runs = []
+
+    def slow_job():
+        runs.append(1)
+        release.wait(5)
+
+    job = scheduler.Job("slow", scheduler.CronSchedule.parse("* * * * *"), slow_job)
+    threads = scheduler.start_due_jobs((job,), datetime(2026, 3, 2, 10, 0))
+    assert scheduler.start_due_jobs((job,), datetime(2026, 3, 2, 10, 1)) == []
+    release.set()
+    threads[0].join()
+
+    assert runs == [1]
+    assert job.skipped == 1
+    assert job.lock.acquire(blocking=False)
+
+
+def test_failed_job_releases_its_lock():
+    job = scheduler.Job("broken", scheduler.CronSchedule.parse("* * * * *"), MagicMock(side_effect=RuntimeError))
+    assert job.lock.acquire(blocking=False)
+
+    scheduler.run_job(job)
+
+    assert job.lock.acquire(blocking=False)
+
+
+def test_scheduler_stops_and_closes_pool():
+    stop = threading.Event()
+    stop.set()
+    with patch("src.scheduler.close_pool") as mock_close:
+        scheduler.run_scheduler((), stop)
+    mock_close.assert_called_once()
+
+
+def test_gspread_client_is_authenticated_once_on_first_use(monkeypatch):
+    monkeypatch.setattr(spreadsheet_operations, "_gc", None)
+    monkeypatch.setenv("FILEPATH_CREDENTIALS", "credentials.json")
+    with patch("src.spreadsheet_operations.gspread.service_account") as mock_auth:
+        first = spreadsheet_operations.get_gspread_client()
+        second = spreadsheet_operations.get_gspread_client()
+    mock_auth.assert_called_once()
+    assert first is second
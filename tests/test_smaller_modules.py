@@ -2,6 +2,7 @@
 Testing file for:
     api_request.py
     remove_data.py
+    update_data.py
     log_tickets.py
     csv_import.py
 """
@@ -17,7 +18,14 @@ import psycopg2
 from unittest.mock import Mock, patch, ANY, call
 
 from src.api_request import post_request
-from src.remove_data import remove_from_players
+from src.comlink_models import Member
+from src.remove_data import remove_from_players, archive_players_outside
+from src.membership_diff import diff_membership
+from src.update_data import (
+    apply_membership_diff,
+    reconcile_guild_members,
+    upsert_roster_checks_with_state,
+)
 import src.log_tickets as log_tickets
 import src.csv_import as csv_import
 
@@ -31,46 +39,51 @@ class TestApiRequest:
         """
         Tests a successful POST request returning guild member data
         """
-        mock_setup_logging: Mock = mocker.patch("src.api_request.setup_logging")
-        mock_post: Mock = mocker.patch("src.api_request.requests.post")
+        mock_client: Mock = mocker.patch("src.api_request.get_comlink_client").return_value
 
         url = "https://test.api/endpoint"
         data = {"payload": {"guildId": "Guild_Id"}}
         expected_response = {"guild": {"member": ["m1", "m2", "m3"]}}
-
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = expected_response
-        mock_post.return_value = mock_response
+        mock_client.post.return_value = expected_response
 
         result = post_request(url, data)
 
         assert result == expected_response
-        mock_post.assert_called_once_with(url, json=data, timeout=30)
-        mock_setup_logging.assert_called_once()
+        mock_client.post.assert_called_once_with(url, data, timeout=None)
 
 
     def test_failed_post(self, mocker):
         """
-        Tests handling of a failed POST request (non-200 status code)
+        Tests handling of a failed POST request
         """
-        mock_setup_logging: Mock = mocker.patch("src.api_request.setup_logging")
-        mock_post: Mock = mocker.patch("src.api_request.requests.post")
+        mock_client: Mock = mocker.patch("src.api_request.get_comlink_client").return_value
 
         url = "https://test.api/endpoint"
         data = {"payload": {}}
-
-
-        mock_response: Mock = Mock()
-        mock_response.status_code = 400
-        mock_post.return_value = mock_response
+        mock_client.post.return_value = None
 
         result = post_request(url, data)
 
         assert result is None
-        mock_post.assert_called_once_with(url, json=data, timeout=30)
-        mock_setup_logging.assert_called_once()
-        assert mock_response.status_code == 400
+        mock_client.post.assert_called_once_with(url, data, timeout=None)
+
+
+    def test_post_uses_comlink_timeout(self, mocker, monkeypatch):
+        """
+        Tests that COMLINK_TIMEOUT reaches the session when no timeout is passed
+        """
+        monkeypatch.setenv("COMLINK_TIMEOUT", "7.5")
+        monkeypatch.setattr("src.comlink_client._client", None)
+        mocker.patch("src.comlink_client.atexit.register")
+        mock_post: Mock = mocker.patch("src.comlink_client.requests.Session.post")
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {"guild": {}}
+
+        url = "https://test.api/endpoint"
+        data = {"payload": {"guildId": "Guild_Id"}}
+
+        assert post_request(url, data) == {"guild": {}}
+        mock_post.assert_called_once_with(url, json=data, timeout=7.5)
 
 
 class TestRemoveData:
@@ -117,7 +130,8 @@ class TestRemoveData:
         mock_conn, mock_cursor = mock_db
 
         with (
-            patch("src.remove_data.psycopg2.connect") as mock_connect, 
+            patch("src.remove_data.get_connection") as mock_connect,
+            patch("src.remove_data.release_connection"),
             patch("src.remove_data.logger") as mock_logger
         ):
             mock_connect .return_value = mock_conn
@@ -141,7 +155,8 @@ class TestRemoveData:
         mock_conn, mock_cursor = mock_db
 
         with (
-            patch("src.remove_data.psycopg2.connect") as mock_connect, 
+            patch("src.remove_data.get_connection") as mock_connect,
+            patch("src.remove_data.release_connection"),
             patch("src.remove_data.logger") as mock_logger
         ):
             mock_connect .return_value = mock_conn
@@ -165,7 +180,8 @@ class TestRemoveData:
         mock_conn, mock_cursor = mock_db
 
         with (
-            patch("src.remove_data.psycopg2.connect") as mock_connect, 
+            patch("src.remove_data.get_connection") as mock_connect,
+            patch("src.remove_data.release_connection"),
             patch("src.remove_data.logger") as mock_logger
         ):
             mock_connect .return_value = mock_conn
@@ -185,7 +201,8 @@ class TestRemoveData:
         mock_conn, mock_cursor = mock_db
 
         with (
-            patch("src.remove_data.psycopg2.connect") as mock_connect,
+            patch("src.remove_data.get_connection") as mock_connect,
+            patch("src.remove_data.release_connection") as mock_release,
             patch("src.remove_data.logger") as mock_logger
         ):
             mock_connect.return_value = mock_conn
@@ -196,13 +213,199 @@ class TestRemoveData:
 
 
             mock_conn.rollback.assert_called_once()
-            mock_conn.close.assert_called_once()
+            mock_release.assert_called_once_with(mock_conn)
             mock_logger.error.assert_called_once_with(
                 "Database error: %s", ANY
             )
             mock_conn.commit.assert_not_called()
 
 
+    def test_archive_players_outside_single_statement(self, mock_db, mock_env_vars):
+        """
+        Tests that leavers are moved into the archive with one DELETE ... RETURNING statement
+        """
+        mock_conn, mock_cursor = mock_db
+
+        with (
+            patch("src.remove_data.get_connection") as mock_connect,
+            patch("src.remove_data.release_connection") as mock_release,
+        ):
+            mock_connect.return_value = mock_conn
+            mock_cursor.rowcount = 2
+
+            assert archive_players_outside(["G1", "G2"]) == 2
+
+            mock_cursor.execute.assert_called_once()
+            sql_str, params = mock_cursor.execute.call_args[0]
+            assert sql_str.startswith("WITH moved AS (DELETE FROM players")
+            assert "INSERT INTO players_archive" in sql_str
+            assert params == (["G1", "G2"],)
+            mock_conn.commit.assert_called_once()
+            mock_release.assert_called_once_with(mock_conn)
+
+
+    def test_archive_players_outside_no_guilds(self, mock_db, mock_env_vars):
+        """
+        Tests that nobody is archived when no tracked guilds are known
+        """
+        mock_conn, mock_cursor = mock_db
+
+        with patch("src.remove_data.get_connection") as mock_connect:
+            assert archive_players_outside([]) == 0
+            mock_connect.assert_not_called()
+
+
+class TestUpdateData:
+
+    @pytest.fixture
+    def mock_db(self):
+        """
+        Mocks the pooled connection and cursor
+        """
+        mock_conn: Mock = Mock()
+        mock_cursor: Mock = Mock()
+
+        mock_cursor_manager = Mock()
+        mock_cursor_manager.__enter__ = Mock(return_value=mock_cursor)
+        mock_cursor_manager.__exit__ = Mock(return_value=None)
+
+        mock_conn.cursor.return_value = mock_cursor_manager
+
+        with (
+            patch("src.update_data.get_connection", return_value=mock_conn),
+            patch("src.update_data.release_connection") as mock_release,
+        ):
+            yield mock_conn, mock_cursor, mock_release
+
+
+    def test_apply_membership_diff_single_transaction(self, mock_db):
+        """
+        Tests that joins, renames, state sync and leaves of a guild are committed together
+        """
+        mock_conn, mock_cursor, mock_release = mock_db
+        mock_cursor.rowcount = 1
+        members = [
+            Member.from_dict({"playerId": "P1", "playerName": "New Name", "galacticPower": 100}),
+            Member.from_dict({"playerId": "P3", "playerName": "Joined", "galacticPower": 300}),
+        ]
+        db_players = [("P1", "Old Name"), ("P2", "Gone")]
+
+        assert apply_membership_diff(diff_membership("G1", members, db_players))
+
+        statements = [c[0][0] for c in mock_cursor.execute.call_args_list]
+        assert statements[0].startswith("UPDATE players AS p SET nickname = v.nickname, guild_id")
+        assert statements[1].startswith("INSERT INTO players")
+        assert "WHERE NOT EXISTS" in statements[1]
+        assert statements[2].startswith("UPDATE players AS p SET nickname = v.nickname FROM")
+        assert statements[3].startswith("UPDATE players AS p SET last_activity_time")
+        assert mock_cursor.execute.call_args_list[2][0][1] == ["P1", "New Name"]
+        assert mock_cursor.execute.call_args_list[4][0][1] == (" ", ["P2"], "G1")
+        mock_conn.commit.assert_called_once()
+        mock_release.assert_called_once_with(mock_conn)
+
+
+    def test_apply_membership_diff_db_error(self, mock_db):
+        """
+        Tests that a failing statement rolls back the whole membership change
+        """
+        mock_conn, mock_cursor, mock_release = mock_db
+        mock_cursor.rowcount = 1
+        mock_cursor.execute.side_effect = [None, psycopg2.Error("Simulated DB error")]
+        members = [Member.from_dict({"playerId": "P3", "playerName": "Joined"})]
+
+        assert not apply_membership_diff(diff_membership("G1", members, [("P2", "Gone")]))
+
+        mock_conn.rollback.assert_called_once()
+        mock_conn.commit.assert_not_called()
+        mock_release.assert_called_once_with(mock_conn)
+
+
+    def test_reconcile_guild_members_single_merge(self, mock_db):
+        """
+        Tests that the members of a guild are reconciled with one MERGE statement
+        """
+        mock_conn, mock_cursor, mock_release = mock_db
+        mock_cursor.rowcount = 3
+        members = [
+            Member.from_dict({"playerId": "P1", "playerName": "One", "galacticPower": 100}),
+            Member.from_dict({"playerId": "P2", "playerName": "Two", "galacticPower": 200}),
+        ]
+
+        assert reconcile_guild_members("G1", members) == 3
+
+        mock_cursor.execute.assert_called_once()
+        sql_str, params = mock_cursor.execute.call_args[0]
+        assert sql_str.startswith("MERGE INTO players AS p")
+        assert "(%s, %s, %s::bigint, %s::timestamp), (%s, %s, %s::bigint, %s::timestamp)" in sql_str
+        assert "FULL JOIN" in sql_str
+        assert sql_str.count("%s") == len(params)
+        assert params[:3] == ["P1", "One", 100]
+        assert params[-4:] == ["G1", " ", "G1", "G1"]
+        mock_conn.commit.assert_called_once()
+        mock_release.assert_called_once_with(mock_conn)
+
+
+    def test_reconcile_guild_members_without_members(self, mock_db):
+        """
+        Tests that a guild without members detaches all of its players
+        """
+        mock_conn, mock_cursor, mock_release = mock_db
+        mock_cursor.rowcount = 2
+
+        assert reconcile_guild_members("G1", []) == 2
+
+        sql_str, params = mock_cursor.execute.call_args[0]
+        assert sql_str.startswith("UPDATE players SET guild_id")
+        assert params == [" ", "G1"]
+
+
+    def test_upsert_roster_checks_with_state_single_transaction(self, mock_db):
+        """
+        Tests that roster checks and their check state are written in one transaction, checks first,
+        keeping the latest check per player
+        """
+        mock_conn, mock_cursor, mock_release = mock_db
+        mock_cursor.rowcount = 1
+        checks = [
+            (False, True, False, True, False, False, False, "P1"),
+            (True, True, True, True, True, True, True, "P2"),
+            (True, True, False, True, False, False, False, "P1"),
+        ]
+        states = [("P1", "fp1", 1000, "v1", [0, 0, 1, 0, 1, 1, 1])]
+
+        assert upsert_roster_checks_with_state(checks, states)
+
+        checks_call, state_call = mock_cursor.execute.call_args_list
+        assert checks_call[0][0].startswith("INSERT INTO players_roster_checks")
+        assert "ON CONFLICT (player_id) DO UPDATE SET" in checks_call[0][0]
+        assert "IS DISTINCT FROM" in checks_call[0][0]
+        assert checks_call[0][1] == [True, True, False, True, False, False, False, "P1",
+                                     True, True, True, True, True, True, True, "P2"]
+        assert state_call[0][0].startswith("INSERT INTO roster_check_state")
+        assert state_call[0][1] == ["P1", "fp1", 1000, "v1", [0, 0, 1, 0, 1, 1, 1]]
+        assert not any("CREATE TABLE" in c[0][0] for c in mock_cursor.execute.call_args_list)
+        mock_conn.commit.assert_called_once()
+        mock_release.assert_called_once_with(mock_conn)
+
+
+    def test_upsert_roster_checks_with_state_db_error(self, mock_db):
+        """
+        Tests that a failing check upsert rolls back the check state as well
+        """
+        mock_conn, mock_cursor, mock_release = mock_db
+        mock_cursor.execute.side_effect = psycopg2.Error("Simulated DB error")
+        checks = [(True, True, False, True, False, False, False, "P1")]
+        states = [("P1", "fp1", 1000, "v1", [0, 0, 1, 0, 1, 1, 1])]
+
+        assert not upsert_roster_checks_with_state(checks, states)
+
+        mock_cursor.execute.assert_called_once()
+        mock_conn.rollback.assert_called_once()
+        mock_conn.commit.assert_not_called()
+        mock_release.assert_called_once_with(mock_conn)
+        mock_release.assert_called_once_with(mock_conn)
+
+
 class TestLogTickets(unittest.TestCase):
 
     def test_is_around_reset_time(self):